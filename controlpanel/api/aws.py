@@ -1,15 +1,102 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from copy import deepcopy
+import hashlib
 import json
 import logging
+import threading
+import time
 
 import boto3
 import botocore
+import botocore.config
 from django.conf import settings
+from django.core.cache import cache
 
 
 log = logging.getLogger(__name__)
 
 
+class BotoRegistry:
+    """
+    Process-wide registry of boto3 clients and resources
+
+    A single session is shared by the whole process so credentials are
+    resolved once and every client reuses its connection pool instead of
+    negotiating new TLS connections on each call. Clients are thread safe and
+    shared between threads, but boto3 resources are not, so those are kept
+    per thread. Session access is serialised because boto3 sessions are not
+    thread safe either.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._session = None
+        self._clients = {}
+
+    @property
+    def config(self):
+        return botocore.config.Config(
+            max_pool_connections=settings.AWS_MAX_POOL_CONNECTIONS,
+            connect_timeout=settings.AWS_CONNECT_TIMEOUT,
+            read_timeout=settings.AWS_READ_TIMEOUT,
+            retries={
+                "mode": settings.AWS_RETRY_MODE,
+                "max_attempts": settings.AWS_MAX_ATTEMPTS,
+            },
+        )
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                self._session = boto3.session.Session()
+            return self._session
+
+    def client(self, service_name, region_name=None):
+        key = (service_name, region_name)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self.session.client(
+                        service_name,
+                        region_name=region_name,
+                        config=self.config,
+                    )
+                    self._clients[key] = client
+        return client
+
+    def resource(self, service_name, region_name=None):
+        if not hasattr(self._local, "resources"):
+            self._local.resources = {}
+        key = (service_name, region_name)
+        resource = self._local.resources.get(key)
+        if resource is None:
+            with self._lock:
+                resource = self.session.resource(
+                    service_name,
+                    region_name=region_name,
+                    config=self.config,
+                )
+            self._local.resources[key] = resource
+        return resource
+
+    def reset(self):
+        """
+        Drop the session and every client, eg: after credentials have changed
+        """
+        with self._lock:
+            self._session = None
+            self._clients = {}
+            self._local = threading.local()
+
+
+registry = BotoRegistry()
+
+
 def arn(service, resource, region="", account=""):
     service = service.lower()
     region = region.lower()
@@ -143,7 +230,7 @@ BASE_S3_ACCESS_STATEMENT = {
 
 
 def create_app_role(app):
-    iam = boto3.resource('iam')
+    iam = registry.resource('iam')
     try:
         return iam.create_role(
             RoleName=app.iam_role_name,
@@ -162,7 +249,7 @@ def create_user_role(user):
     }}
     policy['Statement'].append(oidc_statement)
 
-    iam = boto3.resource('iam')
+    iam = registry.resource('iam')
     try:
         iam.create_role(
             RoleName=user.iam_role_name,
@@ -178,9 +265,14 @@ def create_user_role(user):
 
 
 def delete_role(name):
-    """Delete the given IAM role and all inline policies"""
+    """
+    Delete the given IAM role, all inline policies and its S3 access shards
+
+    Policies are detached and deleted concurrently, by a pool of
+    `IAM_MAX_WORKERS` threads.
+    """
     try:
-        role = boto3.resource('iam').Role(name)
+        role = registry.resource('iam').Role(name)
         role.load()
     except botocore.exceptions.ClientError as e:
         if e.response["Error"]["Code"] == "NoSuchEntity":
@@ -188,64 +280,108 @@ def delete_role(name):
             return
         raise e
 
-    for policy in role.attached_policies.all():
-        role.detach_policy(PolicyArn=policy.arn)
-
-    for policy in role.policies.all():
-        policy.delete()
+    def detach_policy(policy_arn):
+        registry.client('iam').detach_role_policy(RoleName=name, PolicyArn=policy_arn)
+        if is_s3_access_shard(policy_arn):
+            _delete_managed_policy(registry.resource('iam').Policy(policy_arn))
+
+    def delete_policy(policy_name):
+        registry.client('iam').delete_role_policy(RoleName=name, PolicyName=policy_name)
+        policy_document_cache.delete(role_policy_cache_key(name, policy_name))
+
+    with ThreadPoolExecutor(max_workers=settings.IAM_MAX_WORKERS) as executor:
+        futures = [
+            executor.submit(detach_policy, policy.arn)
+            for policy in role.attached_policies.all()
+        ] + [
+            executor.submit(delete_policy, policy.name)
+            for policy in role.policies.all()
+        ]
+        for future in as_completed(futures):
+            future.result()
 
     role.delete()
+    cache.delete(RoleS3AccessPolicy.shard_list_key(name))
+
 
+class BucketProvisioningError(Exception):
+    """
+    Raised when some of the configuration steps of a new S3 bucket failed
 
-def create_bucket(bucket_name, is_data_warehouse=False):
-    s3_resource = boto3.resource("s3")
-    s3_client = boto3.client('s3')
+    `completed` has the steps that succeeded, so that they can be skipped when
+    provisioning is retried.
+    """
+
+    def __init__(self, bucket_name, completed, errors):
+        self.completed = completed
+        self.errors = errors
+        failures = ", ".join(f"{step}: {error}" for step, error in errors.items())
+        super().__init__(f"Failed provisioning S3 bucket {bucket_name}: {failures}")
+
+
+def _create_bucket(bucket_name, is_data_warehouse):
+    s3_client = registry.client("s3")
     try:
-        bucket = s3_resource.create_bucket(
+        s3_client.create_bucket(
             Bucket=bucket_name,
             ACL='private',
             CreateBucketConfiguration={
                 'LocationConstraint': settings.BUCKET_REGION,
             },
         )
-        # Enable versioning by default.
-        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html?highlight=s3#S3.BucketVersioning
-        versioning = bucket.Versioning()
-        versioning.enable()
-        # Set bucket lifecycle. Send non-current versions of files to glacier
-        # storage after 30 days.
-        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.put_bucket_lifecycle_configuration
-        lifecycle_id = f"{bucket_name}_lifecycle_configuration"
-        lifecycle_conf = s3_client.put_bucket_lifecycle_configuration(
-            Bucket=bucket_name,
-            LifecycleConfiguration={
-                "Rules": [
-                    {
-                        "ID": lifecycle_id,
-                        "Status": "Enabled",
-                        "Prefix": "",
-                        "NoncurrentVersionTransitions": [
-                            {
-                                'NoncurrentDays': 30,
-                                'StorageClass': 'GLACIER',
-                            },
-                        ]
-                    },
-                ]
-            }
-        )
-        if is_data_warehouse:
-            _tag_bucket(bucket, {"buckettype": "datawarehouse"})
+    except s3_client.exceptions.BucketAlreadyOwnedByYou:
+        # a previous attempt created it, carry on configuring it
+        log.warning(f'Bucket {bucket_name} already exists')
+
+
+def _enable_bucket_versioning(bucket_name, is_data_warehouse):
+    # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html?highlight=s3#S3.BucketVersioning
+    registry.client("s3").put_bucket_versioning(
+        Bucket=bucket_name,
+        VersioningConfiguration={'Status': 'Enabled'},
+    )
+
+
+def _put_bucket_lifecycle(bucket_name, is_data_warehouse):
+    # Send non-current versions of files to glacier storage after 30 days.
+    # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.put_bucket_lifecycle_configuration
+    registry.client("s3").put_bucket_lifecycle_configuration(
+        Bucket=bucket_name,
+        LifecycleConfiguration={
+            "Rules": [
+                {
+                    "ID": f"{bucket_name}_lifecycle_configuration",
+                    "Status": "Enabled",
+                    "Prefix": "",
+                    "NoncurrentVersionTransitions": [
+                        {
+                            'NoncurrentDays': 30,
+                            'StorageClass': 'GLACIER',
+                        },
+                    ]
+                },
+            ]
+        }
+    )
 
-    except s3_resource.meta.client.exceptions.BucketAlreadyOwnedByYou:
-        log.warning(f'Skipping creating Bucket {bucket_name}: Already exists')
-        return
 
-    bucket.Logging().put(BucketLoggingStatus={'LoggingEnabled': {
-        'TargetBucket': settings.LOGS_BUCKET_NAME,
-        'TargetPrefix': f"{bucket_name}/",
-    }})
-    bucket.meta.client.put_bucket_encryption(
+def _tag_data_warehouse_bucket(bucket_name, is_data_warehouse):
+    if is_data_warehouse:
+        tag_bucket(bucket_name, {"buckettype": "datawarehouse"})
+
+
+def _put_bucket_logging(bucket_name, is_data_warehouse):
+    registry.client("s3").put_bucket_logging(
+        Bucket=bucket_name,
+        BucketLoggingStatus={'LoggingEnabled': {
+            'TargetBucket': settings.LOGS_BUCKET_NAME,
+            'TargetPrefix': f"{bucket_name}/",
+        }},
+    )
+
+
+def _put_bucket_encryption(bucket_name, is_data_warehouse):
+    registry.client("s3").put_bucket_encryption(
         Bucket=bucket_name,
         ServerSideEncryptionConfiguration={'Rules': [{
             'ApplyServerSideEncryptionByDefault': {
@@ -253,7 +389,10 @@ def create_bucket(bucket_name, is_data_warehouse=False):
             },
         }]},
     )
-    bucket.meta.client.put_public_access_block(
+
+
+def _put_public_access_block(bucket_name, is_data_warehouse):
+    registry.client("s3").put_public_access_block(
         Bucket=bucket_name,
         PublicAccessBlockConfiguration={
             'BlockPublicAcls': True,
@@ -262,13 +401,66 @@ def create_bucket(bucket_name, is_data_warehouse=False):
             'RestrictPublicBuckets': True,
         },
     )
-    return bucket
+
+
+# Steps configuring a new bucket. They are independent of each other, and
+# idempotent, so they run concurrently and are safe to repeat
+BUCKET_CONFIGURATION_STEPS = {
+    "versioning": _enable_bucket_versioning,
+    "lifecycle": _put_bucket_lifecycle,
+    "tagging": _tag_data_warehouse_bucket,
+    "logging": _put_bucket_logging,
+    "encryption": _put_bucket_encryption,
+    "public_access_block": _put_public_access_block,
+}
+
+
+def create_bucket(bucket_name, is_data_warehouse=False, completed=()):
+    """
+    Create the S3 bucket called `bucket_name` and configure it
+
+    Steps named in `completed` (by a previous attempt) are skipped. Returns the
+    names of all the completed steps, or raises `BucketProvisioningError` if
+    any configuration step failed.
+    """
+    completed = set(completed)
+
+    if "create" not in completed:
+        _create_bucket(bucket_name, is_data_warehouse)
+        completed.add("create")
+
+    steps = {
+        name: step
+        for name, step in BUCKET_CONFIGURATION_STEPS.items()
+        if name not in completed
+    }
+    errors = {}
+    if steps:
+        with ThreadPoolExecutor(max_workers=len(steps)) as executor:
+            futures = {
+                executor.submit(step, bucket_name, is_data_warehouse): name
+                for name, step in steps.items()
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                except Exception as error:
+                    log.error(f"Failed {name} step of S3 bucket {bucket_name}: {error}")
+                    errors[name] = error
+                else:
+                    completed.add(name)
+
+    if errors:
+        raise BucketProvisioningError(bucket_name, sorted(completed), errors)
+
+    return sorted(completed)
 
 
 def tag_bucket(bucket_name, tags):
     """Add the given `tags` to the S3 bucket called `bucket_name`"""
 
-    bucket = boto3.resource("s3").Bucket(bucket_name)
+    bucket = registry.resource("s3").Bucket(bucket_name)
     _tag_bucket(bucket, tags)
 
 
@@ -317,20 +509,169 @@ def _tag_bucket(boto_bucket, tags):
     tagging.put(Tagging={"TagSet": tag_set})
 
 
+class PolicyDocumentCache:
+    """
+    Write-through cache of IAM policy documents, stored in the Django cache
+
+    Each entry records the `version` of the document it holds, so the policy
+    wrappers can tell when IAM has moved on without them: the default version
+    ID of managed policies and a content hash of inline role policies.
+    """
+
+    KEY_PREFIX = "iam-policy-document"
+
+    # Entries outlive `IAM_POLICY_CACHE_TTL` so that a policy changed outside
+    # the control panel is detected (and logged) when it is re-read
+    TIMEOUT = 24 * 60 * 60
+
+    def key(self, name):
+        return f"{self.KEY_PREFIX}:{name}"
+
+    def get(self, name):
+        return cache.get(self.key(name))
+
+    def set(self, name, version, document, versions=None):
+        """
+        Cache `document`, which is at `version`. For managed policies,
+        `versions` lists the IDs of all the versions of the policy, oldest
+        first
+        """
+        cache.set(
+            self.key(name),
+            {
+                "version": version,
+                "document": document,
+                "checked_at": time.time(),
+                "versions": versions,
+            },
+            self.TIMEOUT,
+        )
+
+    def delete(self, name):
+        cache.delete(self.key(name))
+
+
+policy_document_cache = PolicyDocumentCache()
+
+
+def role_policy_cache_key(role_name, policy_name):
+    return f"role/{role_name}/{policy_name}"
+
+
+def managed_policy_cache_key(policy_arn):
+    return f"policy/{policy_arn}"
+
+
+def document_hash(policy_document):
+    return hashlib.sha256(
+        json.dumps(policy_document, sort_keys=True).encode("utf8")
+    ).hexdigest()
+
+
+def policy_size(policy_document):
+    # IAM doesn't count whitespace towards the policy size quotas
+    return len(json.dumps(policy_document, separators=(",", ":")))
+
+
+def compact_resources(resources, covering=()):
+    """
+    Returns `resources` sorted and deduplicated, leaving out the object ARNs
+    already matched by a wildcard in `resources` or `covering`
+
+    Eg: `arn:aws:s3:::bucket/foo/*` covers `arn:aws:s3:::bucket/foo/bar/*`
+    """
+    resources = sorted(set(resources))
+    wildcards = {
+        resource[:-1]
+        for resource in resources + list(covering)
+        if resource.endswith("/*")
+    }
+
+    def is_covered(resource):
+        index = resource.find("/")
+        while index != -1:
+            prefix = resource[:index + 1]
+            if prefix in wildcards and resource != f"{prefix}*":
+                return True
+            index = resource.find("/", index + 1)
+        return resource in covering
+
+    return [resource for resource in resources if not is_covered(resource)]
+
+
+def compact_s3_access(resources):
+    """
+    Returns the S3 access `resources` by statement ID (`list`, `readonly`
+    and `readwrite`) compacted, leaving out read-only resources which are
+    also granted read/write access, and statements with no resources
+    """
+    compacted = {}
+    readwrite = resources.get('readwrite', [])
+    for sid, sid_resources in resources.items():
+        covering = readwrite if sid == 'readonly' else ()
+        sid_resources = compact_resources(sid_resources, covering)
+        if sid_resources:
+            compacted[sid] = sid_resources
+    return compacted
+
+
+def rebase_s3_access(base, changed, current):
+    """
+    Returns a copy of `current` with the S3 access changes made between
+    `base` and `changed` (resources added to or removed from the `list`,
+    `readonly` and `readwrite` statements) applied to it
+    """
+    def resources(policy_document, sid):
+        for stmt in policy_document.get('Statement', []):
+            if stmt.get('Sid') == sid:
+                return set(stmt.get('Resource', []))
+        return set()
+
+    policy = S3AccessPolicy(None, policy_document=deepcopy(current))
+    for sid in ('list', 'readonly', 'readwrite'):
+        before = resources(base, sid)
+        after = resources(changed, sid)
+        stmt = policy.statements.get(sid)
+        if stmt:
+            stmt['Resource'] = [
+                resource for resource in stmt.get('Resource', [])
+                if resource not in before - after
+            ]
+        for arn in sorted(after - before):
+            policy.add_resource(arn, sid)
+    policy.compact()
+    return policy.policy_document
+
+
 class S3AccessPolicy:
-    """Provides a convenience wrapper around a RolePolicy object"""
+    """
+    Provides a convenience wrapper around a RolePolicy object
+
+    A document loaded from the policy document cache is checked against IAM
+    before being written, and the changes made to it are replayed on the
+    policy in IAM if that was changed outside the control panel in the
+    meantime, so they aren't lost within `IAM_POLICY_CACHE_TTL`.
+    """
+
+    # IAM quota on the (aggregate) size of the inline policies of a role
+    MAX_SIZE = 10240
 
-    def __init__(self, policy):
+    def __init__(self, policy, policy_document=None):
         self.policy = policy
         self.statements = {}
+        # (version, document) of the cached copy the document was loaded from
+        self.cached_base = None
 
-        try:
-            self.policy_document = self.load_policy_document()
+        if policy_document is not None:
+            self.policy_document = policy_document
 
-        except self.policy.meta.client.exceptions.NoSuchEntityException:
-            # create an empty s3 access policy
-            self.policy_document = deepcopy(BASE_S3_ACCESS_POLICY)
-            self.put(policy_document=self.policy_document)
+        else:
+            try:
+                self.policy_document = self.load_policy_document()
+
+            except self.policy.meta.client.exceptions.NoSuchEntityException:
+                # start from an empty s3 access policy, created by `put()`
+                self.policy_document = deepcopy(BASE_S3_ACCESS_POLICY)
 
         # ensure version is set
         self.policy_document['Version'] = '2012-10-17'
@@ -343,10 +684,36 @@ class S3AccessPolicy:
                 stmt.update(deepcopy(BASE_S3_ACCESS_STATEMENT[sid]))
                 self.statements[sid] = stmt
 
+    @property
+    def cache_key(self):
+        return role_policy_cache_key(self.policy.role_name, self.policy.name)
+
     def load_policy_document(self):
+        cached = policy_document_cache.get(self.cache_key)
+        if cached and self.is_current(cached):
+            self.cached_base = (cached["version"], deepcopy(cached["document"]))
+            return cached["document"]
+
+        policy_document = self.fetch_policy_document()
+        version = self.document_version(policy_document)
+        if cached and cached["version"] != version:
+            log.warning(f"Policy {self.cache_key} was changed outside the control panel")
+        policy_document_cache.set(self.cache_key, version, policy_document)
+        return policy_document
+
+    def fetch_policy_document(self):
         # triggers API call
         return self.policy.policy_document
 
+    def is_current(self, cached):
+        # There is no cheaper way to check an inline policy than reading it,
+        # so trust the cached copy for a while (until it's written, see
+        # `save_policy_document()`)
+        return time.time() - cached["checked_at"] < settings.IAM_POLICY_CACHE_TTL
+
+    def document_version(self, policy_document):
+        return document_hash(policy_document)
+
     def statement(self, sid):
         if sid in ('list', 'readonly', 'readwrite'):
             if sid not in self.statements:
@@ -362,27 +729,88 @@ class S3AccessPolicy:
             if arn not in statement['Resource']:
                 statement['Resource'].append(arn)
 
+    @staticmethod
+    def covers(arn, resource):
+        """
+        Whether `resource` is `arn` or an object ARN under it, so that
+        `arn:aws:s3:::foo` doesn't cover `arn:aws:s3:::foo-bar/*`
+        """
+        return resource == arn or resource.startswith(f'{arn}/')
+
     def remove_resource(self, arn, sid):
         statement = self.statement(sid)
         if statement:
             resources = statement.get('Resource', [])
             for resource in list(resources):
-                if resource.startswith(arn):
+                if self.covers(arn, resource):
                     resources.remove(resource)
 
+    def has_access(self, arn):
+        for sid in ('list', 'readonly', 'readwrite'):
+            for resource in self.statements.get(sid, {}).get('Resource', []):
+                if self.covers(arn, resource):
+                    return True
+        return False
+
     def grant_object_access(self, arn, access_level):
         self.add_resource(f'{arn}/*', access_level)
 
     def grant_list_access(self, arn):
         self.add_resource(arn, 'list')
 
+    def grant_access(self, bucket_arn, access_level, path_arns):
+        self.revoke_access(bucket_arn)
+        self.grant_list_access(bucket_arn)
+        for arn in path_arns:
+            self.grant_object_access(arn, access_level)
+
     def revoke_access(self, arn):
         self.remove_resource(arn, 'readonly')
         self.remove_resource(arn, 'readwrite')
         self.remove_resource(arn, 'list')
 
+    def compact(self):
+        """
+        Deduplicate the resources of the statements, dropping those covered by
+        a broader path (or by the same path with read/write access), and remove
+        statements left with no resources
+        """
+        compacted = compact_s3_access({
+            sid: stmt.get('Resource', []) for sid, stmt in self.statements.items()
+        })
+        for sid, stmt in self.statements.items():
+            stmt['Resource'] = compacted.get(sid, [])
+
+        self.policy_document['Statement'][:] = [
+            stmt for stmt in self.policy_document['Statement']
+            if stmt.get('Resource')
+        ]
+        self.statements = {
+            sid: stmt for sid, stmt in self.statements.items()
+            if stmt['Resource']
+        }
+
+    def size(self):
+        self.compact()
+        return policy_size(self.policy_document)
+
+    def is_empty(self):
+        self.compact()
+        return not self.policy_document['Statement']
+
+    def restore(self, policy_document):
+        """
+        Roll back to `policy_document`, a copy of an earlier state
+        """
+        self.policy_document = policy_document
+        self.statements = {
+            stmt['Sid']: stmt for stmt in policy_document['Statement']
+            if stmt.get('Sid') in ('list', 'readonly', 'readwrite')
+        }
+
     def put(self, policy_document=None):
         if policy_document is None:
+            self.compact()
             policy_document = self.policy_document
 
         # remove statements with no resources
@@ -393,29 +821,478 @@ class S3AccessPolicy:
 
         return self.save_policy_document(policy_document)
 
+    def rebase(self, policy_document):
+        """
+        Returns `policy_document`, or when the policy was changed outside the
+        control panel since the cached copy it was built from was stored, the
+        policy in IAM with the same changes made to it
+        """
+        version, base = self.cached_base
+        try:
+            current = self.fetch_policy_document()
+        except self.policy.meta.client.exceptions.NoSuchEntityException:
+            # deleted outside the control panel, `put()` creates it again
+            return policy_document
+
+        if document_hash(current) == version:
+            return policy_document
+
+        log.warning(f"Policy {self.cache_key} was changed outside the control panel")
+        return rebase_s3_access(base, policy_document, current)
+
     def save_policy_document(self, policy_document):
-        return self.policy.put(
+        if self.cached_base:
+            policy_document = self.rebase(policy_document)
+            self.restore(policy_document)
+            self.cached_base = None
+
+        result = self.policy.put(
             PolicyDocument=json.dumps(policy_document),
         )
+        policy_document_cache.set(
+            self.cache_key, document_hash(policy_document), policy_document,
+        )
+        return result
+
+
+def version_number(version_id):
+    # version IDs are "v1", "v2", ...
+    return int(version_id[1:])
 
 
 class ManagedS3AccessPolicy(S3AccessPolicy):
-    """Provides a convenience wrapper around a Policy object"""
+    """
+    Provides a convenience wrapper around a Policy object
 
-    def load_policy_document(self):
+    IAM keeps at most `MAX_VERSIONS` versions of a managed policy. Their IDs
+    are kept in the policy document cache, so that saving only deletes the
+    oldest version, and only when there's no room for a new one.
+    """
+
+    # IAM quota on the size of a managed policy
+    MAX_SIZE = 6144
+    MAX_VERSIONS = 5
+
+    @property
+    def cache_key(self):
+        return managed_policy_cache_key(self.policy.arn)
+
+    def fetch_policy_document(self):
         return self.policy.default_version.document
 
+    def is_current(self, cached):
+        # triggers API call (GetPolicy), but saves fetching the document
+        return self.policy.default_version_id == cached["version"]
+
+    def document_version(self, policy_document):
+        return self.policy.default_version_id
+
+    def list_versions(self):
+        """
+        Returns the IDs of the policy's versions, oldest first, and the ID of
+        its default version (which isn't necessarily the latest one, e.g.
+        after a rollback)
+        """
+        # triggers API call
+        listed = list(self.policy.versions.all())
+        default_version_id = next(
+            (version.version_id for version in listed if version.is_default_version),
+            None,
+        )
+        versions = sorted((version.version_id for version in listed), key=version_number)
+        return versions, default_version_id
+
+    def delete_version(self, version_id):
+        try:
+            self.policy.meta.client.delete_policy_version(
+                PolicyArn=self.policy.arn, VersionId=version_id,
+            )
+        except self.policy.meta.client.exceptions.NoSuchEntityException:
+            log.warning(f"Policy {self.cache_key} version {version_id} already deleted")
+
+    def make_room(self, versions, default_version_id):
+        """
+        Delete the oldest (non-default) version when `versions` is full
+        """
+        if len(versions) < self.MAX_VERSIONS:
+            return
+        oldest = next(v for v in versions if v != default_version_id)
+        self.delete_version(oldest)
+        versions.remove(oldest)
+
     def save_policy_document(self, policy_document):
-        self.policy.create_version(
+        cached = policy_document_cache.get(self.cache_key)
+        if cached and cached.get("versions"):
+            versions = cached["versions"]
+            default_version_id = cached["version"]
+        else:
+            versions, default_version_id = self.list_versions()
+
+        self.make_room(versions, default_version_id)
+        try:
+            new_version = self.policy.create_version(
+                PolicyDocument=json.dumps(policy_document),
+                SetAsDefault=True,
+            )
+        except self.policy.meta.client.exceptions.LimitExceededException:
+            # versions were created outside the control panel
+            log.warning(f"Policy {self.cache_key} has untracked versions")
+            versions, default_version_id = self.list_versions()
+            self.make_room(versions, default_version_id)
+            new_version = self.policy.create_version(
+                PolicyDocument=json.dumps(policy_document),
+                SetAsDefault=True,
+            )
+
+        versions.append(new_version.version_id)
+        policy_document_cache.set(
+            self.cache_key, new_version.version_id, policy_document, versions,
+        )
+        return self
+
+
+def s3_access_shard_path():
+    return f"/{settings.ENV}/s3-access/"
+
+
+def is_s3_access_shard(policy_arn):
+    return policy_arn.startswith(iam_arn(f"policy{s3_access_shard_path()}"))
+
+
+class S3AccessQuotaError(Exception):
+    """
+    Raised when an IAM role's S3 access needs more managed policies than
+    can be attached to it
+    """
+
+    def __init__(self, role_name, needed):
+        super().__init__(
+            f"Role {role_name} needs {needed} attached policies for its S3 "
+            f"access, over the quota of {RoleS3AccessPolicy.MAX_ATTACHED_POLICIES}"
+        )
+        self.role_name = role_name
+        self.needed = needed
+
+
+class RoleS3AccessPolicy:
+    """
+    S3 access of an IAM role, sharded across policies as it grows
+
+    Access starts out in the inline `s3-access` policy. Once that is full,
+    buckets are placed in managed policies named `<role>-s3-access-<n>`,
+    created and attached to the role as needed, and detached and deleted
+    once revokes leave them empty. Each bucket is granted in full by a
+    single shard: it stays in the shard which already holds it when it
+    fits, or else goes to the first shard with room for it, trying buckets
+    in ARN order, so the layout only depends on the grants.
+
+    Only the shards which changed are written.
+    """
+
+    SHARD_LIST_KEY_PREFIX = "iam-role-s3-access-shards"
+    SHARD_LIST_TIMEOUT = PolicyDocumentCache.TIMEOUT
+    # IAM quota on the managed policies attached to a role (the default,
+    # which can be raised to 20)
+    MAX_ATTACHED_POLICIES = 10
+
+    def __init__(self, role):
+        self.role = role
+        self.iam = registry.resource('iam')
+        self.shards = [S3AccessPolicy(role.Policy('s3-access'))] + [
+            ManagedS3AccessPolicy(self.iam.Policy(arn)) for arn in self.shard_arns()
+        ]
+        self.created = set()
+        self.pending = {}
+        self.owners = {}
+        self.versions = [self.document_version(shard) for shard in self.shards]
+
+    @classmethod
+    def shard_list_key(cls, role_name):
+        return f"{cls.SHARD_LIST_KEY_PREFIX}:{role_name}"
+
+    def shard_arns(self):
+        key = self.shard_list_key(self.role.name)
+        arns = cache.get(key)
+        if arns is None:
+            policies = self.role.attached_policies.filter(
+                PathPrefix=s3_access_shard_path(),
+            )
+            arns = sorted(policy.arn for policy in policies)
+            cache.set(key, arns, self.SHARD_LIST_TIMEOUT)
+        return arns
+
+    def document_version(self, shard):
+        shard.compact()
+        return document_hash(shard.policy_document)
+
+    def revoke_access(self, bucket_arn):
+        self.pending.pop(bucket_arn, None)
+        for index, shard in enumerate(self.shards):
+            if shard.has_access(bucket_arn):
+                shard.revoke_access(bucket_arn)
+                self.owners.setdefault(bucket_arn, index)
+
+    def grant_access(self, bucket_arn, access_level, path_arns):
+        self.revoke_access(bucket_arn)
+        self.pending[bucket_arn] = (access_level, path_arns)
+
+    def place(self, bucket_arn, access_level, path_arns):
+        owner = self.owners.get(bucket_arn, 0)
+        candidates = [owner] + [
+            index for index in range(len(self.shards)) if index != owner
+        ]
+        for index in candidates:
+            shard = self.shards[index]
+            previous = deepcopy(shard.policy_document)
+            shard.grant_access(bucket_arn, access_level, path_arns)
+            if shard.size() <= shard.MAX_SIZE:
+                return
+            shard.restore(previous)
+
+        shard = self.new_shard()
+        shard.grant_access(bucket_arn, access_level, path_arns)
+
+    def new_shard(self):
+        arns = {shard.policy.arn for shard in self.shards[1:]}
+        number = len(self.shards)
+        while True:
+            name = f"{self.role.name}-s3-access-{number}"
+            arn = iam_arn(f"policy{s3_access_shard_path()}{name}")
+            if arn not in arns:
+                break
+            # numbers of deleted shards leave gaps
+            number += 1
+
+        shard = ManagedS3AccessPolicy(
+            self.iam.Policy(arn),
+            policy_document={"Version": "2012-10-17", "Statement": []},
+        )
+        self.created.add(len(self.shards))
+        self.shards.append(shard)
+        self.versions.append(None)
+        return shard
+
+    def create_shard(self, shard):
+        shard.compact()
+        policy_document = shard.policy_document
+        policy = self.iam.create_policy(
+            PolicyName=shard.policy.arn.rsplit("/", 1)[-1],
+            Path=s3_access_shard_path(),
             PolicyDocument=json.dumps(policy_document),
-            SetAsDefault=True,
+        )
+        self.role.attach_policy(PolicyArn=policy.arn)
+        policy_document_cache.set(
+            managed_policy_cache_key(policy.arn),
+            policy.default_version_id,
+            policy_document,
+            [policy.default_version_id],
         )
 
-        for version in self.policy.versions.all():
-            if version.version_id != self.policy.default_version_id:
-                version.delete()
+    def delete_shard(self, shard):
+        # IAM rejects policies without statements
+        self.role.detach_policy(PolicyArn=shard.policy.arn)
+        _delete_managed_policy(shard.policy)
+
+    def check_quota(self, emptied):
+        """
+        Raise `S3AccessQuotaError` before writing anything if the shards to
+        create wouldn't fit in the role's attached policies quota
+        """
+        if not self.created:
+            return
+        # triggers API call
+        attached = len(list(self.role.attached_policies.all()))
+        needed = attached + len(self.created) - len(emptied - self.created)
+        if needed > self.MAX_ATTACHED_POLICIES:
+            raise S3AccessQuotaError(self.role.name, needed)
+
+    def put(self):
+        for bucket_arn in sorted(self.pending):
+            self.place(bucket_arn, *self.pending[bucket_arn])
+        self.pending = {}
+        self.owners = {}
+
+        # the inline policy always keeps its `console` statement
+        emptied = {
+            index for index, shard in enumerate(self.shards)
+            if index and shard.is_empty()
+        }
+        self.check_quota(emptied)
+
+        for index, shard in enumerate(self.shards):
+            if index in emptied:
+                if index not in self.created:
+                    self.delete_shard(shard)
+            elif index in self.created:
+                self.create_shard(shard)
+            elif self.document_version(shard) != self.versions[index]:
+                shard.put()
+
+        if self.created or emptied:
+            self.shards = [
+                shard for index, shard in enumerate(self.shards)
+                if index not in emptied
+            ]
+            self.versions = [
+                version for index, version in enumerate(self.versions)
+                if index not in emptied
+            ]
+            self.created = set()
+            cache.set(
+                self.shard_list_key(self.role.name),
+                [shard.policy.arn for shard in self.shards[1:]],
+                self.SHARD_LIST_TIMEOUT,
+            )
+
+
+class S3AccessPolicyBatch:
+    """
+    Unit of work collecting S3 access changes for IAM roles and groups
 
-        return self
+    Changes are queued per role (`s3-access` policies, see
+    `RoleS3AccessPolicy`) or group (managed policy) and applied in order by
+    `apply()`, which reads and writes each affected policy document at most
+    once.
+    """
+
+    ROLE = "role"
+    GROUP = "group"
+
+    def __init__(self):
+        # dicts preserve insertion order, so policies are written in the order
+        # they were first touched
+        self.changes = {}
+
+    def __len__(self):
+        return sum(len(changes) for changes in self.changes.values())
+
+    def _queue(self, kind, name, change):
+        self.changes.setdefault((kind, name), []).append(change)
+
+    def grant_role_access(self, role_name, bucket_arn, access_level, path_arns):
+        self._queue(
+            self.ROLE, role_name, ("grant", bucket_arn, access_level, path_arns),
+        )
+
+    def revoke_role_access(self, role_name, bucket_arn):
+        self._queue(self.ROLE, role_name, ("revoke", bucket_arn))
+
+    def grant_group_access(self, group_policy_arn, bucket_arn, access_level, path_arns):
+        self._queue(
+            self.GROUP,
+            group_policy_arn,
+            ("grant", bucket_arn, access_level, path_arns),
+        )
+
+    def revoke_group_access(self, group_policy_arn, bucket_arn):
+        self._queue(self.GROUP, group_policy_arn, ("revoke", bucket_arn))
+
+    def apply(self):
+        changes, self.changes = self.changes, {}
+        for (kind, name), policy_changes in changes.items():
+            if kind == self.ROLE:
+                policy = self._role_policy(name, policy_changes)
+            else:
+                policy = ManagedS3AccessPolicy(registry.resource('iam').Policy(name))
+
+            if policy is None:
+                continue
+
+            for change in policy_changes:
+                self._apply_change(policy, *change)
+
+            policy.put()
+
+    def _role_policy(self, role_name, changes):
+        role = registry.resource('iam').Role(role_name)
+
+        # Revoking access from a role which no longer exists is not an error,
+        # but this is only worth an extra API call when nothing is granted
+        if all(change[0] == "revoke" for change in changes):
+            try:
+                role.load()
+            except botocore.exceptions.ClientError as e:
+                if e.response["Error"]["Code"] == "NoSuchEntity":
+                    log.warning(f"Role '{role_name}' doesn't exist: Nothing to revoke")
+                    return None
+                raise e
+
+        return RoleS3AccessPolicy(role)
+
+    def _apply_change(self, policy, action, bucket_arn, access_level=None, path_arns=()):
+        if action == "grant":
+            policy.grant_access(bucket_arn, access_level, path_arns)
+        else:
+            policy.revoke_access(bucket_arn)
+
+
+_local = threading.local()
+
+
+@contextmanager
+def batch_policy_updates():
+    """
+    Collect the S3 access grants and revokes made within the block and apply
+    them when it exits, with a single read and write per role or group.
+
+    Nested blocks join the outermost batch. Nothing is applied if the block
+    raises an exception.
+
+    ```
+    with batch_policy_updates():
+        for bucket_arn in bucket_arns:
+            grant_bucket_access(role_name, bucket_arn, 'readonly')
+    ```
+    """
+
+    batch = getattr(_local, "policy_batch", None)
+    if batch is not None:
+        yield batch
+        return
+
+    batch = _local.policy_batch = S3AccessPolicyBatch()
+    try:
+        yield batch
+    finally:
+        _local.policy_batch = None
+
+    batch.apply()
+
+
+def read_s3_access(kind, name):
+    """
+    Returns the S3 access resources granted to an IAM role or group (`kind`
+    is "role" or "group") by statement ID, compacted
+
+    Policies are read from IAM, bypassing the policy document cache, so that
+    changes made outside the control panel show up.
+    """
+    iam = registry.resource('iam')
+    if kind == "group":
+        documents = [iam.Policy(name).default_version.document]
+    else:
+        role = iam.Role(name)
+        documents = [
+            policy.default_version.document
+            for policy in role.attached_policies.filter(
+                PathPrefix=s3_access_shard_path(),
+            )
+        ]
+        try:
+            documents.append(role.Policy('s3-access').policy_document)
+        except iam.meta.client.exceptions.NoSuchEntityException:
+            pass
+
+    resources = {}
+    for policy_document in documents:
+        for stmt in policy_document.get('Statement', []):
+            sid = stmt.get('Sid')
+            if sid in ('list', 'readonly', 'readwrite'):
+                stmt_resources = stmt.get('Resource', [])
+                if isinstance(stmt_resources, str):
+                    stmt_resources = [stmt_resources]
+                resources.setdefault(sid, []).extend(stmt_resources)
+    return compact_s3_access(resources)
 
 
 def grant_bucket_access(role_name, bucket_arn, access_level, path_arns=[]):
@@ -425,13 +1302,8 @@ def grant_bucket_access(role_name, bucket_arn, access_level, path_arns=[]):
     if bucket_arn and not path_arns:
         path_arns = [bucket_arn]
 
-    role = boto3.resource('iam').Role(role_name)
-    policy = S3AccessPolicy(role.Policy('s3-access'))
-    policy.revoke_access(bucket_arn)
-    policy.grant_list_access(bucket_arn)
-    for arn in path_arns:
-        policy.grant_object_access(arn, access_level)
-    policy.put()
+    with batch_policy_updates() as batch:
+        batch.grant_role_access(role_name, bucket_arn, access_level, path_arns)
 
 
 def revoke_bucket_access(role_name, bucket_arn=None):
@@ -439,22 +1311,12 @@ def revoke_bucket_access(role_name, bucket_arn=None):
         log.warning(f'Asked to revoke {role_name} role access to nothing')
         return
 
-    try:
-        role = boto3.resource("iam").Role(role_name)
-        role.load()
-    except botocore.exceptions.ClientError as e:
-        if e.response["Error"]["Code"] == "NoSuchEntity":
-            log.warning(f"Role '{role_name}' doesn't exist: Nothing to revoke")
-            return
-        raise e
-
-    policy = S3AccessPolicy(role.Policy('s3-access'))
-    policy.revoke_access(bucket_arn)
-    policy.put()
+    with batch_policy_updates() as batch:
+        batch.revoke_role_access(role_name, bucket_arn)
 
 
 def create_group(name, path):
-    iam = boto3.resource('iam')
+    iam = registry.resource('iam')
     try:
         iam.create_policy(
             PolicyName=name,
@@ -465,8 +1327,27 @@ def create_group(name, path):
         log.warning(f'Skipping creating policy {path}{name}: Already exists')
 
 
+def attach_group_member(group_arn, role_name):
+    policy = registry.resource('iam').Policy(group_arn)
+    policy.attach_role(RoleName=role_name)
+
+
+def detach_group_member(group_arn, role_name):
+    policy = registry.resource('iam').Policy(group_arn)
+    try:
+        policy.detach_role(RoleName=role_name)
+    except policy.meta.client.exceptions.NoSuchEntityException:
+        log.warning(f"Skipping detaching {role_name} from {group_arn}: Not attached")
+
+
 def update_group_members(group_arn, role_names):
-    policy = boto3.resource('iam').Policy(group_arn)
+    """
+    Reconcile the roles attached to the group policy with `role_names`
+
+    This lists every attached role, prefer `attach_group_member()` and
+    `detach_group_member()` for individual membership changes.
+    """
+    policy = registry.resource('iam').Policy(group_arn)
     members = set(policy.attached_roles.all())
     existing = {member.role_name for member in members}
 
@@ -478,7 +1359,7 @@ def update_group_members(group_arn, role_names):
 
 
 def delete_group(group_arn):
-    policy = boto3.resource('iam').Policy(group_arn)
+    policy = registry.resource('iam').Policy(group_arn)
     try:
         policy.load()
     except policy.meta.client.exceptions.NoSuchEntityException:
@@ -488,11 +1369,16 @@ def delete_group(group_arn):
     for role in policy.attached_roles.all():
         policy.detach_role(RoleName=role.name)
 
+    _delete_managed_policy(policy)
+
+
+def _delete_managed_policy(policy):
     for version in policy.versions.all():
         if version.version_id != policy.default_version_id:
             version.delete()
 
     policy.delete()
+    policy_document_cache.delete(managed_policy_cache_key(policy.arn))
 
 
 def grant_group_bucket_access(group_policy_arn, bucket_arn, access_level, path_arns=[]):
@@ -502,13 +1388,8 @@ def grant_group_bucket_access(group_policy_arn, bucket_arn, access_level, path_a
     if bucket_arn and not path_arns:
         path_arns = [bucket_arn]
 
-    policy = boto3.resource('iam').Policy(group_policy_arn)
-    policy = ManagedS3AccessPolicy(policy)
-    policy.revoke_access(bucket_arn)
-    policy.grant_list_access(bucket_arn)
-    for arn in path_arns:
-        policy.grant_object_access(arn, access_level)
-    policy.put()
+    with batch_policy_updates() as batch:
+        batch.grant_group_access(group_policy_arn, bucket_arn, access_level, path_arns)
 
 
 def revoke_group_bucket_access(group_policy_arn, bucket_arn=None):
@@ -516,14 +1397,29 @@ def revoke_group_bucket_access(group_policy_arn, bucket_arn=None):
         log.warning(f'Asked to revoke {group_policy_arn} group access to nothing')
         return
 
-    policy = boto3.resource('iam').Policy(group_policy_arn)
-    policy = ManagedS3AccessPolicy(policy)
-    policy.revoke_access(bucket_arn)
-    policy.put()
+    with batch_policy_updates() as batch:
+        batch.revoke_group_access(group_policy_arn, bucket_arn)
+
+
+# Maximum number of parameters read or deleted by a single SSM API call
+SSM_BATCH_SIZE = 10
+
+
+def ssm_client():
+    return registry.client('ssm', region_name=settings.BUCKET_REGION)
+
+
+def ssm_metadata_cache_key(name):
+    return f"ssm-parameter-metadata:{name}"
+
+
+def batches(items, size):
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
 
 
 def create_parameter(name, value, role_name, description=''):
-    ssm = boto3.client('ssm', region_name=settings.BUCKET_REGION)
+    ssm = ssm_client()
     try:
         ssm.put_parameter(
             Name=name,
@@ -540,17 +1436,121 @@ def create_parameter(name, value, role_name, description=''):
         log.warning(
             f'Skipping creating Parameter {name} for {role_name}: Already exists'
         )
+    cache.delete(ssm_metadata_cache_key(name))
+
+
+def create_parameters(parameters):
+    """
+    Create the given SSM parameters concurrently, with a pool of
+    `SSM_MAX_WORKERS` threads
+
+    `parameters` are dicts of `create_parameter()` arguments. Returns the
+    errors of the parameters which could not be created, by name.
+    """
+    errors = {}
+    with ThreadPoolExecutor(max_workers=settings.SSM_MAX_WORKERS) as executor:
+        futures = {
+            executor.submit(create_parameter, **parameter): parameter['name']
+            for parameter in parameters
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+            except Exception as error:
+                log.error(f'Failed creating Parameter {name}: {error}')
+                errors[name] = error
+    return errors
 
 
 def delete_parameter(name):
-    ssm = boto3.client('ssm', region_name=settings.BUCKET_REGION)
+    ssm = ssm_client()
     try:
         ssm.delete_parameter(Name=name)
     except ssm.exceptions.ParameterNotFound:
         log.warning(f'Skipping deleting Parameter {name}: Does not exist')
+    cache.delete(ssm_metadata_cache_key(name))
+
+
+def delete_parameters(names):
+    """
+    Delete the given SSM parameters, `SSM_BATCH_SIZE` per request, with a
+    pool of `SSM_MAX_WORKERS` threads
+    """
+
+    def delete_batch(batch):
+        response = ssm_client().delete_parameters(Names=batch)
+        cache.delete_many([ssm_metadata_cache_key(name) for name in batch])
+        for name in response.get('InvalidParameters', []):
+            log.warning(f'Skipping deleting Parameter {name}: Does not exist')
+
+    with ThreadPoolExecutor(max_workers=settings.SSM_MAX_WORKERS) as executor:
+        futures = [
+            executor.submit(delete_batch, batch)
+            for batch in batches(names, SSM_BATCH_SIZE)
+        ]
+        for future in as_completed(futures):
+            future.result()
+
+
+def get_parameters(names, with_decryption=True):
+    """
+    Returns the given SSM parameters by name, reading `SSM_BATCH_SIZE` per
+    request. Parameters which don't exist are left out.
+    """
+    ssm = ssm_client()
+    parameters = {}
+    for batch in batches(names, SSM_BATCH_SIZE):
+        response = ssm.get_parameters(Names=batch, WithDecryption=with_decryption)
+        for parameter in response['Parameters']:
+            parameters[parameter['Name']] = parameter
+    return parameters
+
+
+def describe_parameters(names):
+    """
+    Returns the metadata (`type`, `version` and `last_modified`, not values)
+    of the given SSM parameters by name, or `None` for those which don't
+    exist
+
+    Metadata is cached for `SSM_METADATA_CACHE_TTL` seconds, so that pages
+    listing parameters don't read them on every request. The parameters not
+    in the cache are described `SSM_BATCH_SIZE` per request.
+    """
+    keys = {ssm_metadata_cache_key(name): name for name in names}
+    cached = cache.get_many(keys)
+    metadata = {keys[key]: value for key, value in cached.items()}
+
+    missing = [name for key, name in keys.items() if key not in cached]
+    if missing:
+        paginator = ssm_client().get_paginator('describe_parameters')
+        described = dict.fromkeys(missing)
+        for batch in batches(missing, SSM_BATCH_SIZE):
+            pages = paginator.paginate(ParameterFilters=[
+                {'Key': 'Name', 'Option': 'Equals', 'Values': batch},
+            ])
+            for page in pages:
+                for parameter in page['Parameters']:
+                    described[parameter['Name']] = {
+                        'type': parameter['Type'],
+                        'version': parameter['Version'],
+                        'last_modified': parameter['LastModifiedDate'],
+                    }
+
+        # parameters which don't exist are cached too, as `False`
+        cache.set_many(
+            {
+                ssm_metadata_cache_key(name): value or False
+                for name, value in described.items()
+            },
+            settings.SSM_METADATA_CACHE_TTL,
+        )
+        metadata.update(described)
+
+    return {name: metadata[name] or None for name in names}
 
 
 def list_role_names(prefix="/"):
-    roles = boto3.resource('iam').roles.filter(PathPrefix=prefix).all()
+    roles = registry.resource('iam').roles.filter(PathPrefix=prefix).all()
     return [role.name for role in list(roles)]
 
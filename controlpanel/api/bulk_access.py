@@ -0,0 +1,137 @@
+"""
+Grant many users and groups access to S3 buckets at once
+
+IAM work is done before the access records are written, grouped by IAM role
+or group (so each policy is read and written once) and run concurrently, see
+`cluster.grant_bucket_access_in_bulk()`. Only the grants which succeeded are
+recorded, so resubmitting the failed ones retries them.
+"""
+from django.db.transaction import atomic
+from django.utils import timezone
+
+from controlpanel.api import cluster, outbox
+from controlpanel.api.models import PolicyS3Bucket, UserS3Bucket
+
+
+GRANTED = "granted"
+UPDATED = "updated"
+FORBIDDEN = "forbidden"
+DUPLICATE = "duplicate"
+FAILED = "failed"
+
+
+def grant_access(requester, grants):
+    """
+    Grant the access described by `grants` on behalf of `requester`
+
+    Each grant is a dict with `s3bucket`, `access_level`, `paths` and either
+    `user` (and optionally `is_admin`) or `policy`. Returns one result dict
+    per grant, in the same order, with a `status` and, for failed grants, an
+    `error`.
+    """
+    results = [None] * len(grants)
+    existing = existing_accesses(grants)
+    accesses = {}
+
+    for index, grant in enumerate(grants):
+        if not has_permission(requester, grant):
+            results[index] = {"status": FORBIDDEN}
+            continue
+
+        key = access_key(grant)
+        if key in accesses:
+            results[index] = {"status": DUPLICATE}
+            continue
+
+        accesses[key] = (index, build_access(grant, existing.get(key)))
+
+    errors = cluster.grant_bucket_access_in_bulk(
+        [access for _, access in accesses.values()]
+    )
+
+    granted = []
+    for index, access in accesses.values():
+        error = errors.get(access.iam_principal)
+        if error:
+            results[index] = {"status": FAILED, "error": str(error)}
+        else:
+            granted.append(access)
+            results[index] = {"status": UPDATED if access.pk else GRANTED}
+
+    save_accesses(granted)
+
+    return results
+
+
+def has_permission(requester, grant):
+    bucket = grant["s3bucket"]
+    if grant.get("policy"):
+        return requester.has_perm("api.create_policys3bucket", bucket)
+
+    if grant.get("is_admin") and not requester.has_perm("api.add_s3bucket_admin", bucket):
+        return False
+
+    return requester.has_perm("api.create_users3bucket", bucket)
+
+
+def access_key(grant):
+    if grant.get("policy"):
+        return (PolicyS3Bucket, grant["policy"].pk, grant["s3bucket"].pk)
+    return (UserS3Bucket, grant["user"].pk, grant["s3bucket"].pk)
+
+
+def existing_accesses(grants):
+    """
+    Returns the access records already granting any of `grants`, by key
+    """
+    buckets = {grant["s3bucket"].pk for grant in grants}
+    users = {grant["user"].pk for grant in grants if grant.get("user")}
+    policies = {grant["policy"].pk for grant in grants if grant.get("policy")}
+
+    existing = {}
+    for access in UserS3Bucket.objects.filter(user__in=users, s3bucket__in=buckets):
+        existing[(UserS3Bucket, access.user_id, access.s3bucket_id)] = access
+    for access in PolicyS3Bucket.objects.filter(policy__in=policies, s3bucket__in=buckets):
+        existing[(PolicyS3Bucket, access.policy_id, access.s3bucket_id)] = access
+    return existing
+
+
+def build_access(grant, access=None):
+    """
+    Returns the access record for `grant`, updated but not saved
+    """
+    if grant.get("policy"):
+        access = access or PolicyS3Bucket()
+        access.policy = grant["policy"]
+    else:
+        access = access or UserS3Bucket()
+        access.user = grant["user"]
+        access.is_admin = grant.get("is_admin", False)
+
+    # related objects are set from the grant, so that the IAM work running in
+    # other threads doesn't need to query the database
+    access.s3bucket = grant["s3bucket"]
+    access.access_level = grant["access_level"]
+    access.paths = grant.get("paths", [])
+    return access
+
+
+@atomic
+def save_accesses(accesses):
+    for model, fields in (
+        (UserS3Bucket, ["access_level", "paths", "is_admin", "modified"]),
+        (PolicyS3Bucket, ["access_level", "paths", "modified"]),
+    ):
+        new = [access for access in accesses if isinstance(access, model) and not access.pk]
+        existing = [access for access in accesses if isinstance(access, model) and access.pk]
+
+        model.objects.bulk_create(new)
+
+        # bulk_update() doesn't call pre_save(), which sets `modified`
+        now = timezone.now()
+        for access in existing:
+            access.modified = now
+        model.objects.bulk_update(existing, fields)
+
+    # access is now in place, pending older changes must not undo it
+    outbox.discard([access.outbox_dedupe_key for access in accesses])
@@ -1,15 +1,30 @@
+import base64
+from bisect import bisect_left
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+import json
 import logging
 import secrets
+import threading
+import time
+import uuid
 
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
 from github import Github, GithubException
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
 
-from controlpanel.api import auth0, aws
+from controlpanel.api import auth0, aws, informer
 from controlpanel.api.aws import iam_arn, s3_arn  # keep for tests
-from controlpanel.api.helm import HelmError, helm
+from controlpanel.api.aws import BucketProvisioningError, compact_s3_access
+from controlpanel.api.helm import HelmError, decode_release, helm
 from controlpanel.api.kubernetes import KubernetesClient
-from controlpanel.utils import github_repository_name
+from controlpanel.utils import github_repository_name, sanitize_dns_label
 
 
 log = logging.getLogger(__name__)
@@ -25,6 +40,25 @@ TOOL_STATUS_UNKNOWN = "Unknown"
 HOME_RESETTING = "Resetting"
 HOME_RESET_FAILED = "Failed"
 HOME_RESET = "Reset"
+USER_DELETING = "Deleting"
+USER_DELETE_FAILED = "Failed"
+USER_DELETED = "Deleted"
+USER_PROVISIONING = "Provisioning"
+USER_PROVISION_FAILED = "Failed"
+USER_PROVISIONED = "Provisioned"
+
+# seconds helm is given to apply a tool's release (it doesn't wait for the
+# tool to be ready, see `TOOL_READY_TIMEOUT`)
+TOOL_DEPLOY_TIMEOUT = 600
+
+# seconds a tool's Deployment is watched for it to finish deploying
+TOOL_READY_TIMEOUT = 600
+
+# seconds before a tool's Deployment is listed again after its watch failed
+TOOL_WATCH_RETRY_DELAY = 5
+
+# seconds helm is given to install each of a new user's releases
+USER_RELEASE_TIMEOUT = 600
 
 
 class HomeDirectoryResetError(Exception):
@@ -34,6 +68,54 @@ class HomeDirectoryResetError(Exception):
     pass
 
 
+class ProvisioningError(Exception):
+    """
+    Raised when some of the steps setting up a user's resources failed
+
+    `errors` has the failures by step, the other steps completed.
+    """
+
+    def __init__(self, name, errors):
+        self.errors = errors
+        failures = ", ".join(f"{step}: {error}" for step, error in errors.items())
+        super().__init__(f"Failed provisioning {name}: {failures}")
+
+
+class DeprovisioningError(Exception):
+    """
+    Raised when some of the steps tearing down a user's resources failed
+
+    `errors` has the failures by step, the other steps completed.
+    """
+
+    def __init__(self, name, errors):
+        self.errors = errors
+        failures = ", ".join(f"{step}: {error}" for step, error in errors.items())
+        super().__init__(f"Failed deprovisioning {name}: {failures}")
+
+
+def run_concurrently(steps, max_workers, progress=None):
+    """
+    Run the callables in `steps` (a dict of step names to callables) with a
+    pool of `max_workers` threads and return the errors of the steps which
+    failed, by name
+
+    `progress(step, completed, total, error)` is called as each step ends.
+    """
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(func): step for step, func in steps.items()}
+        for completed, future in enumerate(as_completed(futures), 1):
+            step = futures[future]
+            error = future.exception()
+            if error:
+                log.error(f"Failed {step}: {error}")
+                errors[step] = error
+            if progress:
+                progress(step, completed, len(steps), error)
+    return errors
+
+
 class User:
     """
     Wraps User model to provide convenience methods to access K8S and AWS
@@ -49,11 +131,45 @@ class User:
     def iam_role_name(self):
         return f"{settings.ENV}_user_{self.user.username.lower()}"
 
-    def create(self):
+    @property
+    def release_names(self):
+        """
+        Names of the helm releases installed for the user when created, in
+        the order they're installed
+        """
+        return [f"init-user-{self.user.slug}", f"config-user-{self.user.slug}"]
+
+    PROVISIONING_CACHE_KEY = "user-provisioning:{}"
+    PROVISIONING_CACHE_TIMEOUT = 60 * 60
+
+    def create(self, progress=None):
+        """
+        Create the user's IAM role and install their helm releases
+
+        The role is created while the releases are installed (see
+        `run_concurrently()`), calling `progress` as each is done. Raises
+        `ProvisioningError` once the other steps are done if any failed.
+        """
+        steps = {
+            f"create role {self.iam_role_name}": self.create_iam_role,
+            f"install releases for {self.user.slug}": self.install_releases,
+        }
+        errors = run_concurrently(steps, len(steps), progress)
+        if errors:
+            raise ProvisioningError(self.user.username, errors)
+
+    def create_iam_role(self):
         aws.create_user_role(self.user)
+        role_catalogue.invalidate()
 
+    def install_releases(self):
+        """
+        Install the init-user release, then the config-user release in the
+        namespace it creates, waiting for helm
+        """
+        init_user, config_user = self.release_names
         helm.upgrade_release(
-            f"init-user-{self.user.slug}",
+            init_user,
             f"{settings.HELM_REPO}/init-user",
             f"--set="
             + (
@@ -64,14 +180,59 @@ class User:
                 f"Fullname={self.user.name},"
                 f"Username={self.user.slug}"
             ),
+            timeout=USER_RELEASE_TIMEOUT,
         )
         helm.upgrade_release(
-            f"config-user-{self.user.slug}",
+            config_user,
             f"{settings.HELM_REPO}/config-user",
             f"--namespace={self.k8s_namespace}",
             f"--set=Username={self.user.slug}",
+            timeout=USER_RELEASE_TIMEOUT,
         )
 
+    def provision(self):
+        """
+        Create the user's resources (see `create()`), keeping track of the
+        progress for the tools page and sending it to the user as
+        `userProvisioning` events
+        """
+        def progress(step, completed, total, error):
+            self.report_provisioning(USER_PROVISIONING, completed=completed, total=total)
+
+        self.report_provisioning(USER_PROVISIONING)
+        try:
+            self.create(progress=progress)
+        except ProvisioningError:
+            self.report_provisioning(USER_PROVISION_FAILED)
+            raise
+        self.report_provisioning(USER_PROVISIONED)
+
+    @property
+    def provisioning_status(self):
+        """
+        Returns the status of the user's provisioning, or `None` when it's
+        not in progress or recently ended
+        """
+        return cache.get(self.PROVISIONING_CACHE_KEY.format(self.user.pk))
+
+    def report_provisioning(self, status, **details):
+        cache.set(
+            self.PROVISIONING_CACHE_KEY.format(self.user.pk),
+            status,
+            timeout=self.PROVISIONING_CACHE_TIMEOUT,
+        )
+        try:
+            async_to_sync(get_channel_layer().group_send)(
+                sanitize_dns_label(self.user.auth0_id),
+                {
+                    "type": "sse.event",
+                    "event": "userProvisioning",
+                    "data": json.dumps({"status": status, **details}),
+                },
+            )
+        except Exception as error:
+            log.warning(f"Failed sending provisioning status of {self.user}: {error}")
+
     def reset_home(self):
         """
         Reset the user's home directory.
@@ -83,10 +244,31 @@ class User:
             f"--set=Username={self.user.slug}",
         )
 
-    def delete(self):
-        aws.delete_role(self.user.iam_role_name)
-        helm.delete(helm.list_releases(f"--namespace={self.k8s_namespace}"))
-        helm.delete(f"init-user-{self.user.slug}")
+    def delete_iam_role(self):
+        aws.delete_role(self.iam_role_name)
+        role_catalogue.invalidate()
+
+    def delete(self, progress=None):
+        """
+        Delete the user's IAM role and helm releases
+
+        The role and each release are deleted concurrently, by a pool of
+        `DEPROVISIONING_MAX_WORKERS` threads, calling `progress` as each is
+        done (see `run_concurrently()`). Raises `DeprovisioningError` once
+        the other steps are done if any failed.
+        """
+        releases = [
+            *helm.list_releases(f"--namespace={self.k8s_namespace}"),
+            f"init-user-{self.user.slug}",
+        ]
+
+        steps = {f"delete role {self.iam_role_name}": self.delete_iam_role}
+        for release in releases:
+            steps[f"delete release {release}"] = partial(helm.delete, True, release)
+
+        errors = run_concurrently(steps, settings.DEPROVISIONING_MAX_WORKERS, progress)
+        if errors:
+            raise DeprovisioningError(self.user.username, errors)
 
     def grant_bucket_access(self, bucket_arn, access_level, path_arns=[]):
         aws.grant_bucket_access(self.iam_role_name, bucket_arn, access_level, path_arns)
@@ -111,6 +293,7 @@ class App:
 
     def create_iam_role(self):
         aws.create_app_role(self.app)
+        role_catalogue.invalidate()
 
     def grant_bucket_access(self, bucket_arn, access_level, path_arns):
         aws.grant_bucket_access(self.iam_role_name, bucket_arn, access_level, path_arns)
@@ -120,6 +303,7 @@ class App:
 
     def delete(self):
         aws.delete_role(self.iam_role_name)
+        role_catalogue.invalidate()
         auth0.AuthorizationAPI().delete_group(group_name=self.app.slug)
         helm.delete(True, self.app.release_name)
 
@@ -148,8 +332,12 @@ class S3Bucket:
     def arn(self):
         return s3_arn(self.bucket.name)
 
-    def create(self):
-        return aws.create_bucket(self.bucket.name, self.bucket.is_data_warehouse)
+    def create(self, completed=()):
+        return aws.create_bucket(
+            self.bucket.name,
+            self.bucket.is_data_warehouse,
+            completed,
+        )
 
     def mark_for_archival(self):
         aws.tag_bucket(self.bucket.name, {"to-archive": "true"})
@@ -180,6 +368,12 @@ class RoleGroup:
             self.policy.name, self.policy.path,
         )
 
+    def add_member(self, role_name):
+        aws.attach_group_member(self.arn, role_name)
+
+    def remove_member(self, role_name):
+        aws.detach_group_member(self.arn, role_name)
+
     def update_members(self):
         aws.update_group_members(
             self.arn, {user.iam_role_name for user in self.policy.users.all()},
@@ -195,18 +389,259 @@ class RoleGroup:
         aws.revoke_group_bucket_access(self.arn, bucket_arn)
 
 
+def batch_policy_updates():
+    """
+    Context manager grouping S3 access grants/revokes so that each affected
+    role or group policy is read and written only once
+    """
+    return aws.batch_policy_updates()
+
+
+def grant_bucket_access_in_bulk(accesses):
+    """
+    Grant the given S3 bucket access records concurrently
+
+    Grants are grouped by IAM role or group, and each group is applied as one
+    batch by a pool of `IAM_MAX_WORKERS` threads. Returns the errors of the
+    roles and groups which failed, by `iam_principal`.
+    """
+    by_principal = defaultdict(list)
+    for access in accesses:
+        by_principal[access.iam_principal].append(access)
+
+    def grant(principal_accesses):
+        with batch_policy_updates():
+            for access in principal_accesses:
+                access.grant_bucket_access()
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=settings.IAM_MAX_WORKERS) as executor:
+        futures = {
+            executor.submit(grant, principal_accesses): principal
+            for principal, principal_accesses in by_principal.items()
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as error:
+                principal = futures[future]
+                log.error(f"Failed granting bucket access to {principal}: {error}")
+                errors[principal] = error
+    return errors
+
+
+def read_s3_access(principal):
+    """
+    Returns the S3 access resources granted to an IAM role or group, by
+    statement ID, where `principal` is the `(kind, name)` of an access record
+    """
+    return aws.read_s3_access(*principal)
+
+
+def revoke_role_bucket_access(role_name, bucket_arn):
+    aws.revoke_bucket_access(role_name, bucket_arn)
+
+
+def revoke_group_bucket_access(group_arn, bucket_arn):
+    aws.revoke_group_bucket_access(group_arn, bucket_arn)
+
+
 def create_parameter(name, value, role, description):
     return aws.create_parameter(name, value, role, description)
 
 
+def create_parameters(parameters):
+    return aws.create_parameters(parameters)
+
+
 def delete_parameter(name):
     aws.delete_parameter(name)
 
 
+def delete_parameters(names):
+    aws.delete_parameters(names)
+
+
+def get_parameters(names):
+    # only their existence is needed, never their (secret) values
+    return aws.get_parameters(names, with_decryption=False)
+
+
+def describe_parameters(names):
+    return aws.describe_parameters(names)
+
+
 def list_role_names():
     return aws.list_role_names()
 
 
+RELEASES_PAGE_SIZE = 500
+
+
+def get_releases(namespace=None, names=None, include_deleted=False):
+    """
+    Returns the current revision of helm releases, by name, read from Tiller's
+    storage (`ConfigMap`s or `Secret`s in `TILLER_NAMESPACE`) rather than by
+    running helm
+
+    Releases can be filtered by `namespace` and by `names`. As in
+    `helm list`, deleted releases are only returned when `include_deleted`.
+    """
+    selector = ["OWNER=TILLER", "STATUS!=SUPERSEDED"]
+    if not include_deleted:
+        selector.append("STATUS!=DELETED")
+    if names is not None:
+        if not names:
+            return {}
+        selector.append(f"NAME in ({','.join(sorted(names))})")
+
+    k8s = KubernetesClient(use_cpanel_creds=True)
+    if settings.TILLER_STORAGE == "secret":
+        list_objects = k8s.CoreV1Api.list_namespaced_secret
+    else:
+        list_objects = k8s.CoreV1Api.list_namespaced_config_map
+
+    releases = {}
+    token = None
+    while True:
+        kwargs = {"_continue": token} if token else {}
+        page = list_objects(
+            settings.TILLER_NAMESPACE,
+            label_selector=",".join(selector),
+            limit=RELEASES_PAGE_SIZE,
+            **kwargs,
+        )
+        for item in page.items:
+            labels = item.metadata.labels
+            revision = int(labels.get("VERSION", 0))
+            # older failed revisions aren't marked as superseded
+            current = releases.get(labels["NAME"])
+            if current and current.revision > revision:
+                continue
+
+            encoded = item.data["release"]
+            if settings.TILLER_STORAGE == "secret":
+                encoded = base64.b64decode(encoded)
+            release = decode_release(encoded, status=labels.get("STATUS"))
+            if namespace and release.namespace != namespace:
+                continue
+            releases[release.name] = release
+
+        token = page.metadata._continue
+        if not token:
+            return releases
+
+
+def release_exists(name):
+    """
+    Returns whether the helm release `name` is installed
+    """
+    return name in get_releases(names=[name])
+
+
+class RoleCatalogue:
+    """
+    Sorted index of IAM role names, for role pickers
+
+    Listing IAM roles pages through every role in the account, so the sorted
+    list is shared by all processes through the Django cache and each process
+    keeps it in memory until another process replaces it. The list is
+    refreshed by the `background_tasks` worker once it's older than
+    `IAM_ROLE_CATALOGUE_TTL` seconds, or when a role is created or deleted;
+    until then the previous list is served.
+    """
+
+    CACHE_KEY = "iam-role-catalogue"
+    NAMES_CACHE_KEY = "iam-role-catalogue:names"
+    REFRESH_LOCK_KEY = "iam-role-catalogue:refreshing"
+    REFRESH_LOCK_TIMEOUT = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._names = []
+
+    def names(self):
+        """
+        Returns all the role names, sorted
+        """
+        entry = cache.get(self.CACHE_KEY)
+        names = None
+        if entry is None:
+            entry, names = self.refresh()
+
+        elif entry["stale"] or time.time() - entry["refreshed_at"] > settings.IAM_ROLE_CATALOGUE_TTL:
+            self.schedule_refresh()
+
+        with self._lock:
+            if entry["generation"] != self._generation:
+                if names is None:
+                    names = cache.get(self.NAMES_CACHE_KEY)
+                if names is None:
+                    entry, names = self.refresh()
+                self._names = names
+                self._generation = entry["generation"]
+            return self._names
+
+    def search(self, query="", prefixes=None, offset=0, limit=None):
+        """
+        Returns the total number of role names starting with any of
+        `prefixes` and containing `query`, and the requested page of them
+        """
+        names = self.names()
+
+        if prefixes is not None:
+            matching = set()
+            for prefix in prefixes:
+                start = bisect_left(names, prefix)
+                end = bisect_left(names, prefix + chr(0x10FFFF), start)
+                matching.update(names[start:end])
+            names = sorted(matching)
+
+        if query:
+            names = [name for name in names if query in name]
+
+        end = None if limit is None else offset + limit
+        return len(names), names[offset:end]
+
+    def refresh(self):
+        names = sorted(list_role_names())
+        entry = {
+            "generation": uuid.uuid4().hex,
+            "refreshed_at": time.time(),
+            "stale": False,
+        }
+        cache.set_many({self.NAMES_CACHE_KEY: names, self.CACHE_KEY: entry}, timeout=None)
+        cache.delete(self.REFRESH_LOCK_KEY)
+        return entry, names
+
+    def invalidate(self):
+        """
+        Mark the list as out of date, so that the next lookup triggers a
+        background refresh
+        """
+        entry = cache.get(self.CACHE_KEY)
+        if entry:
+            cache.set(self.CACHE_KEY, {**entry, "stale": True}, timeout=None)
+            # a refresh already running may have listed roles before the change
+            cache.delete(self.REFRESH_LOCK_KEY)
+
+    def schedule_refresh(self):
+        if not cache.add(self.REFRESH_LOCK_KEY, True, timeout=self.REFRESH_LOCK_TIMEOUT):
+            return
+
+        try:
+            async_to_sync(get_channel_layer().send)(
+                "background_tasks", {"type": "refresh_role_catalogue"},
+            )
+        except Exception as error:
+            # retried once the lock expires
+            log.warning(f"Failed scheduling IAM role catalogue refresh: {error}")
+
+
+role_catalogue = RoleCatalogue()
+
+
 def get_repositories(user):
     repos = []
     github = Github(user.github_api_token)
@@ -269,7 +704,7 @@ class ToolDeployment:
         """
 
         old_release_name = f"{self.user.slug}-{self.chart_name}"
-        if old_release_name in helm.list_releases(old_release_name):
+        if release_exists(old_release_name):
             helm.delete(True, old_release_name)
 
     def _set_values(self, **kwargs):
@@ -299,20 +734,40 @@ class ToolDeployment:
 
         return set_values
 
+    def _upgrade_args(self, **kwargs):
+        return [
+            self.release_name,
+            f"{settings.HELM_REPO}/{self.chart_name}",  # XXX assumes repo name
+            f"--version",
+            self.tool.version,
+            f"--namespace",
+            self.k8s_namespace,
+            *self._set_values(**kwargs),
+        ]
+
     def install(self, **kwargs):
         self._delete_legacy_release()
 
         try:
-            set_values = self._set_values(**kwargs)
-
-            return helm.upgrade_release(
-                self.release_name,
-                f"{settings.HELM_REPO}/{self.chart_name}",  # XXX assumes repo name
-                f"--version",
-                self.tool.version,
-                f"--namespace",
-                self.k8s_namespace,
-                *set_values,
+            return helm.upgrade_release(*self._upgrade_args(**kwargs))
+
+        except HelmError as error:
+            raise ToolDeploymentError(error)
+
+    async def deploy(self, on_progress=None, **kwargs):
+        """
+        Install the tool and return once helm has applied its release,
+        without waiting for it to be ready (see `watch_status()`), calling
+        `on_progress` with each section of helm's output as it's written (see
+        `Helm.upgrade_release_async()`)
+        """
+        await sync_to_async(self._delete_legacy_release)()
+
+        try:
+            return await helm.upgrade_release_async(
+                *self._upgrade_args(**kwargs),
+                timeout=TOOL_DEPLOY_TIMEOUT,
+                on_section=on_progress,
             )
 
         except HelmError as error:
@@ -332,18 +787,37 @@ class ToolDeployment:
 
     @classmethod
     def get_deployments(cls, user, id_token, search_name=None, search_version=None):
-        deployments = []
-        k8s = KubernetesClient(id_token=id_token)
-        results = k8s.AppsV1Api.list_namespaced_deployment(user.k8s_namespace)
-        for deployment in results.items:
+        """
+        Returns the Deployments in the user's namespace, read from the
+        shared Deployment informer when it's in sync
+
+        The informer lists Deployments with the control panel's credentials,
+        so only the namespace of `user` (the user making the request) is
+        ever read from it. Otherwise they're listed with the user's
+        `id_token`.
+        """
+        deployments = None
+        if settings.ENABLED["deployment_informer"]:
+            deployments = informer.deployments.list(user.k8s_namespace)
+
+        if deployments is None:
+            k8s = KubernetesClient(id_token=id_token)
+            deployments = k8s.AppsV1Api.list_namespaced_deployment(user.k8s_namespace).items
+
+        return cls.filter_deployments(deployments, search_name, search_version)
+
+    @staticmethod
+    def filter_deployments(deployments, search_name=None, search_version=None):
+        matching = []
+        for deployment in deployments:
             app_name = deployment.metadata.labels["app"]
             _, version = deployment.metadata.labels["chart"].rsplit("-", 1)
             if search_name and search_name not in app_name:
                 continue
             if search_version and not version.startswith(search_version):
                 continue
-            deployments.append(deployment)
-        return deployments
+            matching.append(deployment)
+        return matching
 
     def get_deployment(self, id_token):
         deployments = self.__class__.get_deployments(
@@ -352,7 +826,9 @@ class ToolDeployment:
             search_name=self.chart_name,
             # search_version=tool_deployment.tool.version,
         )
+        return self._single_deployment(deployments)
 
+    def _single_deployment(self, deployments):
         if not deployments:
             raise ObjectDoesNotExist(self)
 
@@ -389,8 +865,101 @@ class ToolDeployment:
             log.warning(f"Multiple objects returned for {self!r}")
             return TOOL_STATUS_UNKNOWN
 
+        return self.deployment_status(deployment)
+
+    def watch_status(self, id_token, timeout=TOOL_READY_TIMEOUT):
+        """
+        Yields the status of the tool's `Deployment`, and the `Deployment`,
+        each time the status changes, until it's no longer deploying
+
+        The `Deployment` is found with one list of the namespace, then
+        watched from that list's `resourceVersion` with a field selector on
+        its name, so the API server sends its changes rather than being
+        polled. Stops after `timeout` seconds, even if the tool is still
+        deploying.
+        """
+        deadline = time.monotonic() + timeout
+        k8s = KubernetesClient(id_token=id_token)
+        status = None
+
+        while True:
+            results = k8s.AppsV1Api.list_namespaced_deployment(self.k8s_namespace)
+            try:
+                deployment = self._single_deployment(
+                    self.filter_deployments(results.items, search_name=self.chart_name),
+                )
+            except ObjectDoesNotExist:
+                log.warning(f"{self!r} not found")
+                yield TOOL_NOT_DEPLOYED, None
+                return
+            except MultipleObjectsReturned:
+                log.warning(f"Multiple objects returned for {self!r}")
+                yield TOOL_STATUS_UNKNOWN, None
+                return
+
+            for event_type, deployment in self._watch_deployment(
+                k8s, deployment, results.metadata.resource_version, deadline,
+            ):
+                if event_type == "DELETED":
+                    yield TOOL_NOT_DEPLOYED, None
+                    return
+
+                current = self.deployment_status(deployment)
+                if current != status:
+                    status = current
+                    yield status, deployment
+                if status != TOOL_DEPLOYING:
+                    return
+
+            if time.monotonic() >= deadline:
+                log.warning(f"Timed out watching {self!r}")
+                return
+            # the watch expired (its resourceVersion is too old) or failed,
+            # list again
+
+    def _watch_deployment(self, k8s, deployment, resource_version, deadline):
+        """
+        Yields the listed `deployment`, then its changes as `(event type,
+        deployment)` pairs until `deadline`, or until `resource_version` is
+        too old to watch from
+        """
+        yield "ADDED", deployment
+
+        stream = watch.Watch()
+        while time.monotonic() < deadline:
+            try:
+                for event in stream.stream(
+                    k8s.AppsV1Api.list_namespaced_deployment,
+                    self.k8s_namespace,
+                    field_selector=f"metadata.name={deployment.metadata.name}",
+                    resource_version=resource_version,
+                    timeout_seconds=max(1, int(deadline - time.monotonic())),
+                ):
+                    if event["type"] == "ERROR":
+                        log.debug(f"Watch of {self!r} ended: {event['raw_object']}")
+                        if event["raw_object"].get("code") != 410:
+                            # not just expired, don't hammer the API server
+                            time.sleep(min(
+                                TOOL_WATCH_RETRY_DELAY,
+                                max(0, deadline - time.monotonic()),
+                            ))
+                        return
+                    deployment = event["object"]
+                    resource_version = deployment.metadata.resource_version
+                    yield event["type"], deployment
+
+            except ApiException as error:
+                if error.status == 410:
+                    return
+                raise
+
+    def deployment_status(self, deployment):
+        """
+        Returns the status of the tool from its `Deployment`'s conditions
+        """
         conditions = {
-            condition.type: condition for condition in deployment.status.conditions
+            condition.type: condition
+            for condition in deployment.status.conditions or []
         }
 
         if "Available" in conditions:
@@ -1,8 +1,21 @@
+import asyncio
+import base64
+from collections import deque, namedtuple
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+import fcntl
+import gzip
+import inspect
+import io
+from itertools import count
 import logging
 import os
+import pickle
 import re
 import subprocess
+import tempfile
+import threading
+import time
 
 from django.conf import settings
 from rest_framework.exceptions import APIException
@@ -11,6 +24,9 @@ import yaml
 
 log = logging.getLogger(__name__)
 
+# libyaml parses the repository index much faster, when available
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 
 class HelmError(APIException):
     status_code = 500
@@ -18,7 +34,185 @@ class HelmError(APIException):
     default_detail = "Error executing Helm command"
 
 
+class HelmBusyError(HelmError):
+    status_code = 503
+    default_code = "helm_busy"
+    default_detail = "Too many Helm commands queued, try again later"
+
+
+class HelmPool(object):
+    """
+    Limits the number of helm processes running at once
+
+    Commands beyond the global or per-namespace limit wait in a queue. When a
+    process finishes, the next command admitted is the oldest command of the
+    owner (see `Helm.execute()`) served least recently, so a burst of commands
+    for one user doesn't hold up everyone else. Commands are rejected with a
+    `HelmBusyError` when the queue is full or they've waited too long.
+
+    Owners are only remembered while they have commands queued or running.
+    """
+
+    RECENT_WAITS = 100
+    SLOW_WAIT_SECONDS = 10
+
+    def __init__(self, max_processes=None, max_per_namespace=None, max_queued=None, timeout=None):
+        self.max_processes = max_processes or settings.HELM_MAX_PROCESSES
+        self.max_per_namespace = max_per_namespace or settings.HELM_MAX_PROCESSES_PER_NAMESPACE
+        self.max_queued = settings.HELM_MAX_QUEUED if max_queued is None else max_queued
+        self.timeout = timeout or settings.HELM_QUEUE_TIMEOUT
+        self._condition = threading.Condition()
+        self._sequence = count()
+        self._admissions = count()
+        self._running = 0
+        self._namespaces = {}
+        self._owners = {}
+        self._queue = []
+        self._served = {}
+        self._waits = deque(maxlen=self.RECENT_WAITS)
+
+    def acquire(self, namespace=None, owner=None):
+        """
+        Waits for a process slot and returns it, to be passed to `release()`
+        """
+        ticket = {
+            "sequence": next(self._sequence),
+            "namespace": namespace,
+            "owner": owner,
+            "queued_at": time.monotonic(),
+        }
+        with self._condition:
+            if len(self._queue) >= self.max_queued:
+                raise HelmBusyError()
+
+            self._queue.append(ticket)
+            deadline = ticket["queued_at"] + self.timeout
+            while self._next() is not ticket:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._condition.wait(remaining):
+                    if self._next() is ticket:
+                        break
+                    self._queue.remove(ticket)
+                    self._forget(owner)
+                    # this ticket may have been blocking others of its owner
+                    self._condition.notify_all()
+                    log.warning(f"Helm command rejected after waiting {self.timeout}s")
+                    raise HelmBusyError()
+
+            self._queue.remove(ticket)
+            self._running += 1
+            if namespace:
+                self._namespaces[namespace] = self._namespaces.get(namespace, 0) + 1
+            self._owners[owner] = self._owners.get(owner, 0) + 1
+            self._served[owner] = next(self._admissions)
+
+            waited = time.monotonic() - ticket["queued_at"]
+            self._waits.append(waited)
+            if waited > self.SLOW_WAIT_SECONDS:
+                log.warning(f"Helm command waited {waited:.1f}s for a process")
+
+            # other commands may be admitted too
+            self._condition.notify_all()
+        return ticket
+
+    def release(self, ticket):
+        with self._condition:
+            self._running -= 1
+            namespace = ticket["namespace"]
+            if namespace:
+                self._namespaces[namespace] -= 1
+                if not self._namespaces[namespace]:
+                    del self._namespaces[namespace]
+            owner = ticket["owner"]
+            self._owners[owner] -= 1
+            if not self._owners[owner]:
+                del self._owners[owner]
+            self._forget(owner)
+            self._condition.notify_all()
+
+    def _forget(self, owner):
+        """
+        Drops when `owner` was last served once it has no commands queued or
+        running, so that `_served` doesn't grow with every owner ever seen
+        """
+        if owner in self._owners:
+            return
+        if any(ticket["owner"] == owner for ticket in self._queue):
+            return
+        self._served.pop(owner, None)
+
+    def _next(self):
+        """
+        Returns the queued ticket to admit next, if any can be admitted
+        """
+        if self._running >= self.max_processes:
+            return None
+
+        eligible = [
+            ticket for ticket in self._queue
+            if not ticket["namespace"] or
+            self._namespaces.get(ticket["namespace"], 0) < self.max_per_namespace
+        ]
+        if not eligible:
+            return None
+
+        return min(
+            eligible,
+            key=lambda ticket: (self._served.get(ticket["owner"], -1), ticket["sequence"]),
+        )
+
+    def stats(self):
+        with self._condition:
+            now = time.monotonic()
+            waits = list(self._waits)
+            return {
+                "running": self._running,
+                "queued": len(self._queue),
+                "namespaces": dict(self._namespaces),
+                "owners": len(self._served),
+                "oldest_queued_seconds": max(
+                    [now - ticket["queued_at"] for ticket in self._queue], default=0,
+                ),
+                "recent_average_wait_seconds": sum(waits) / len(waits) if waits else 0,
+                "recent_max_wait_seconds": max(waits, default=0),
+            }
+
+
+def command_option(args, option):
+    for index, arg in enumerate(args):
+        if arg.startswith(f"{option}="):
+            return arg.split("=", 1)[1]
+        if arg == option and index + 1 < len(args):
+            return args[index + 1]
+    return None
+
+
+def command_namespace(args):
+    return command_option(args, "--namespace")
+
+
+def command_owner(args, namespace):
+    """
+    Returns who a helm command is run for, used to share the pool fairly
+
+    User resources are in the user's namespace; releases without a namespace
+    (e.g. `init-user-<username>`) are identified by their name.
+    """
+    if namespace:
+        return namespace
+
+    for arg in args[1:]:
+        if not arg.startswith("-"):
+            return arg
+    return None
+
+
+pool = HelmPool()
+
+
 class Helm(object):
+    LIST_PAGE_SIZE = 256
+
     @classmethod
     def execute(cls, *args, check=True, **kwargs):
         should_wait = False
@@ -26,6 +220,9 @@ class Helm(object):
             should_wait = True
             timeout = kwargs.pop("timeout")
 
+        namespace = command_namespace(args)
+        ticket = pool.acquire(namespace, command_owner(args, namespace))
+
         try:
             log.debug(" ".join(["helm", *args]))
             env = os.environ.copy()
@@ -42,24 +239,35 @@ class Helm(object):
             )
 
         except ValueError as invalid_args_err:
+            pool.release(ticket)
             log.error(invalid_args_err)
             raise HelmError(invalid_args_err)
 
         except subprocess.CalledProcessError as execution_err:
+            pool.release(ticket)
             error_output = execution_err.stderr.read()
             log.error(error_output)
             raise HelmError(error_output)
 
         except OSError as file_not_found:
+            pool.release(ticket)
             log.error(str(file_not_found))
             raise HelmError(file_not_found)
 
         if should_wait:
+            # read the output while waiting, as helm blocks once a pipe is full
             try:
-                proc.wait(timeout)
+                output, error_output = proc.communicate(timeout=timeout)
             except subprocess.TimeoutExpired as timed_out:
                 log.warning(timed_out)
+                proc.kill()
+                proc.communicate()
                 raise HelmError(timed_out)
+            finally:
+                pool.release(ticket)
+            proc.stdout, proc.stderr = io.StringIO(output), io.StringIO(error_output)
+        else:
+            release_on_exit(proc, ticket)
 
         if check and proc.returncode:
             error_output = proc.stderr.read()
@@ -68,8 +276,84 @@ class Helm(object):
 
         return proc
 
-    def upgrade_release(self, release, chart, *args):
-        HelmRepository.update()
+    @classmethod
+    async def execute_async(cls, *args, timeout=None, on_line=None):
+        """
+        Runs helm without blocking, calling `on_line` (which may be a
+        coroutine function) with each line of its output as it's written,
+        and returns the output
+
+        Output is read as it's written, so helm never blocks on a full pipe.
+        Helm is killed if it runs for longer than `timeout` seconds.
+        """
+        loop = asyncio.get_event_loop()
+        namespace = command_namespace(args)
+        acquire = loop.run_in_executor(
+            None, pool.acquire, namespace, command_owner(args, namespace),
+        )
+        try:
+            # shielded, so the slot is still known if it's acquired after the
+            # caller was cancelled
+            ticket = await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            acquire.add_done_callback(release_acquired)
+            raise
+
+        try:
+            log.debug(" ".join(["helm", *args]))
+            env = os.environ.copy()
+            # helm checks for existence of DEBUG env var
+            if "DEBUG" in env:
+                del env["DEBUG"]
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    "helm",
+                    *args,
+                    stderr=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    env=env,
+                )
+            except OSError as file_not_found:
+                log.error(str(file_not_found))
+                raise HelmError(file_not_found)
+
+            async def read_output():
+                lines = []
+                async for line in proc.stdout:
+                    line = line.decode("utf8")
+                    lines.append(line)
+                    if on_line:
+                        result = on_line(line)
+                        if inspect.isawaitable(result):
+                            await result
+                return "".join(lines)
+
+            try:
+                output, error_output, _ = await asyncio.wait_for(
+                    asyncio.gather(read_output(), proc.stderr.read(), proc.wait()),
+                    timeout,
+                )
+            except asyncio.TimeoutError:
+                message = f"helm {args[0]} timed out after {timeout}s"
+                log.warning(message)
+                raise HelmError(message)
+            finally:
+                if proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+
+        finally:
+            pool.release(ticket)
+
+        if proc.returncode:
+            error_output = error_output.decode("utf8")
+            log.warning(error_output)
+            raise HelmError(error_output)
+
+        return output
+
+    def upgrade_release(self, release, chart, *args, **kwargs):
+        HelmRepository.ensure_chart(chart, command_option(args, "--version"))
 
         return self.__class__.execute(
             "upgrade",
@@ -79,76 +363,266 @@ class Helm(object):
             release,
             chart,
             *args,
+            **kwargs,
+        )
+
+    async def upgrade_release_async(self, release, chart, *args, timeout=None, on_section=None):
+        """
+        Upgrades the release like `upgrade_release()`, but without blocking,
+        and returns the parsed output (see `parse_upgrade_output()`)
+
+        Helm returns once the release is applied, without `--wait`ing for
+        its resources to be ready, which callers watch for themselves.
+
+        `on_section` (which may be a coroutine function) is called with the
+        name of each section of the output and the output parsed so far, as
+        helm writes it.
+        """
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(
+            None, HelmRepository.ensure_chart, chart, command_option(args, "--version"),
         )
 
+        parser = UpgradeOutputParser()
+
+        def on_line(line):
+            section = parser.feed(line)
+            if section and on_section:
+                return on_section(section, parser.result())
+
+        await self.__class__.execute_async(
+            "upgrade",
+            "--install",
+            "--force",
+            release,
+            chart,
+            *args,
+            timeout=timeout,
+            on_line=on_line,
+        )
+        return parser.result()
+
     def delete(self, purge=True, *args):
         default_args = []
         if purge:
             default_args.append("--purge")
         self.__class__.execute("delete", *default_args, *args)
 
-    def list_releases(self, *args):
-        # TODO - use --max and --offset to paginate through releases
-        proc = self.__class__.execute("list", "-q", "--max=1024", *args, timeout=None)
-        return proc.stdout.read().split()
-
+    def list_releases(self, *args, page_size=LIST_PAGE_SIZE):
+        """
+        Yields the names of the releases matching `args`, e.g.
+        `--namespace=user-alice`, as they're read
 
-def parse_upgrade_output(output):
-    section = None
-    columns = None
-    last_deployed = None
-    namespace = ""
-    resource_type = None
-    resources = {}
-    notes = []
+        Releases are listed `page_size` at a time. The `--offset` of a page is
+        the last release of the previous one, which helm lists again first.
+        """
+        offset = None
+        while True:
+            offset_args = [f"--offset={offset}"] if offset else []
+            proc = self.__class__.execute(
+                "list", "-q", f"--max={page_size}", *offset_args, *args,
+            )
 
-    for line in output.split("\n"):
+            listed = 0
+            last = None
+            for line in proc.stdout:
+                release = line.strip()
+                if not release:
+                    continue
+                listed += 1
+                if release == offset:
+                    continue
+                last = release
+                yield release
+
+            proc.wait()
+            if proc.returncode:
+                error_output = proc.stderr.read()
+                log.warning(error_output)
+                raise HelmError(error_output)
+
+            if listed < page_size or last is None:
+                return
+            offset = last
+
+
+def release_acquired(acquire):
+    """
+    Release the process slot acquired by the `acquire` future, if any
+    """
+    if not acquire.cancelled() and acquire.exception() is None:
+        pool.release(acquire.result())
+
+
+def release_on_exit(proc, ticket):
+    """
+    Release the process slot of `ticket` when `proc` exits, without blocking
+
+    Processes still running after `HELM_PROCESS_TIMEOUT` seconds (e.g. blocked
+    writing output nobody reads) are killed, so they don't hold the slot until
+    the control panel exits.
+    """
+    def wait():
+        try:
+            proc.wait(timeout=settings.HELM_PROCESS_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            log.warning(
+                f"Killing {' '.join(proc.args)}, still running after "
+                f"{settings.HELM_PROCESS_TIMEOUT}s"
+            )
+            proc.kill()
+            proc.wait()
+        finally:
+            pool.release(ticket)
+
+    threading.Thread(target=wait, daemon=True).start()
+
+
+class UpgradeOutputParser(object):
+    """
+    Parses the output of `helm upgrade` a line at a time, see
+    `parse_upgrade_output()`
+    """
+
+    def __init__(self):
+        self.section = None
+        self.columns = None
+        self.last_deployed = None
+        self.namespace = ""
+        self.resource_type = None
+        self.resources = {}
+        self.notes = []
+
+    def feed(self, line):
+        """
+        Parses `line`, returning the name of the section it starts, if any
+        """
+        line = line.rstrip("\n")
 
         if line.startswith("LAST DEPLOYED:"):
-            last_deployed = datetime.strptime(
+            self.last_deployed = datetime.strptime(
                 line.split(":", 1)[1], " %a %b %d %H:%M:%S %Y",
             )
-            continue
+            return "LAST DEPLOYED"
 
         if line.startswith("NAMESPACE:"):
-            namespace = line.split(":", 1)[1].strip()
-            continue
+            self.namespace = line.split(":", 1)[1].strip()
+            return "NAMESPACE"
 
-        if line.startswith("==> ") and section == "RESOURCES":
-            resource_type = line.split(" ", 1)[1].strip()
-            continue
+        if line.startswith("==> ") and self.section == "RESOURCES":
+            self.resource_type = line.split(" ", 1)[1].strip()
+            return None
 
         if line.startswith("RESOURCES:"):
-            section = "RESOURCES"
-            continue
+            self.section = "RESOURCES"
+            return "RESOURCES"
 
-        if line.startswith("NAME") and resource_type:
-            columns = line.lower()
-            columns = re.split(r"\s+", columns)
-            continue
+        if line.startswith("NAME") and self.resource_type:
+            self.columns = line.lower()
+            self.columns = re.split(r"\s+", self.columns)
+            return None
 
-        if section == "NOTES":
-            notes.append(line)
-            continue
+        if self.section == "NOTES":
+            self.notes.append(line)
+            return None
 
         if line.startswith("NOTES:"):
-            section = "NOTES"
-            continue
+            self.section = "NOTES"
+            return "NOTES"
 
-        if section and line.strip():
+        if self.section and line.strip():
             row = re.split(r"\s+", line)
-            row = dict(zip(columns, row))
-            resources[resource_type] = [
-                *resources.get(resource_type, []),
+            row = dict(zip(self.columns, row))
+            self.resources[self.resource_type] = [
+                *self.resources.get(self.resource_type, []),
                 *[row],
             ]
+        return None
 
-    return {
-        "last_deployed": last_deployed,
-        "namespace": namespace,
-        "resources": resources,
-        "notes": "\n".join(notes),
-    }
+    def result(self):
+        return {
+            "last_deployed": self.last_deployed,
+            "namespace": self.namespace,
+            "resources": self.resources,
+            "notes": "\n".join(self.notes),
+        }
+
+
+def parse_upgrade_output(output):
+    parser = UpgradeOutputParser()
+    for line in output.split("\n"):
+        parser.feed(line)
+    return parser.result()
+
+
+Release = namedtuple(
+    "Release",
+    ["name", "namespace", "chart", "version", "app_version", "revision", "status"],
+)
+
+
+def protobuf_fields(data):
+    """
+    Yields the field numbers and values of a protobuf message
+
+    Values of length-delimited fields (strings, embedded messages) are bytes.
+    """
+    position = 0
+    while position < len(data):
+        key, position = protobuf_varint(data, position)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, position = protobuf_varint(data, position)
+        elif wire_type == 1:
+            value, position = data[position:position + 8], position + 8
+        elif wire_type == 2:
+            length, position = protobuf_varint(data, position)
+            value, position = data[position:position + length], position + length
+        elif wire_type == 5:
+            value, position = data[position:position + 4], position + 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+        yield number, value
+
+
+def protobuf_varint(data, position):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, position
+        shift += 7
+
+
+def decode_release(encoded, status=None):
+    """
+    Returns the `Release` stored by Tiller as `encoded`, a base64 encoded and
+    gzipped `hapi.release.Release` protobuf message
+
+    Only the fields needed are decoded, so the protobuf definitions aren't
+    needed: the release `name` (1), `chart` (3) `metadata` (1) `name` (1),
+    `version` (4) and `appVersion` (13), `version` (7, the revision) and
+    `namespace` (8). Tiller keeps the status in the storage labels.
+    """
+    data = base64.b64decode(encoded)
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+
+    release = dict(protobuf_fields(data))
+    chart = dict(protobuf_fields(release.get(3, b"")))
+    metadata = dict(protobuf_fields(chart.get(1, b"")))
+    return Release(
+        name=release.get(1, b"").decode(),
+        namespace=release.get(8, b"").decode(),
+        chart=metadata.get(1, b"").decode(),
+        version=metadata.get(4, b"").decode(),
+        app_version=metadata.get(13, b"").decode() or None,
+        revision=release.get(7, 0),
+        status=status,
+    )
 
 
 class Chart(object):
@@ -160,6 +634,22 @@ class Chart(object):
 
 
 class HelmRepository(object):
+    """
+    Index of the charts in the helm repository
+
+    `helm repo update` downloads the index into the helm home, which is shared
+    by all the processes of a container. Lookups use the index already
+    downloaded and, once it's older than `CACHE_FOR_MINUTES`, update it in a
+    background thread. Only upgrading to a chart version missing from the
+    index waits for an update.
+
+    Updates hold a lock on a file next to the index, so only one process runs
+    `helm repo update` at a time and the others load its result.
+
+    The YAML index is parsed once per update into a compact index of the
+    app version and description of each chart version, pickled next to it
+    for the other processes to load.
+    """
 
     CACHE_FOR_MINUTES = 30
 
@@ -167,29 +657,155 @@ class HelmRepository(object):
     REPO_PATH = os.path.join(
         HELM_HOME, "repository", "cache", f"{settings.HELM_REPO}-index.yaml",
     )
+    LOCK_PATH = f"{REPO_PATH}.lock"
+    INDEX_PATH = f"{REPO_PATH}.pickle"
 
     _updated_at = None
-    _repository = {}
+    _charts = {}
+    _updating = threading.Lock()
 
     @classmethod
     def update(cls, force=True):
         if force or cls._outdated():
-            Helm.execute("repo", "update", timeout=None)
+            downloaded_at = cls._downloaded_at()
+            with cls._lock(fcntl.LOCK_EX):
+                # skip the update if another process did it while we waited
+                if cls._downloaded_at() == downloaded_at:
+                    Helm.execute("repo", "update", timeout=None)
+            cls._load()
+
+    @classmethod
+    def update_in_background(cls):
+        if not cls._updating.acquire(blocking=False):
+            # already updating
+            return
+
+        def update():
+            try:
+                try:
+                    with cls._lock(fcntl.LOCK_EX | fcntl.LOCK_NB):
+                        Helm.execute("repo", "update", timeout=None)
+                except BlockingIOError:
+                    # another process is updating, its result is loaded by
+                    # the next lookup
+                    return
+                cls._load()
+            except Exception as error:
+                log.warning(f"Failed updating helm repository: {error}")
+            finally:
+                cls._updating.release()
+
+        threading.Thread(target=update, daemon=True).start()
+
+    @classmethod
+    def ensure_chart(cls, chart, version=None):
+        """
+        Updates the index if it doesn't have `version` of `chart`, e.g.
+        `mojanalytics/rstudio`, so that helm can find it
+        """
+        repo, _, name = chart.rpartition("/")
+        if repo != settings.HELM_REPO:
+            return
+
+        cls._refresh()
+        if version and version not in cls._charts.get(name, {}):
+            log.info(f"{chart} {version} not in helm repository index, updating")
+            cls.update()
+
+    @classmethod
+    def _refresh(cls):
+        """
+        Loads the index if it's not loaded or was updated by another process,
+        and updates it in the background when it's out of date
+        """
+        downloaded_at = cls._downloaded_at()
+        if downloaded_at is None:
+            cls.update()
+            return
+
+        if downloaded_at != cls._updated_at:
             cls._load()
-            cls._updated_at = datetime.utcnow()
+
+        if cls._outdated():
+            cls.update_in_background()
+
+    @classmethod
+    def _downloaded_at(cls):
+        try:
+            return datetime.utcfromtimestamp(os.path.getmtime(cls.REPO_PATH))
+        except OSError:
+            return None
+
+    @classmethod
+    @contextmanager
+    def _lock(cls, operation):
+        fd = os.open(cls.LOCK_PATH, os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, operation)
+            yield
+        finally:
+            os.close(fd)
 
     @classmethod
     def _load(cls):
-        # Read and parse helm repository YAML file
         try:
-            with open(cls.REPO_PATH) as f:
-                cls._repository = yaml.load(f, Loader=yaml.FullLoader)
+            # wait for any update in progress to finish writing the file
+            with cls._lock(fcntl.LOCK_SH):
+                downloaded_at = cls._downloaded_at()
+                index = cls._read_index()
+                if not index or index["downloaded_at"] != downloaded_at:
+                    index = cls._build_index(downloaded_at)
         except Exception as err:
             wrapped_err = HelmError(err)
             wrapped_err.detail = (
                 f"Error while opening/parsing helm repository cache: '{cls.REPO_PATH}'"
             )
             raise HelmError(wrapped_err)
+        cls._charts = index["charts"]
+        cls._updated_at = downloaded_at or datetime.utcnow()
+
+    @classmethod
+    def _read_index(cls):
+        try:
+            with open(cls.INDEX_PATH, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    @classmethod
+    def _build_index(cls, downloaded_at):
+        """
+        Parses the repository index and writes its compact index, mapping
+        chart names to versions to `(app_version, description)`
+        """
+        with open(cls.REPO_PATH) as f:
+            repository = yaml.load(f, Loader=YAML_LOADER)
+
+        charts = {}
+        for name, versions in repository.get("entries", {}).items():
+            charts[name] = {
+                version_info["version"]: (
+                    # appVersion is relatively new and some old helm chart
+                    # don't have it
+                    version_info.get("appVersion"),
+                    version_info.get("description"),
+                )
+                for version_info in versions
+            }
+        index = {"downloaded_at": downloaded_at, "charts": charts}
+
+        # replaced atomically, as other processes may be reading it
+        fd, path = tempfile.mkstemp(dir=os.path.dirname(cls.INDEX_PATH))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(index, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(path, cls.INDEX_PATH)
+        except OSError as error:
+            log.warning(f"Failed writing helm repository compact index: {error}")
+            if os.path.exists(path):
+                os.remove(path)
+
+        return index
 
     @classmethod
     def get_chart_info(cls, name):
@@ -211,27 +827,12 @@ class HelmRepository(object):
         ```
         """
 
-        cls.update(force=False)
+        cls._refresh()
 
-        try:
-            versions = cls._repository["entries"][name]
-        except KeyError:
-            # No such a chart with this name, returning {}
-            return {}
-
-        # Convert to dictionary
-        chart_info = {}
-        for version_info in versions:
-            chart = Chart(
-                version_info["name"],
-                version_info["description"],
-                version_info["version"],
-                # appVersion is relatively new and some old helm chart don't
-                # have it
-                version_info.get("appVersion", None),
-            )
-            chart_info[chart.version] = chart
-        return chart_info
+        return {
+            version: Chart(name, description, version, app_version)
+            for version, (app_version, description) in cls._charts.get(name, {}).items()
+        }
 
     @classmethod
     def get_chart_app_version(cls, name, version):
@@ -245,26 +846,24 @@ class HelmRepository(object):
         preceed the introduction of this field)
         """
 
-        chart_info = cls.get_chart_info(name)
-        version_info = chart_info.get(version, None)
-        if version_info:
-            return version_info.app_version
+        cls._refresh()
 
-        return None
+        app_version, _ = cls._charts.get(name, {}).get(version, (None, None))
+        return app_version
 
     @classmethod
     def _outdated(cls):
-        # helm update never called?
+        # index never loaded?
         if not cls._updated_at:
             return True
 
-        # helm update called more than `CACHE_FOR_MINUTES` ago
+        # index downloaded more than `CACHE_FOR_MINUTES` ago
         now = datetime.utcnow()
         elapsed = now - cls._updated_at
         if elapsed > timedelta(minutes=cls.CACHE_FOR_MINUTES):
             return True
 
-        # helm update called recently
+        # index downloaded recently
         return False
 
 
@@ -0,0 +1,167 @@
+"""
+Check the S3 access granted in IAM against the access records
+
+The access every IAM role and group should have is built from the
+`UserS3Bucket`, `AppS3Bucket` and `PolicyS3Bucket` tables with a few bulk
+queries. Their policies are then read from IAM and compared with it by a
+pool of threads, optionally re-granting or revoking the buckets which
+drifted and attaching the roles of group members again, see `reconcile()`.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+import time
+
+from django.conf import settings
+
+from controlpanel.api import cluster
+from controlpanel.api.models import (
+    App,
+    AppS3Bucket,
+    IAMManagedPolicy,
+    PolicyS3Bucket,
+    User,
+    UserS3Bucket,
+)
+
+
+log = logging.getLogger(__name__)
+
+
+IN_SYNC = "in sync"
+DRIFTED = "drifted"
+FIXED = "fixed"
+FAILED = "failed"
+
+
+def reconcile(fix=False, max_workers=None):
+    """
+    Compare the S3 access of every IAM role and group with the access records
+
+    Yields one result dict per role or group as soon as it's checked, with
+    its `principal`, `status`, the `missing` and `unexpected` resources as
+    `(sid, resource)` pairs, the `elapsed` seconds and, for failures, an
+    `error`. With `fix`, the buckets which drifted are granted or revoked
+    again, and the roles attached to groups are made to match their members.
+    """
+    records = access_records()
+    groups = {}
+    if fix:
+        # members are prefetched, so that the worker threads don't query the
+        # database
+        groups = {
+            policy.arn: policy
+            for policy in IAMManagedPolicy.objects.prefetch_related("users")
+        }
+
+    with ThreadPoolExecutor(max_workers=max_workers or settings.IAM_MAX_WORKERS) as executor:
+        futures = [
+            executor.submit(
+                check, principal, principal_records, fix, groups.get(principal[1]),
+            )
+            for principal, principal_records in records.items()
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def access_records():
+    """
+    Returns the access records of every IAM role and group, by
+    `iam_principal` and then bucket ARN
+
+    Roles and groups with no access are included, as their policies should be
+    empty. Related objects are fetched up front so that the worker threads
+    don't query the database.
+    """
+    records = {}
+    for user in User.objects.all():
+        records[("role", user.iam_role_name)] = {}
+    for app in App.objects.all():
+        records[("role", app.iam_role_name)] = {}
+    for policy in IAMManagedPolicy.objects.all():
+        records[("group", policy.arn)] = {}
+
+    for model, related in (
+        (UserS3Bucket, "user"),
+        (AppS3Bucket, "app"),
+        (PolicyS3Bucket, "policy"),
+    ):
+        for access in model.objects.select_related(related, "s3bucket"):
+            principal_records = records.setdefault(access.iam_principal, {})
+            principal_records[access.s3bucket.arn] = access
+    return records
+
+
+def desired_s3_access(records):
+    """
+    Returns the S3 access resources granted by `records`, by statement ID,
+    compacted like the policies written by `cluster`
+    """
+    resources = {}
+    for bucket_arn, access in records.items():
+        resources.setdefault("list", []).append(bucket_arn)
+        resources.setdefault(access.access_level, []).extend(
+            f"{arn}/*" for arn in access.resources
+        )
+    return cluster.compact_s3_access(resources)
+
+
+def diff(desired, actual):
+    """
+    Returns the `(sid, resource)` pairs in `desired` but not in `actual`, and
+    the other way around
+    """
+    desired = {(sid, resource) for sid, resources in desired.items() for resource in resources}
+    actual = {(sid, resource) for sid, resources in actual.items() for resource in resources}
+    return sorted(desired - actual), sorted(actual - desired)
+
+
+def bucket_arn(resource):
+    return resource.split("/", 1)[0]
+
+
+def check(principal, records, fix=False, group=None):
+    started = time.monotonic()
+    result = {"principal": principal, "missing": [], "unexpected": []}
+    try:
+        if fix and group:
+            group.reconcile_members()
+
+        missing, unexpected = diff(
+            desired_s3_access(records),
+            cluster.read_s3_access(principal),
+        )
+        result.update(missing=missing, unexpected=unexpected)
+
+        if not (missing or unexpected):
+            result["status"] = IN_SYNC
+        elif fix:
+            repair(principal, records, missing + unexpected)
+            result["status"] = FIXED
+        else:
+            result["status"] = DRIFTED
+
+    except Exception as error:
+        log.error(f"Failed reconciling S3 access of {principal}: {error}")
+        result.update(status=FAILED, error=str(error))
+
+    result["elapsed"] = time.monotonic() - started
+    return result
+
+
+def repair(principal, records, differences):
+    """
+    Grant again the buckets which drifted, or revoke them if there's no
+    access record for them
+    """
+    kind, name = principal
+    bucket_arns = sorted({bucket_arn(resource) for _, resource in differences})
+
+    with cluster.batch_policy_updates():
+        for arn in bucket_arns:
+            if arn in records:
+                records[arn].grant_bucket_access()
+            elif kind == "group":
+                cluster.revoke_group_bucket_access(name, arn)
+            else:
+                cluster.revoke_role_bucket_access(name, arn)
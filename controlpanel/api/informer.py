@@ -0,0 +1,193 @@
+"""
+In-process cache of the Deployments in users' namespaces
+
+Rather than listing a user's Deployments every time a tool's status or
+version is checked (several times per tools page), each process lists the
+Deployments of all `user-*` namespaces once, with the control panel's
+credentials, and then watches them for changes, see `DeploymentInformer`.
+If the cache isn't in sync (e.g. while the API server is unreachable), the
+callers list the Deployments themselves instead.
+"""
+import logging
+import threading
+import time
+
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+
+from controlpanel.api.kubernetes import KubernetesClient
+
+
+log = logging.getLogger(__name__)
+
+
+class DeploymentInformer:
+    """
+    Deployments of users' namespaces, indexed by namespace and `app` label,
+    kept up to date by a daemon thread started on first use
+
+    The thread lists the Deployments (in pages of `PAGE_SIZE`) and then
+    watches them from the list's `resourceVersion`. When the watch expires
+    they're listed again, and when the API server fails the cache is marked
+    out of sync until the next successful list.
+    """
+
+    NAMESPACE_PREFIX = "user-"
+    PAGE_SIZE = 500
+    # seconds the first callers wait for the initial list
+    SYNC_TIMEOUT = 5
+    # seconds each watch request lasts before being renewed
+    WATCH_TIMEOUT = 5 * 60
+    # seconds before listing again after a failure or a watch error
+    RETRY_DELAY = 5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._synced = threading.Event()
+        self._thread = None
+        self._started_at = None
+        self._deployments = {}
+
+    def list(self, namespace, app=None):
+        """
+        Returns the Deployments in `namespace`, with the `app` label `app`
+        if given, or `None` if the cache isn't in sync
+        """
+        if not self.wait_for_sync():
+            return None
+
+        with self._lock:
+            by_app = self._deployments.get(namespace, {})
+            if app is not None:
+                return list(by_app.get(app, {}).values())
+            return [
+                deployment
+                for deployments in by_app.values()
+                for deployment in deployments.values()
+            ]
+
+    def wait_for_sync(self):
+        """
+        Start the informer if it's not running, and return whether the
+        cache is in sync, waiting for the initial list for up to
+        `SYNC_TIMEOUT` seconds after the informer started
+        """
+        self.start()
+        remaining = self._started_at + self.SYNC_TIMEOUT - time.monotonic()
+        return self._synced.wait(max(remaining, 0))
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._started_at = time.monotonic()
+            self._thread = threading.Thread(
+                target=self._run,
+                name="deployment-informer",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                k8s = KubernetesClient(use_cpanel_creds=True)
+                resource_version = self._list(k8s)
+                self._watch(k8s, resource_version)
+
+            except Exception as error:
+                self._synced.clear()
+                log.warning(f"Deployment informer failed, listing again: {error}")
+                time.sleep(self.RETRY_DELAY)
+
+    def _list(self, k8s):
+        """
+        Replace the cache with the current Deployments and return the
+        `resourceVersion` of the list
+        """
+        deployments = {}
+        token = None
+        while True:
+            kwargs = {"_continue": token} if token else {}
+            page = k8s.AppsV1Api.list_deployment_for_all_namespaces(
+                limit=self.PAGE_SIZE,
+                **kwargs,
+            )
+            for deployment in page.items:
+                if self._is_tracked(deployment):
+                    self._add(deployments, deployment)
+
+            token = page.metadata._continue
+            if not token:
+                break
+
+        with self._lock:
+            self._deployments = deployments
+        self._synced.set()
+        return page.metadata.resource_version
+
+    def _watch(self, k8s, resource_version):
+        """
+        Apply changes to the Deployments to the cache, until the watch
+        expires
+        """
+        stream = watch.Watch()
+        while True:
+            try:
+                for event in stream.stream(
+                    k8s.AppsV1Api.list_deployment_for_all_namespaces,
+                    resource_version=resource_version,
+                    timeout_seconds=self.WATCH_TIMEOUT,
+                ):
+                    if event["type"] == "ERROR":
+                        log.debug(f"Deployment watch ended: {event['raw_object']}")
+                        if event["raw_object"].get("code") != 410:
+                            # not just expired, don't list everything again
+                            # straight away
+                            time.sleep(self.RETRY_DELAY)
+                        return
+
+                    deployment = event["object"]
+                    resource_version = deployment.metadata.resource_version
+                    if not self._is_tracked(deployment):
+                        continue
+
+                    with self._lock:
+                        if event["type"] == "DELETED":
+                            self._remove(self._deployments, deployment)
+                        else:
+                            self._remove(self._deployments, deployment)
+                            self._add(self._deployments, deployment)
+
+            except ApiException as error:
+                if error.status == 410:
+                    return
+                raise
+
+    def _is_tracked(self, deployment):
+        return deployment.metadata.namespace.startswith(self.NAMESPACE_PREFIX)
+
+    @staticmethod
+    def _add(deployments, deployment):
+        metadata = deployment.metadata
+        app = (metadata.labels or {}).get("app")
+        by_app = deployments.setdefault(metadata.namespace, {})
+        by_app.setdefault(app, {})[metadata.name] = deployment
+
+    @staticmethod
+    def _remove(deployments, deployment):
+        """
+        Remove `deployment` from `deployments`, under any `app` label, as
+        the label may have changed
+        """
+        metadata = deployment.metadata
+        by_app = deployments.get(metadata.namespace, {})
+        for app, by_name in list(by_app.items()):
+            by_name.pop(metadata.name, None)
+            if not by_name:
+                del by_app[app]
+        if not by_app:
+            deployments.pop(metadata.namespace, None)
+
+
+deployments = DeploymentInformer()
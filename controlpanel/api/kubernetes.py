@@ -1,7 +1,15 @@
+from collections import OrderedDict
 from copy import deepcopy
 import inspect
 import kubernetes
+from kubernetes.config.incluster_config import SERVICE_TOKEN_FILENAME
+from kubernetes.config.kube_config import (
+    ENV_KUBECONFIG_PATH_SEPARATOR,
+    KUBE_CONFIG_DEFAULT_LOCATION,
+)
 import os
+import threading
+import time
 
 from django.conf import settings
 
@@ -10,15 +18,64 @@ from django.conf import settings
 from controlpanel.kubeapi import oidc_patch
 
 
-def get_config():
+_config_lock = threading.Lock()
+_config_version = None
+
+
+def config_files():
     """
-    Load and returns a kubernetes Configuration instance
+    Returns the paths of the files the kubernetes configuration is loaded
+    from: the service account token in the cluster, otherwise the kube
+    config files
     """
-
     if "KUBERNETES_SERVICE_HOST" in os.environ:
-        kubernetes.config.load_incluster_config()
-    else:
-        kubernetes.config.load_kube_config()
+        return [SERVICE_TOKEN_FILENAME]
+
+    return [
+        os.path.expanduser(path)
+        for path in KUBE_CONFIG_DEFAULT_LOCATION.split(ENV_KUBECONFIG_PATH_SEPARATOR)
+    ]
+
+
+def config_version():
+    """
+    Returns the modification times of the configuration files, which
+    change when e.g. the service account token is rotated
+    """
+    version = []
+    for path in config_files():
+        try:
+            version.append((path, os.stat(path).st_mtime_ns))
+        except OSError:
+            version.append((path, None))
+    return tuple(version)
+
+
+def load_config():
+    """
+    Load the kubernetes configuration as the default `Configuration`, unless
+    it's already loaded from the current configuration files, and return
+    their version (see `config_version()`)
+    """
+    global _config_version
+
+    version = config_version()
+    with _config_lock:
+        if version != _config_version:
+            if "KUBERNETES_SERVICE_HOST" in os.environ:
+                kubernetes.config.load_incluster_config()
+            else:
+                kubernetes.config.load_kube_config()
+            _config_version = version
+    return version
+
+
+def get_config():
+    """
+    Returns a copy of the kubernetes Configuration, loaded from disk only
+    when it changed (see `load_config()`)
+    """
+    load_config()
 
     config = kubernetes.client.Configuration()
 
@@ -33,6 +90,77 @@ def get_config():
     return config
 
 
+def close_api_client(api_client):
+    """
+    Close the thread pool and the connections of `api_client`
+    """
+    api_client.close()
+    api_client.rest_client.pool_manager.clear()
+
+
+class ApiClientCache:
+    """
+    `ApiClient`s by credentials, so that their connection pools are reused
+
+    Holds up to `max_size` clients, closing the least recently used one when
+    it's full, and closing clients unused for `idle_timeout` seconds.
+    """
+
+    def __init__(self, max_size, idle_timeout):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()
+
+    def get(self, key, create):
+        """
+        Returns the client for `key`, calling `create` to build it if it's
+        not cached
+        """
+        now = time.monotonic()
+        with self._lock:
+            evicted = self._evict_idle(now)
+            entry = self._clients.pop(key, None)
+            if entry:
+                api_client, _ = entry
+            else:
+                api_client = create()
+            self._clients[key] = (api_client, now)
+
+            while len(self._clients) > self.max_size:
+                _, (oldest, _) = self._clients.popitem(last=False)
+                evicted.append(oldest)
+
+        for client in evicted:
+            close_api_client(client)
+        return api_client
+
+    def clear(self):
+        with self._lock:
+            evicted = [api_client for api_client, _ in self._clients.values()]
+            self._clients.clear()
+
+        for api_client in evicted:
+            close_api_client(api_client)
+
+    def _evict_idle(self, now):
+        evicted = []
+        # the least recently used clients come first
+        while self._clients:
+            key, (api_client, last_used) = next(iter(self._clients.items()))
+            if now - last_used < self.idle_timeout:
+                break
+            del self._clients[key]
+            evicted.append(api_client)
+        return evicted
+
+
+api_clients = ApiClientCache(
+    max_size=settings.KUBERNETES_API_CLIENTS,
+    idle_timeout=settings.KUBERNETES_API_CLIENT_IDLE_TIMEOUT,
+)
+
+
 class KubernetesClient:
     """
     Wraps kubernetes.client default configuration with currently logged-in
@@ -60,13 +188,18 @@ class KubernetesClient:
                 "the k8s API unless stricly necessary."
             )
 
-        config = get_config()
+        def create():
+            config = get_config()
+
+            if id_token:
+                config.api_key_prefix["authorization"] = "Bearer"
+                config.api_key["authorization"] = id_token
 
-        if id_token:
-            config.api_key_prefix["authorization"] = "Bearer"
-            config.api_key["authorization"] = id_token
+            return kubernetes.client.ApiClient(config)
 
-        self.api_client = kubernetes.client.ApiClient(config)
+        # clients made with an older configuration are no longer used, and
+        # will be evicted
+        self.api_client = api_clients.get((load_config(), id_token), create)
 
     def __getattr__(self, name):
         api_class = kubernetes.client.api.__dict__.get(name)
@@ -0,0 +1,28 @@
+from time import sleep
+
+from django.core.management.base import BaseCommand
+
+from controlpanel.api import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver pending outbox messages. Run periodically to retry failed "
+        "deliveries, or with --interval to keep polling"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            help="Keep running, polling for due messages every INTERVAL seconds",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            delivered = outbox.deliver()
+            self.stdout.write(f"Delivered {delivered} outbox messages")
+            if not interval:
+                break
+            sleep(interval)
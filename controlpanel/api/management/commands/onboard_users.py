@@ -0,0 +1,102 @@
+import csv
+from statistics import median
+import sys
+from time import monotonic
+
+from django.core.management.base import BaseCommand, CommandError
+
+from controlpanel.api import onboarding
+
+
+FIELDS = ("auth0_id", "username", "email", "name")
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the users listed in a CSV file and provision their IAM roles "
+        "and helm releases. Running it again with the same file resumes "
+        "after a partial failure"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "file",
+            help="CSV file with an auth0_id, username and optionally email "
+            "and name column, or - to read it from stdin",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Number of users provisioned concurrently "
+            "(default: ONBOARDING_MAX_WORKERS)",
+        )
+
+    def handle(self, *args, **options):
+        entries = self.read_entries(options["file"])
+        started = monotonic()
+
+        users = []
+        for entry, result in zip(entries, onboarding.create_users(entries)):
+            if result["status"] == onboarding.CONFLICT:
+                self.stderr.write(
+                    f"{entry['username']}: username belongs to another user, skipped"
+                )
+            else:
+                users.append(result["user"])
+
+        totals = {}
+        timings = {}
+        for result in onboarding.provision(users, max_workers=options["workers"]):
+            status = result["status"]
+            totals[status] = totals.get(status, 0) + 1
+
+            username = result["user"].username
+            line = f"{username}: {status} ({result['elapsed']:.2f}s)"
+            if status == onboarding.FAILED:
+                self.stderr.write(f"{line}: {result['error']}")
+            else:
+                self.stdout.write(line)
+            if status != onboarding.SKIPPED:
+                timings[username] = result["elapsed"]
+
+        summary = ", ".join(f"{count} {status}" for status, count in sorted(totals.items()))
+        self.stdout.write(
+            f"Onboarded {sum(totals.values())} users in {monotonic() - started:.2f}s: "
+            f"{summary or 'nothing to do'}"
+        )
+        if timings:
+            slowest = max(timings, key=timings.get)
+            self.stdout.write(
+                f"Provisioning took {min(timings.values()):.2f}s to "
+                f"{timings[slowest]:.2f}s ({slowest}), median "
+                f"{median(timings.values()):.2f}s"
+            )
+
+        if totals.get(onboarding.FAILED):
+            raise CommandError(
+                f"Failed provisioning {totals[onboarding.FAILED]} users, "
+                "run the command again to retry them"
+            )
+
+    def read_entries(self, path):
+        if path == "-":
+            return self.parse(sys.stdin)
+        try:
+            with open(path, newline="") as f:
+                return self.parse(f)
+        except OSError as error:
+            raise CommandError(f"Can't read {path}: {error}")
+
+    def parse(self, f):
+        reader = csv.DictReader(f)
+        missing = {"auth0_id", "username"} - set(reader.fieldnames or ())
+        if missing:
+            raise CommandError(f"Missing columns: {', '.join(sorted(missing))}")
+
+        entries = []
+        for row in reader:
+            entry = {field: row[field].strip() for field in FIELDS if row.get(field)}
+            if not (entry.get("auth0_id") and entry.get("username")):
+                raise CommandError(f"Line {reader.line_num}: auth0_id and username are required")
+            entries.append(entry)
+        return entries
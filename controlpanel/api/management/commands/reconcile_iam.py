@@ -0,0 +1,64 @@
+from time import monotonic, sleep
+
+from django.core.management.base import BaseCommand
+
+from controlpanel.api import iam_reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the S3 access granted to IAM roles and groups with the "
+        "access records, reporting (or with --fix, repairing) the differences"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Grant or revoke again the buckets which drifted, and "
+            "attach the roles of group members again",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Number of roles and groups checked concurrently "
+            "(default: IAM_MAX_WORKERS)",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            help="Keep running, reconciling every INTERVAL seconds",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            self.reconcile(options["fix"], options["workers"])
+            if not interval:
+                break
+            sleep(interval)
+
+    def reconcile(self, fix, workers):
+        started = monotonic()
+        totals = {}
+        for result in iam_reconcile.reconcile(fix=fix, max_workers=workers):
+            status = result["status"]
+            totals[status] = totals.get(status, 0) + 1
+
+            kind, name = result["principal"]
+            line = f"{kind} {name}: {status} ({result['elapsed']:.2f}s)"
+            if status == iam_reconcile.FAILED:
+                self.stderr.write(f"{line}: {result['error']}")
+                continue
+
+            self.stdout.write(line)
+            for sid, resource in result["missing"]:
+                self.stdout.write(f"  + {sid} {resource}")
+            for sid, resource in result["unexpected"]:
+                self.stdout.write(f"  - {sid} {resource}")
+
+        summary = ", ".join(f"{count} {status}" for status, count in sorted(totals.items()))
+        self.stdout.write(
+            f"Reconciled {sum(totals.values())} roles and groups in "
+            f"{monotonic() - started:.2f}s: {summary or 'nothing to do'}"
+        )
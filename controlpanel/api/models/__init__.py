@@ -1,6 +1,7 @@
 from controlpanel.api.models.app import App
 from controlpanel.api.models.apps3bucket import AppS3Bucket
 from controlpanel.api.models.iam_managed_policy import IAMManagedPolicy
+from controlpanel.api.models.outbox_message import OutboxMessage
 from controlpanel.api.models.parameter import Parameter
 from controlpanel.api.models.s3bucket import S3Bucket
 from controlpanel.api.models.tool import Tool, ToolDeployment, HomeDirectory
@@ -3,10 +3,11 @@ import re
 from django.contrib.postgres.fields import ArrayField
 from django.core.validators import RegexValidator
 from django.db import models
+from django.db.transaction import atomic
 from django.dispatch import receiver
 from django_extensions.db.models import TimeStampedModel
 
-from controlpanel.api import cluster
+from controlpanel.api import cluster, outbox
 from controlpanel.api.models.iam_managed_policy import IAMManagedPolicy
 
 
@@ -51,20 +52,57 @@ class AccessToS3Bucket(TimeStampedModel):
     def iam_role_name(self):
         raise NotImplementedError
 
+    @property
+    def iam_principal(self):
+        """
+        Returns `(kind, name)` of the IAM role or group granted access, where
+        `kind` is "role" or "group"
+        """
+        raise NotImplementedError
+
     def grant_bucket_access(self):
         raise NotImplementedError
 
     def revoke_bucket_access(self):
         raise NotImplementedError
 
+    @property
+    def outbox_resource(self):
+        return ":".join(self.iam_principal)
+
+    @property
+    def outbox_dedupe_key(self):
+        return f"bucket-access:{self.outbox_resource}:{self.s3bucket.arn}"
+
+    @atomic
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.grant_bucket_access()
+        with cluster.batch_policy_updates():
+            super().save(*args, **kwargs)
+            outbox.enqueue(
+                self.outbox_resource,
+                "grant_bucket_access",
+                dedupe_key=self.outbox_dedupe_key,
+                model=self._meta.label,
+                pk=self.pk,
+            )
         return self
 
+    @atomic
     def delete(self, *args, **kwargs):
-        self.revoke_bucket_access()
-        super().delete(*args, **kwargs)
+        # access is revoked by the pre_delete signal
+        with cluster.batch_policy_updates():
+            super().delete(*args, **kwargs)
+
+    def enqueue_revoke_bucket_access(self):
+        principal, name = self.iam_principal
+        outbox.enqueue(
+            self.outbox_resource,
+            "revoke_bucket_access",
+            dedupe_key=self.outbox_dedupe_key,
+            principal=principal,
+            name=name,
+            bucket_arn=self.s3bucket.arn,
+        )
 
     @property
     def resources(self):
@@ -77,5 +115,5 @@ class AccessToS3Bucket(TimeStampedModel):
 def revoke_access(sender, **kwargs):
     if issubclass(sender, AccessToS3Bucket):
         obj = kwargs['instance']
-        obj.revoke_bucket_access()
+        obj.enqueue_revoke_bucket_access()
 
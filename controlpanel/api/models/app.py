@@ -1,9 +1,11 @@
 from django.conf import settings
 from django.db import models
+from django.db.transaction import atomic
 from django_extensions.db.fields import AutoSlugField
 from django_extensions.db.models import TimeStampedModel
 
-from controlpanel.api import auth0, cluster, elasticsearch
+from controlpanel.api import auth0, cluster, elasticsearch, outbox
+from controlpanel.api.models.parameter import Parameter
 from controlpanel.utils import (
     github_repository_name,
     s3_slugify,
@@ -73,20 +75,29 @@ class App(TimeStampedModel):
     def status(self):
         return "Deployed"
 
+    @atomic
     def save(self, *args, **kwargs):
         is_create = not self.pk
 
         super().save(*args, **kwargs)
 
         if is_create:
-            cluster.App(self).create_iam_role()
+            outbox.enqueue(
+                f"role:{self.iam_role_name}",
+                "create_app_role",
+                dedupe_key=f"create-app-role:{self.pk}",
+                pk=self.pk,
+            )
 
         return self
 
     def delete(self, *args, **kwargs):
         cluster.App(self).delete()
+        # the app's secrets go with its role
+        Parameter.delete_for_role(self.iam_role_name)
 
-        super().delete(*args, **kwargs)
+        with cluster.batch_policy_updates():
+            super().delete(*args, **kwargs)
 
 
 class AddCustomerError(Exception):
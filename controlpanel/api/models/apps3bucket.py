@@ -26,6 +26,10 @@ class AppS3Bucket(AccessToS3Bucket):
     def iam_role_name(self):
         return self.app.iam_role_name
 
+    @property
+    def iam_principal(self):
+        return ("role", self.iam_role_name)
+
     def __repr__(self):
         return f'<AppS3Bucket: {self.app!r} {self.s3bucket!r} {self.access_level}>'
 
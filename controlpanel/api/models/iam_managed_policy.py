@@ -2,9 +2,10 @@ import re
 
 from django.core.validators import RegexValidator
 from django.db import models
+from django.dispatch import receiver
 from django_extensions.db.models import TimeStampedModel
 
-from controlpanel.api import cluster
+from controlpanel.api import cluster, outbox
 
 
 POLICY_NAME_PATTERN = r"[a-z0-9_+@,.:=-]{2,63}"
@@ -44,11 +45,8 @@ class IAMManagedPolicy(TimeStampedModel):
 
         super().save(*args, **kwargs)
 
-        group = cluster.RoleGroup(self)
         if is_create:
-            group.create()
-
-        group.update_members()
+            cluster.RoleGroup(self).create()
 
         return self
 
@@ -56,3 +54,48 @@ class IAMManagedPolicy(TimeStampedModel):
         cluster.RoleGroup(self).delete()
         super().delete(*args, **kwargs)
 
+    def reconcile_members(self):
+        """
+        Make the IAM roles attached to the group match its `users`
+
+        Membership changes are applied one by one as they happen (see
+        `update_group_members()` below), this lists every attached role to
+        repair any drift.
+        """
+        cluster.RoleGroup(self).update_members()
+
+    def enqueue_member_change(self, action, user):
+        outbox.enqueue(
+            f"group:{self.arn}",
+            action,
+            dedupe_key=f"group-member:{self.pk}:{user.pk}",
+            pk=self.pk,
+            role_name=user.iam_role_name,
+        )
+
+
+# Attach/detach only the roles of the users added to/removed from a group
+@receiver(models.signals.m2m_changed, sender=IAMManagedPolicy.users.through)
+def update_group_members(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action == "post_add":
+        change = "add_group_member"
+        related = model.objects.filter(pk__in=pk_set)
+    elif action == "post_remove":
+        change = "remove_group_member"
+        related = model.objects.filter(pk__in=pk_set)
+    elif action == "pre_clear":
+        # `pk_set` is not given when clearing
+        change = "remove_group_member"
+        if reverse:
+            related = instance.iammanagedpolicy_set.all()
+        else:
+            related = instance.users.all()
+    else:
+        return
+
+    for obj in related:
+        if reverse:
+            obj.enqueue_member_change(change, instance)
+        else:
+            instance.enqueue_member_change(change, obj)
+
@@ -0,0 +1,39 @@
+from django.contrib.postgres.fields import JSONField
+from django.db import models
+from django.utils import timezone
+from django_extensions.db.models import TimeStampedModel
+
+
+class OutboxMessage(TimeStampedModel):
+    """
+    A cloud side-effect (AWS/helm call) waiting to be delivered by the
+    background worker
+
+    Messages are written in the same transaction as the model change which
+    caused them and delivered in order per `resource`. See
+    `controlpanel.api.outbox`.
+    """
+
+    PENDING = "pending"
+    FAILED = "failed"
+
+    STATUSES = (
+        (PENDING, "Pending"),
+        (FAILED, "Failed"),
+    )
+
+    resource = models.CharField(max_length=255, db_index=True)
+    action = models.CharField(max_length=100)
+    payload = JSONField(default=dict)
+    dedupe_key = models.CharField(max_length=512, null=True, db_index=True)
+    status = models.CharField(max_length=7, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        db_table = "control_panel_api_outbox_message"
+        ordering = ("id",)
+
+    def __repr__(self):
+        return f"<OutboxMessage: {self.action} {self.resource} ({self.status})>"
@@ -1,11 +1,12 @@
 from django.conf import settings
 from django.core.validators import RegexValidator
 from django.db import models
+from django.db.transaction import atomic
 
 from django_extensions.db.models import TimeStampedModel
 
 from controlpanel.api.aws import arn
-from controlpanel.api import cluster
+from controlpanel.api import cluster, outbox
 
 
 APP_TYPE_CHOICES = (
@@ -15,6 +16,10 @@ APP_TYPE_CHOICES = (
 
 
 class Parameter(TimeStampedModel):
+    CREATED = "created"
+    EXISTS = "exists"
+    FAILED = "failed"
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._value = None
@@ -57,12 +62,15 @@ class Parameter(TimeStampedModel):
     class Meta(TimeStampedModel.Meta):
         db_table = "control_panel_api_parameter"
 
+    @atomic
     def save(self, *args, **kwargs):
         is_create = not self.pk
 
         super().save(*args, **kwargs)
 
         if is_create:
+            # the value is secret, so it's written to SSM right away rather
+            # than kept in an outbox message
             cluster.create_parameter(
                 self.name,
                 self.value,
@@ -72,6 +80,76 @@ class Parameter(TimeStampedModel):
 
         return self
 
+    @atomic
     def delete(self, *args, **kwargs):
-        cluster.delete_parameter(self.name)
+        outbox.enqueue(
+            f"parameter:{self.name}",
+            "delete_parameter",
+            dedupe_key=f"parameter:{self.name}",
+            name=self.name,
+        )
         super().delete(*args, **kwargs)
+
+    @classmethod
+    @atomic
+    def create_many(cls, parameters):
+        """
+        Create the (unsaved) `parameters` at once, writing their values to
+        SSM concurrently (see `aws.create_parameters()`)
+
+        Returns one result dict per parameter, with the `parameter` and a
+        `status`: parameters already in SSM aren't overwritten (`EXISTS`),
+        and those which failed (`FAILED`, with the `error`) aren't saved.
+        """
+        existing = set(cluster.get_parameters([parameter.name for parameter in parameters]))
+        new = []
+        for parameter in parameters:
+            if parameter.name not in existing:
+                new.append(parameter)
+                # repeated in `parameters`
+                existing.add(parameter.name)
+        created = {parameter.name for parameter in new}
+        errors = cluster.create_parameters([
+            {
+                "name": parameter.name,
+                "value": parameter.value,
+                "role_name": parameter.role_name,
+                "description": parameter.description,
+            }
+            for parameter in new
+        ])
+        cls.objects.bulk_create([
+            parameter for parameter in new if parameter.name not in errors
+        ])
+
+        results = []
+        for parameter in parameters:
+            if parameter.name in errors:
+                results.append({
+                    "parameter": parameter,
+                    "status": cls.FAILED,
+                    "error": str(errors[parameter.name]),
+                })
+            elif parameter.name in created:
+                results.append({"parameter": parameter, "status": cls.CREATED})
+                created.remove(parameter.name)
+            else:
+                results.append({"parameter": parameter, "status": cls.EXISTS})
+        return results
+
+    @classmethod
+    @atomic
+    def delete_for_role(cls, role_name):
+        """
+        Delete the parameters of the IAM role `role_name`, removing them from
+        SSM in batches (see `aws.delete_parameters()`)
+        """
+        parameters = list(cls.objects.filter(role_name=role_name).order_by("pk"))
+        if not parameters:
+            return
+        outbox.enqueue(
+            f"role:{role_name}",
+            "delete_parameters",
+            names=[parameter.name for parameter in parameters],
+        )
+        cls.objects.filter(pk__in=[parameter.pk for parameter in parameters]).delete()
@@ -20,6 +20,10 @@ class PolicyS3Bucket(AccessToS3Bucket):
         unique_together = ("policy", "s3bucket")
         ordering = ("id",)
 
+    @property
+    def iam_principal(self):
+        return ("group", self.policy.arn)
+
     def grant_bucket_access(self):
         cluster.RoleGroup(self.policy).grant_bucket_access(
             self.s3bucket.arn,
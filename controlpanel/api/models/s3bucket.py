@@ -6,7 +6,7 @@ from django.db.models import Q
 from django.db.transaction import atomic
 from django_extensions.db.models import TimeStampedModel
 
-from controlpanel.api import cluster, validators
+from controlpanel.api import cluster, outbox, validators
 from controlpanel.api.models.users3bucket import UserS3Bucket
 
 
@@ -93,13 +93,19 @@ class S3Bucket(TimeStampedModel):
 
         return "None"
 
+    @atomic
     def save(self, *args, **kwargs):
         is_create = not self.pk
 
         super().save(*args, **kwargs)
 
         if is_create:
-            bucket = cluster.S3Bucket(self).create()
+            outbox.enqueue(
+                f"s3bucket:{self.name}",
+                "create_bucket",
+                dedupe_key=f"create-bucket:{self.pk}",
+                pk=self.pk,
+            )
 
             # XXX created_by is always set if model is saved by the API view
             if self.created_by:
@@ -114,5 +120,7 @@ class S3Bucket(TimeStampedModel):
 
     @atomic
     def delete(self, *args, **kwargs):
-        super().delete(*args, **kwargs)
+        # cascade deletes revoke access for every user, app and group
+        with cluster.batch_policy_updates():
+            super().delete(*args, **kwargs)
         cluster.S3Bucket(self).mark_for_archival()
@@ -143,6 +143,14 @@ class ToolDeployment:
 
         self._subprocess = cluster.ToolDeployment(self.user, self.tool).install()
 
+    async def deploy(self, on_progress=None):
+        """
+        Deploy the tool to the cluster, returning once it's deployed and
+        calling `on_progress` as helm reports progress
+        """
+
+        await cluster.ToolDeployment(self.user, self.tool).deploy(on_progress=on_progress)
+
     def get_status(self, id_token):
         """
         Get the current status of the deployment.
@@ -156,6 +164,22 @@ class ToolDeployment:
 
         return cluster.ToolDeployment(self.user, self.tool).get_status(id_token)
 
+    def watch_status(self, id_token, timeout=cluster.TOOL_READY_TIMEOUT):
+        """
+        Yields the status of the deployment, and the version of the deployed
+        tool (see `get_installed_app_version()`), each time the status
+        changes until it's no longer deploying, or until `timeout` seconds
+        """
+        td = cluster.ToolDeployment(self.user, self.tool)
+        for status, deployment in td.watch_status(id_token, timeout=timeout):
+            app_version = None
+            if deployment:
+                _, chart_version = deployment.metadata.labels["chart"].rsplit("-", 1)
+                app_version = HelmRepository.get_chart_app_version(
+                    self.tool.chart_name, chart_version
+                )
+            yield status, app_version
+
     def _poll(self):
         """
         Poll the deployment subprocess for status
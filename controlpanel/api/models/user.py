@@ -2,8 +2,9 @@ from crequest.middleware import CrequestMiddleware
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.transaction import atomic
 
-from controlpanel.api import auth0, cluster, slack
+from controlpanel.api import auth0, cluster, outbox, slack
 from controlpanel.utils import sanitize_dns_label
 
 
@@ -82,10 +83,9 @@ class User(AbstractUser):
     def reset_mfa(self):
         auth0.ManagementAPI().reset_mfa(self.auth0_id)
 
+    @atomic
     def save(self, *args, **kwargs):
         existing = User.objects.filter(pk=self.pk).first()
-        if not existing:
-            cluster.User(self).create()
 
         already_superuser = existing and existing.is_superuser
         if self.is_superuser and not already_superuser:
@@ -95,8 +95,21 @@ class User(AbstractUser):
                 by_username=request.user.username if request else None,
             )
 
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+
+        if not existing:
+            # shown on the tools page until the worker is done
+            cluster.User(self).report_provisioning(cluster.USER_PROVISIONING)
+            outbox.enqueue(
+                f"role:{self.iam_role_name}",
+                "create_user",
+                dedupe_key=f"create-user:{self.pk}",
+                pk=self.pk,
+            )
+
+        return result
 
-    def delete(self, *args, **kwargs):
-        cluster.User(self).delete()
-        return super().delete(*args, **kwargs)
+    def delete(self, *args, progress=None, **kwargs):
+        cluster.User(self).delete(progress=progress)
+        with cluster.batch_policy_updates():
+            return super().delete(*args, **kwargs)
@@ -29,6 +29,10 @@ class UserS3Bucket(AccessToS3Bucket):
     def iam_role_name(self):
         return self.user.iam_role_name
 
+    @property
+    def iam_principal(self):
+        return ("role", self.iam_role_name)
+
     def __repr__(self):
         return (
             f'<UserS3Bucket: {self.user!r} {self.s3bucket!r} {self.access_level}'
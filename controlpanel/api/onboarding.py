@@ -0,0 +1,177 @@
+"""
+Onboard a cohort of users at once
+
+The user records are created with a single `bulk_create()`, which (unlike
+`User.save()`) doesn't enqueue their provisioning, see `create_users()`.
+Their IAM roles and helm releases are then created by a pool of threads, each
+provisioning one user with `cluster.User.provision()`, see `provision()`.
+Users whose role and releases are already in place are skipped, so
+onboarding the same users again resumes after a partial failure.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.transaction import atomic
+
+from controlpanel.api import cluster
+from controlpanel.api.models import User
+
+
+log = logging.getLogger(__name__)
+
+
+CREATED = "created"
+EXISTS = "exists"
+CONFLICT = "conflict"
+
+PROVISIONED = "provisioned"
+SKIPPED = "already provisioned"
+FAILED = "failed"
+
+# release names are looked up with a label selector, which must stay short
+RELEASE_NAMES_PER_QUERY = 100
+
+
+@atomic
+def create_users(entries):
+    """
+    Create the users described by `entries` (dicts with `auth0_id`,
+    `username` and optionally `email` and `name`) which don't exist yet
+
+    Returns one result dict per entry, in the same order, with the `user`
+    and a `status`. Entries whose username belongs to another user are
+    `CONFLICT`s, and their `user` is `None`. Users created concurrently (e.g.
+    by logging in) don't fail the others, see `create_user()`.
+    """
+    existing = User.objects.in_bulk([entry["auth0_id"] for entry in entries])
+    taken = {
+        user.username: user.pk
+        for user in User.objects.filter(
+            username__in=[entry["username"] for entry in entries],
+        )
+    }
+
+    results = []
+    new = []
+    for entry in entries:
+        auth0_id = entry["auth0_id"]
+        if taken.setdefault(entry["username"], auth0_id) != auth0_id:
+            results.append({"user": None, "status": CONFLICT})
+        elif auth0_id in existing:
+            results.append({"user": existing[auth0_id], "status": EXISTS})
+        else:
+            user = existing[auth0_id] = User(**entry)
+            new.append(user)
+            results.append({"user": user, "status": CREATED})
+
+    try:
+        with atomic():
+            User.objects.bulk_create(new)
+    except IntegrityError:
+        # users created concurrently (e.g. by logging in) since they were
+        # looked up, so create the rest one at a time
+        for result in results:
+            if result["status"] == CREATED:
+                result.update(create_user(result["user"]))
+    return results
+
+
+def create_user(user):
+    """
+    Create `user`, or return the `EXISTS` or `CONFLICT` result if another
+    user with its ID or username was created first
+    """
+    try:
+        with atomic():
+            User.objects.bulk_create([user])
+    except IntegrityError:
+        existing = User.objects.filter(pk=user.pk).first()
+        if existing:
+            return {"user": existing, "status": EXISTS}
+        return {"user": None, "status": CONFLICT}
+    return {"user": user, "status": CREATED}
+
+
+def provisioned(users):
+    """
+    Returns the IDs of the `users` whose IAM role exists and whose helm
+    releases are deployed
+    """
+    if not users:
+        return set()
+
+    role_names = set(cluster.list_role_names())
+    release_names = [
+        name for user in users for name in cluster.User(user).release_names
+    ]
+    releases = {}
+    for start in range(0, len(release_names), RELEASE_NAMES_PER_QUERY):
+        releases.update(cluster.get_releases(
+            names=release_names[start:start + RELEASE_NAMES_PER_QUERY],
+        ))
+
+    def is_deployed(name):
+        return name in releases and releases[name].status == "DEPLOYED"
+
+    return {
+        user.pk
+        for user in users
+        if cluster.User(user).iam_role_name in role_names and
+        all(map(is_deployed, cluster.User(user).release_names))
+    }
+
+
+def provision(users, max_workers=None):
+    """
+    Create the IAM roles and helm releases of `users`
+
+    Yields one result dict per user as soon as it's done, with the `user`,
+    its `status`, the `elapsed` seconds and, for failures, an `error`. Users
+    are provisioned by a pool of `max_workers` threads (by default
+    `ONBOARDING_MAX_WORKERS`), and those already provisioned are skipped.
+    """
+    users = list({user.pk: user for user in users}.values())
+    done = provisioned(users)
+    for user in users:
+        if user.pk in done:
+            yield {"user": user, "status": SKIPPED, "elapsed": 0.0}
+
+    max_workers = max_workers or settings.ONBOARDING_MAX_WORKERS
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(provision_user, user)
+            for user in users
+            if user.pk not in done
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def provision_user(user):
+    started = time.monotonic()
+    result = {"user": user}
+    try:
+        cluster.User(user).provision()
+        result["status"] = PROVISIONED
+
+    except Exception as error:
+        log.error(f"Failed provisioning {user}: {error}")
+        result.update(status=FAILED, error=str(error))
+
+    result["elapsed"] = time.monotonic() - started
+    return result
+
+
+def provision_in_background(users):
+    """
+    Ask the `background_tasks` worker to provision `users`
+    """
+    async_to_sync(get_channel_layer().send)(
+        "background_tasks",
+        {"type": "onboard_users", "user_ids": [user.pk for user in users]},
+    )
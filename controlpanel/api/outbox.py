@@ -0,0 +1,300 @@
+"""
+Transactional outbox for cloud side-effects
+
+Models enqueue the AWS/helm calls they need instead of making them inside the
+web request. Messages are written in the same database transaction as the
+model change, and the `background_tasks` worker is notified once that
+transaction commits.
+
+- messages for the same `resource` (e.g. an IAM role) are delivered in the
+  order they were enqueued
+- a pending message with the same `dedupe_key` is superseded rather than
+  duplicated, so e.g. granting and then revoking access to a bucket before the
+  worker runs results in a single revoke
+- failed deliveries are retried with exponential backoff, up to
+  `MAX_ATTEMPTS` times. Handlers of multi-step actions can raise
+  `ResumableError` to record their progress, so the retry picks up where the
+  failed attempt stopped. The worker notifies itself when the next retry is
+  due (see `schedule_retry()`), and the `deliver_outbox --interval` command
+  catches anything missed, e.g. when notifying the worker failed
+
+When the `deferred_cloud_tasks` feature flag is disabled, messages are
+delivered immediately instead (and errors propagate to the caller).
+"""
+from datetime import timedelta
+import logging
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Min, OuterRef
+from django.utils import timezone
+
+from controlpanel.api import cluster
+from controlpanel.api.models.outbox_message import OutboxMessage
+
+
+log = logging.getLogger(__name__)
+
+
+MAX_ATTEMPTS = 8
+MAX_BACKOFF_SECONDS = 15 * 60
+
+HANDLERS = {}
+
+
+class ResumableError(Exception):
+    """
+    Raised by a handler which failed part way through
+
+    `payload` is merged into the message payload, so the retry gets the
+    progress made by the failed attempt.
+    """
+
+    def __init__(self, error, **payload):
+        self.payload = payload
+        super().__init__(str(error))
+
+
+def handler(func):
+    """Register `func` as the handler of messages named after it"""
+    HANDLERS[func.__name__] = func
+    return func
+
+
+def enqueue(resource, action, dedupe_key=None, **payload):
+    """
+    Add a message for the `action` handler, delivered once the current
+    transaction (if any) commits
+    """
+    if action not in HANDLERS:
+        raise ValueError(f"No outbox handler for '{action}'")
+
+    if not settings.ENABLED["deferred_cloud_tasks"]:
+        HANDLERS[action](**payload)
+        return None
+
+    # select_for_update() needs a transaction, callers in autocommit mode
+    # get one of their own
+    with transaction.atomic():
+        message = None
+        if dedupe_key:
+            # messages being delivered are locked, and can't be superseded
+            message = OutboxMessage.objects.select_for_update(skip_locked=True).filter(
+                dedupe_key=dedupe_key,
+                status=OutboxMessage.PENDING,
+            ).first()
+
+        if message:
+            message.action = action
+            message.payload = payload
+            message.attempts = 0
+            message.available_at = timezone.now()
+            message.save()
+        else:
+            message = OutboxMessage.objects.create(
+                resource=resource,
+                action=action,
+                dedupe_key=dedupe_key,
+                payload=payload,
+            )
+
+        transaction.on_commit(notify_worker)
+    return message
+
+
+def discard(dedupe_keys):
+    """
+    Drop pending messages superseded by changes applied outside the outbox
+    """
+    with transaction.atomic():
+        # messages being delivered are locked, and can't be discarded
+        pks = OutboxMessage.objects.select_for_update(skip_locked=True).filter(
+            dedupe_key__in=dedupe_keys,
+            status=OutboxMessage.PENDING,
+        ).values_list("pk", flat=True)
+        OutboxMessage.objects.filter(pk__in=list(pks)).delete()
+
+
+def notify_worker():
+    try:
+        async_to_sync(get_channel_layer().send)(
+            "background_tasks", {"type": "outbox_deliver"},
+        )
+    except Exception as error:
+        # pending messages are picked up by the next delivery run
+        log.warning(f"Failed notifying worker of outbox messages: {error}")
+
+
+_retry_lock = threading.Lock()
+_retry_timer = None
+
+
+def schedule_retry():
+    """
+    Notify the worker when the next pending message which isn't due yet
+    (i.e. a failed delivery backing off) becomes due, as nothing else would
+    wake it up then
+
+    Only the earliest retry is scheduled, each delivery run schedules the
+    next one.
+    """
+    global _retry_timer
+
+    next_at = OutboxMessage.objects.filter(
+        status=OutboxMessage.PENDING,
+        available_at__gt=timezone.now(),
+    ).aggregate(next_at=Min("available_at"))["next_at"]
+    if next_at is None:
+        return
+
+    delay = max((next_at - timezone.now()).total_seconds(), 0)
+    due = time.monotonic() + delay
+    with _retry_lock:
+        # keep a retry scheduled earlier, or at about the same time (the due
+        # times are derived from the database's timestamps, so they drift)
+        if _retry_timer and _retry_timer.is_alive() and _retry_timer.due <= due + 1:
+            return
+        if _retry_timer:
+            _retry_timer.cancel()
+        _retry_timer = threading.Timer(delay, notify_worker)
+        _retry_timer.daemon = True
+        _retry_timer.due = due
+        _retry_timer.start()
+
+
+def next_message():
+    """
+    Lock and return the oldest deliverable message, if any
+
+    A message is only deliverable once every earlier message for the same
+    resource has been delivered (or has failed permanently).
+    """
+    earlier = OutboxMessage.objects.filter(
+        resource=OuterRef("resource"),
+        status=OutboxMessage.PENDING,
+        pk__lt=OuterRef("pk"),
+    )
+    return OutboxMessage.objects.select_for_update(skip_locked=True).annotate(
+        blocked=Exists(earlier),
+    ).filter(
+        status=OutboxMessage.PENDING,
+        available_at__lte=timezone.now(),
+        blocked=False,
+    ).order_by("pk").first()
+
+
+def deliver(limit=None):
+    """
+    Deliver pending messages until none are due, or `limit` were attempted
+
+    Returns the number of messages attempted.
+    """
+    attempted = 0
+    while limit is None or attempted < limit:
+        with transaction.atomic():
+            message = next_message()
+            if not message:
+                break
+            deliver_message(message)
+        attempted += 1
+    return attempted
+
+
+def deliver_message(message):
+    try:
+        with transaction.atomic():
+            HANDLERS[message.action](**message.payload)
+
+    except Exception as error:
+        if isinstance(error, ResumableError):
+            message.payload.update(error.payload)
+        message.attempts += 1
+        message.last_error = str(error)
+        if message.attempts >= MAX_ATTEMPTS:
+            message.status = OutboxMessage.FAILED
+            log.error(f"Giving up delivering {message!r}: {error}")
+        else:
+            backoff = min(2 ** message.attempts, MAX_BACKOFF_SECONDS)
+            message.available_at = timezone.now() + timedelta(seconds=backoff)
+            log.warning(f"Failed delivering {message!r}, retrying in {backoff}s: {error}")
+        message.save()
+        return False
+
+    # delivered messages are removed
+    message.delete()
+    return True
+
+
+def _get_object(model, pk):
+    return apps.get_model(model).objects.filter(pk=pk).first()
+
+
+@handler
+def create_user(pk):
+    user = _get_object("api.User", pk)
+    if user:
+        cluster.User(user).provision()
+
+
+@handler
+def create_app_role(pk):
+    app = _get_object("api.App", pk)
+    if app:
+        cluster.App(app).create_iam_role()
+
+
+@handler
+def create_bucket(pk, completed=()):
+    bucket = _get_object("api.S3Bucket", pk)
+    if bucket:
+        try:
+            cluster.S3Bucket(bucket).create(completed)
+        except cluster.BucketProvisioningError as error:
+            raise ResumableError(error, completed=error.completed)
+
+
+@handler
+def grant_bucket_access(model, pk):
+    # a later revoke message for the same access supersedes this one, so a
+    # missing record means it was deleted in the same transaction
+    access = _get_object(model, pk)
+    if access:
+        access.grant_bucket_access()
+
+
+@handler
+def revoke_bucket_access(principal, name, bucket_arn):
+    if principal == "group":
+        cluster.revoke_group_bucket_access(name, bucket_arn)
+    else:
+        cluster.revoke_role_bucket_access(name, bucket_arn)
+
+
+@handler
+def add_group_member(pk, role_name):
+    group = _get_object("api.IAMManagedPolicy", pk)
+    if group:
+        cluster.RoleGroup(group).add_member(role_name)
+
+
+@handler
+def remove_group_member(pk, role_name):
+    # deleted groups have all their members detached
+    group = _get_object("api.IAMManagedPolicy", pk)
+    if group:
+        cluster.RoleGroup(group).remove_member(role_name)
+
+
+@handler
+def delete_parameter(name):
+    cluster.delete_parameter(name)
+
+
+@handler
+def delete_parameters(names):
+    cluster.delete_parameters(names)
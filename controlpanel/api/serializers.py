@@ -3,18 +3,22 @@ from operator import itemgetter
 import re
 
 from django.conf import settings
+from django.core.validators import RegexValidator
 
 from rest_framework import serializers
 
 from controlpanel.api.models import (
     App,
     AppS3Bucket,
+    IAMManagedPolicy,
     Parameter,
     S3Bucket,
     User,
     UserApp,
     UserS3Bucket,
 )
+from controlpanel.api.models.access_to_s3bucket import S3BUCKET_PATH_PATTERN
+from controlpanel.api.models.parameter import APP_TYPE_CHOICES
 
 
 class AppS3BucketSerializer(serializers.ModelSerializer):
@@ -306,5 +310,87 @@ class ParameterSerializer(serializers.ModelSerializer):
         read_only_fields = ('name', )
 
 
+class BulkParameterEntrySerializer(serializers.Serializer):
+    key = serializers.CharField(
+        max_length=50,
+        validators=Parameter._meta.get_field("key").validators,
+    )
+    role_name = serializers.CharField(
+        max_length=63,
+        validators=Parameter._meta.get_field("role_name").validators,
+    )
+    app_type = serializers.ChoiceField(choices=APP_TYPE_CHOICES)
+    value = serializers.CharField()
+    description = serializers.CharField(max_length=600, required=False, default="")
+
+
+class BulkParameterSerializer(serializers.Serializer):
+    parameters = serializers.ListField(
+        child=BulkParameterEntrySerializer(),
+        allow_empty=False,
+        max_length=100,
+    )
+
+
+class AccessGrantSerializer(serializers.Serializer):
+    user = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.all(),
+        required=False,
+    )
+    policy = serializers.PrimaryKeyRelatedField(
+        queryset=IAMManagedPolicy.objects.all(),
+        required=False,
+    )
+    s3bucket = serializers.PrimaryKeyRelatedField(queryset=S3Bucket.objects.all())
+    access_level = serializers.ChoiceField(choices=UserS3Bucket.ACCESS_LEVELS)
+    paths = serializers.ListField(
+        child=serializers.CharField(
+            max_length=255,
+            validators=[RegexValidator(S3BUCKET_PATH_PATTERN)],
+        ),
+        default=list,
+    )
+    is_admin = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if bool(data.get("user")) == bool(data.get("policy")):
+            raise serializers.ValidationError(
+                "Either a user or a policy (group) is required"
+            )
+
+        if data.get("policy") and data["is_admin"]:
+            raise serializers.ValidationError("Groups can't be bucket admins")
+
+        return data
+
+
+class BulkAccessGrantSerializer(serializers.Serializer):
+    # items are validated one by one with `AccessGrantSerializer`, so that
+    # invalid ones can be reported without rejecting the whole request
+    grants = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=200,
+    )
+
+
+class OnboardingUserSerializer(serializers.Serializer):
+    auth0_id = serializers.CharField(max_length=128)
+    username = serializers.CharField(
+        max_length=150,
+        validators=User._meta.get_field("username").validators,
+    )
+    email = serializers.EmailField(required=False, allow_blank=True)
+    name = serializers.CharField(max_length=256, required=False, allow_blank=True)
+
+
+class BulkOnboardingSerializer(serializers.Serializer):
+    users = serializers.ListField(
+        child=OnboardingUserSerializer(),
+        allow_empty=False,
+        max_length=200,
+    )
+
+
 class ToolSerializer(serializers.Serializer):
     name = serializers.CharField()
@@ -16,10 +16,13 @@ router.register("users3buckets", views.UserS3BucketViewSet)
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("access-grants/", views.BulkAccessGrantAPIView.as_view(), name="access-grants"),
     path("apps/<int:pk>/customers/", views.AppCustomersAPIView.as_view(), name='appcustomers-list'),
     path(
         "apps/<int:pk>/customers/<str:user_id>/",
         views.AppCustomersDetailAPIView.as_view(),
         name="appcustomers-detail",
     ),
+    path("helm-pool/", views.HelmPoolAPIView.as_view(), name="helm-pool"),
+    path("user-onboarding/", views.UserOnboardingAPIView.as_view(), name="user-onboarding"),
 ]
@@ -1,7 +1,13 @@
+from controlpanel.api.views.bulk_access import (
+    BulkAccessGrantAPIView,
+)
 from controlpanel.api.views.customers import (
     AppCustomersAPIView,
     AppCustomersDetailAPIView,
 )
+from controlpanel.api.views.helm import (
+    HelmPoolAPIView,
+)
 from controlpanel.api.views.models import (
     UserViewSet,
     AppViewSet,
@@ -11,6 +17,9 @@ from controlpanel.api.views.models import (
     UserAppViewSet,
     ParameterViewSet
 )
+from controlpanel.api.views.onboarding import (
+    UserOnboardingAPIView,
+)
 from controlpanel.api.views.tools import (
     ToolViewSet,
 )
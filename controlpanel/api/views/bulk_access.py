@@ -0,0 +1,38 @@
+from rest_framework.generics import GenericAPIView
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from controlpanel.api import bulk_access, serializers
+
+
+class BulkAccessGrantAPIView(GenericAPIView):
+    """
+    Grant many users and groups access to S3 buckets
+
+    Responds with one result per grant, in the order they were given.
+    Permissions are checked per grant, as bucket admins can grant access to
+    their buckets.
+    """
+    serializer_class = serializers.BulkAccessGrantSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        items = serializer.validated_data["grants"]
+        results = [None] * len(items)
+        grants = []
+        indexes = []
+        for index, item in enumerate(items):
+            grant = serializers.AccessGrantSerializer(data=item)
+            if grant.is_valid():
+                grants.append(grant.validated_data)
+                indexes.append(index)
+            else:
+                results[index] = {"status": "invalid", "errors": grant.errors}
+
+        for index, result in zip(indexes, bulk_access.grant_access(request.user, grants)):
+            results[index] = result
+
+        return Response({"results": results})
@@ -0,0 +1,15 @@
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from controlpanel.api import helm, permissions
+
+
+class HelmPoolAPIView(APIView):
+    """
+    Helm processes running and queued in the control panel process serving
+    the request, with recent queue wait times
+    """
+    permission_classes = (permissions.IsSuperuser,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(helm.pool.stats())
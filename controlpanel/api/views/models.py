@@ -100,3 +100,35 @@ class ParameterViewSet(viewsets.ModelViewSet):
     @atomic
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request):
+        """
+        Create many parameters at once, e.g. the secrets of an Airflow role
+
+        Responds with one result per parameter, in the order they were
+        given, see `Parameter.create_many()`.
+        """
+        serializer = serializers.BulkParameterSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        parameters = []
+        for entry in serializer.validated_data["parameters"]:
+            entry = dict(entry)
+            value = entry.pop("value")
+            parameter = Parameter(created_by=request.user, **entry)
+            parameter.value = value
+            parameters.append(parameter)
+
+        results = Parameter.create_many(parameters)
+
+        return Response({
+            "results": [
+                {
+                    "name": result["parameter"].name,
+                    "status": result["status"],
+                    **({"error": result["error"]} if "error" in result else {}),
+                }
+                for result in results
+            ],
+        })
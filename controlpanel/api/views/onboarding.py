@@ -0,0 +1,43 @@
+from rest_framework import status
+from rest_framework.generics import GenericAPIView
+from rest_framework.response import Response
+
+from controlpanel.api import onboarding, permissions, serializers
+
+
+class UserOnboardingAPIView(GenericAPIView):
+    """
+    Create many users at once, e.g. a new cohort of analysts
+
+    Responds with one result per user, in the order they were given, once
+    the users are created. Their IAM roles and helm releases are provisioned
+    afterwards by the `background_tasks` worker; users which already exist
+    are provisioned again if that didn't complete.
+    """
+    serializer_class = serializers.BulkOnboardingSerializer
+    permission_classes = (permissions.IsSuperuser,)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        entries = serializer.validated_data["users"]
+        results = onboarding.create_users(entries)
+
+        users = [result["user"] for result in results if result["user"]]
+        if users:
+            onboarding.provision_in_background(users)
+
+        return Response(
+            {
+                "results": [
+                    {
+                        "auth0_id": entry["auth0_id"],
+                        "username": entry["username"],
+                        "status": result["status"],
+                    }
+                    for entry, result in zip(entries, results)
+                ],
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
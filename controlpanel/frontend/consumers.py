@@ -11,14 +11,19 @@ from channels.layers import get_channel_layer
 from django.conf import settings
 from django.urls import reverse
 
+from controlpanel.api import cluster, onboarding, outbox
 from controlpanel.api.cluster import (
     TOOL_DEPLOYING,
     TOOL_DEPLOY_FAILED,
     TOOL_IDLED,
     TOOL_READY,
     TOOL_RESTARTING,
+    TOOL_STATUS_UNKNOWN,
     HOME_RESETTING,
     HOME_RESET_FAILED,
+    USER_DELETED,
+    USER_DELETE_FAILED,
+    USER_DELETING,
 )
 from controlpanel.api.models import Tool, ToolDeployment, User, HomeDirectory
 from controlpanel.utils import PatchedAsyncHttpConsumer, sanitize_dns_label
@@ -113,8 +118,12 @@ class BackgroundTaskConsumer(SyncConsumer):
         tool_deployment = ToolDeployment(tool, user)
 
         update_tool_status(tool_deployment, id_token, TOOL_DEPLOYING)
+
+        async def progress(section, output):
+            await send_sse_async(user.auth0_id, tool_progress_event(tool, section))
+
         try:
-            tool_deployment.save()
+            async_to_sync(tool_deployment.deploy)(on_progress=progress)
         except ToolDeployment.Error as err:
             update_tool_status(tool_deployment, id_token, TOOL_DEPLOY_FAILED)
             log.error(err)
@@ -180,22 +189,99 @@ class BackgroundTaskConsumer(SyncConsumer):
         else:
             log.debug(f"Reset home directory for user {user}")
 
+    def user_delete(self, message):
+        """
+        Delete the specified user and their IAM role and helm releases,
+        reporting progress to the user who asked for it
+        Expects a message with `user_id` and `requester_id` values
+        """
+        requester_id = message["requester_id"]
+        try:
+            user = User.objects.get(auth0_id=message["user_id"])
+        except User.DoesNotExist:
+            # e.g. the deletion was asked for twice
+            update_user_deletion_status(
+                requester_id, User(auth0_id=message["user_id"]), USER_DELETED,
+                alreadyDeleted=True,
+            )
+            log.debug(f"User {message['user_id']} already deleted")
+            return
+
+        def progress(step, completed, total, error):
+            update_user_deletion_status(
+                requester_id, user, USER_DELETING, step=step, completed=completed,
+                total=total, error=str(error) if error else None,
+            )
+
+        update_user_deletion_status(requester_id, user, USER_DELETING)
+        try:
+            user.delete(progress=progress)
+        except cluster.DeprovisioningError as err:
+            update_user_deletion_status(requester_id, user, USER_DELETE_FAILED)
+            log.error(err)
+            return
+        except Exception:
+            # e.g. listing the user's helm releases or deleting the record
+            # failed, the requester must not be left waiting
+            update_user_deletion_status(requester_id, user, USER_DELETE_FAILED)
+            log.exception(f"Failed deleting user {user}")
+            return
+
+        update_user_deletion_status(requester_id, user, USER_DELETED)
+        log.debug(f"Deleted user {user}")
+
+    def onboard_users(self, message):
+        """
+        Provision the IAM roles and helm releases of users onboarded in bulk
+        Expects a message with `user_ids`
+        """
+        users = list(User.objects.filter(auth0_id__in=message["user_ids"]))
+        for result in onboarding.provision(users):
+            if result["status"] == onboarding.FAILED:
+                log.error(f"Failed onboarding {result['user']}: {result['error']}")
+            else:
+                log.debug(
+                    f"Onboarded {result['user']}: {result['status']} "
+                    f"({result['elapsed']:.2f}s)"
+                )
+
+    def refresh_role_catalogue(self, message):
+        """
+        Re-list IAM roles into the shared role catalogue
+        """
+        cluster.role_catalogue.refresh()
+
+    def outbox_deliver(self, message):
+        """
+        Deliver pending outbox messages (AWS/helm calls deferred by models)
+        """
+        delivered = outbox.deliver()
+        log.debug(f"Delivered {delivered} outbox messages")
+        outbox.schedule_retry()
+
 
 def send_sse(user_id, event):
     """
     Tell the SSEConsumer to send an event to the specified user
     """
-    async_to_sync(channel_layer.group_send)(
+    async_to_sync(send_sse_async)(user_id, event)
+
+
+async def send_sse_async(user_id, event):
+    await channel_layer.group_send(
         sanitize_dns_label(user_id), {"type": "sse.event", **event},
     )
 
 
 def update_tool_status(tool_deployment, id_token, status):
+    app_version = tool_deployment.get_installed_app_version(id_token)
+    send_tool_status(tool_deployment, status, app_version)
+
+
+def send_tool_status(tool_deployment, status, app_version):
     user = tool_deployment.user
     tool = tool_deployment.tool
 
-    app_version = tool_deployment.get_installed_app_version(id_token)
-
     payload = {
         "toolName": tool.chart_name,
         "version": tool.version,
@@ -205,6 +291,20 @@ def update_tool_status(tool_deployment, id_token, status):
     send_sse(user.auth0_id, {"event": "toolStatus", "data": json.dumps(payload),})
 
 
+def tool_progress_event(tool, section):
+    """
+    Returns a `toolStatus` event telling the user which section of its
+    output helm is writing while deploying `tool`
+    """
+    payload = {
+        "toolName": tool.chart_name,
+        "version": tool.version,
+        "status": TOOL_DEPLOYING,
+        "progress": section.lower(),
+    }
+    return {"event": "toolStatus", "data": json.dumps(payload)}
+
+
 def update_home_status(home_directory, status):
     """
     Update the user with the status of their home directory reset task.
@@ -221,6 +321,24 @@ def update_home_status(home_directory, status):
     )
 
 
+def update_user_deletion_status(requester_id, user, status, **details):
+    """
+    Update the user who asked for `user` to be deleted with the progress of
+    the deletion
+    """
+    send_sse(
+        requester_id,
+        {
+            "event": "userDeletion",
+            "data": json.dumps({
+                "userId": user.auth0_id,
+                "status": status,
+                **details,
+            }),
+        }
+    )
+
+
 def start_background_task(task, message):
     async_to_sync(channel_layer.send)(
         "background_tasks", {"type": task, **message,},
@@ -228,11 +346,18 @@ def start_background_task(task, message):
 
 
 def wait_for_deployment(tool_deployment, id_token):
+    """
+    Report the status of the tool as it changes, watching its `Deployment`,
+    until it's done deploying. If it's still deploying when the watch times
+    out, its status is reported as unknown.
+    """
     status = TOOL_DEPLOYING
-    while status == TOOL_DEPLOYING:
-        status = tool_deployment.get_status(id_token)
-        update_tool_status(tool_deployment, id_token, status)
-        sleep(1)
+    for status, app_version in tool_deployment.watch_status(id_token):
+        send_tool_status(tool_deployment, status, app_version)
+
+    if status == TOOL_DEPLOYING:
+        status = TOOL_STATUS_UNKNOWN
+        send_tool_status(tool_deployment, status, None)
     return status
 
 
@@ -8,7 +8,7 @@ from django.core.validators import RegexValidator, validate_email
 
 from controlpanel.api import validators
 from controlpanel.api.cluster import get_repository
-from controlpanel.api.models import App, S3Bucket
+from controlpanel.api.models import App, IAMManagedPolicy, S3Bucket, User
 from controlpanel.api.models.access_to_s3bucket import S3BUCKET_PATH_REGEX
 from controlpanel.api.models.iam_managed_policy import POLICY_NAME_REGEX
 from controlpanel.api.models.parameter import APP_TYPE_CHOICES
@@ -163,6 +163,57 @@ class GrantAccessForm(forms.Form):
         return cleaned_data
 
 
+class BulkGrantAccessForm(forms.Form):
+    users = forms.ModelMultipleChoiceField(
+        queryset=User.objects.exclude(auth0_id__isnull=True),
+        required=False,
+    )
+    policies = forms.ModelMultipleChoiceField(
+        queryset=IAMManagedPolicy.objects.all(),
+        required=False,
+    )
+    access_level = forms.ChoiceField(
+        choices=[
+            ("readonly", "Read only"),
+            ("readwrite", "Read/write"),
+            ("admin", "Admin"),
+        ],
+        required=True
+    )
+    paths = SimpleArrayField(
+        forms.CharField(
+            max_length=255,
+            validators=[
+                RegexValidator(S3BUCKET_PATH_REGEX),
+            ],
+            required=True,
+        ),
+        label="Paths (optional)",
+        help_text=(
+            "Add specific paths for these users and groups to access or leave "
+            "blank for whole bucket access"
+        ),
+        required=False,
+        delimiter="\n",
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        users = cleaned_data.get('users')
+        policies = cleaned_data.get('policies')
+        if not users and not policies:
+            raise ValidationError("Select at least one user or group")
+
+        cleaned_data['is_admin'] = False
+        if cleaned_data.get('access_level') == 'admin':
+            if policies:
+                raise ValidationError("Groups can't be data source admins")
+            cleaned_data['access_level'] = 'readwrite'
+            cleaned_data['is_admin'] = True
+
+        return cleaned_data
+
+
 class GrantAppAccessForm(forms.Form):
     access_level = forms.ChoiceField(
         choices=[
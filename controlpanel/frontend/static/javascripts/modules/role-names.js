@@ -5,56 +5,50 @@ moj.Modules.roleNames = {
   roleEndpointAttr: "data-role-endpoint",
   formClass: ".appRoles",
   autocompleteWrapperClass: ".autocomplete__wrapper",
-  roleFilters: {
-    airflow: new RegExp('^airflow_'),
-    webapp: new RegExp('^(alpha|dev)_app_'),
-  },
-  roles: null,
 
   init() {
     if (document.querySelector(this.formClass)) {
       this.selectField = document.getElementById(this.selectId);
       this.roleListEndpoint = this.selectField.dataset.roleEndpoint;
-      this.getRoles().then(() => {
-        this.loadRolesToSelect();
-        this.bindEvents();
-      });
+      this.loadRolesToSelect();
     }
   },
 
-  bindEvents() {
-    document.querySelectorAll('input[name=app_type]').forEach(input => {
-      input.addEventListener('change', (event) => {
-        this.loadRolesToSelect();
-      });
+  getRoles(query, populateResults) {
+    const appTypeRadio = document.querySelector('input[name=app_type]:checked');
+    const params = new URLSearchParams({q: query});
+    if (appTypeRadio) {
+      params.set("type", appTypeRadio.value);
+    }
+    return fetch(`${this.roleListEndpoint}?${params}`, {
+      method: "GET"
+    }).then(response => response.json()).then(data => {
+      populateResults(data.results);
     });
   },
 
-  getRoles() {
-    return fetch(this.roleListEndpoint, {
-      method: "GET"
-    }).then(response => response.json()).then(data => {
-      this.roles = data;
-    })
+  selectRole(role) {
+    if (!role) {
+      return;
+    }
+    let option = Array.from(this.selectField.options).find(option => option.value === role);
+    if (!option) {
+      option = new Option(role, role);
+      this.selectField.options[this.selectField.options.length] = option;
+    }
+    option.selected = true;
   },
 
   loadRolesToSelect() {
-    const appTypeRadio = document.querySelector('input[name=app_type]:checked')
-    const appType = appTypeRadio ? appTypeRadio.value : null;
-    let roles = this.roles || [];
-    if (roles && appType) {
-      roles = this.roles.filter(name => this.roleFilters[appType].test(name));
-    }
     this.selectField.querySelectorAll('option:not([value=""])').forEach(option => option.remove());
     this.selectField.id = this.id;
     document.querySelector(this.autocompleteWrapperClass).remove();
     accessibleAutocomplete.enhanceSelectElement({
       id: this.id,
       selectElement: this.selectField,
-      source: roles
-    });
-    roles.forEach(role => {
-      this.selectField.options[this.selectField.options.length] = new Option(role, role);
+      minLength: 1,
+      source: (query, populateResults) => this.getRoles(query, populateResults),
+      onConfirm: role => this.selectRole(role),
     });
   }
 };
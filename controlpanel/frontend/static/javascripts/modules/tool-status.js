@@ -40,7 +40,11 @@ moj.Modules.toolStatus = {
       if (data.toolName != listener.dataset.toolName) {
         return;
       }
-      listener.querySelector(toolstatus.statusLabelClass).innerText = data.status;
+      let statusLabel = data.status;
+      if (data.progress) {
+        statusLabel += ` (${data.progress})`;
+      }
+      listener.querySelector(toolstatus.statusLabelClass).innerText = statusLabel;
       switch (data.status.toUpperCase()) {
         case 'NOT DEPLOYED':
           toolstatus.showActions(listener, ['deploy']);
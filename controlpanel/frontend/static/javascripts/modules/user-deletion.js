@@ -0,0 +1,38 @@
+moj.Modules.userDeletion = {
+  eventType: "userDeletion",
+  listenerClass: ".user-deletion",
+  statusLabelClass: ".user-deletion-status",
+
+  init() {
+    const userDeletionListeners = document.querySelectorAll(this.listenerClass);
+    if (userDeletionListeners.length) {
+      this.bindEvents(userDeletionListeners);
+    }
+  },
+
+  bindEvents(listeners) {
+    listeners.forEach(listener => {
+      moj.Modules.eventStream.addEventListener(
+        this.eventType,
+        this.buildEventHandler(listener)
+      );
+    });
+  },
+
+  buildEventHandler(listener) {
+    const userDeletion = this;
+    return event => {
+      const data = JSON.parse(event.data);
+      if (data.userId != listener.dataset.userId) {
+        return;
+      }
+      let status = data.status;
+      if (data.total) {
+        status = `${status} (${data.completed}/${data.total})`;
+      } else if (data.alreadyDeleted) {
+        status = `${status} (already deleted)`;
+      }
+      listener.querySelector(userDeletion.statusLabelClass).innerText = status;
+    };
+  },
+};
@@ -0,0 +1,33 @@
+moj.Modules.userProvisioning = {
+  eventType: "userProvisioning",
+  listenerClass: ".user-provisioning",
+  statusLabelClass: ".user-provisioning-status",
+
+  init() {
+    const userProvisioningListeners = document.querySelectorAll(this.listenerClass);
+    if (userProvisioningListeners.length) {
+      this.bindEvents(userProvisioningListeners);
+    }
+  },
+
+  bindEvents(listeners) {
+    listeners.forEach(listener => {
+      moj.Modules.eventStream.addEventListener(
+        this.eventType,
+        this.buildEventHandler(listener)
+      );
+    });
+  },
+
+  buildEventHandler(listener) {
+    const userProvisioning = this;
+    return event => {
+      const data = JSON.parse(event.data);
+      let status = data.status;
+      if (data.total) {
+        status = `${status} (${data.completed}/${data.total})`;
+      }
+      listener.querySelector(userProvisioning.statusLabelClass).innerText = status;
+    };
+  },
+};
@@ -10,6 +10,7 @@ urlpatterns = [
     path("datasources/", views.AdminBucketList.as_view(), name="list-all-datasources"),
     path("datasources/<int:pk>/", views.BucketDetail.as_view(), name="manage-datasource"),
     path("datasources/<int:pk>/access/", views.GrantAccess.as_view(), name="grant-datasource-access"),
+    path("datasources/<int:pk>/bulk-access/", views.BulkGrantAccess.as_view(), name="bulk-grant-datasource-access"),
     path("datasources/<int:pk>/delete/", views.DeleteDatasource.as_view(), name="delete-datasource"),
     path("datasources/new/", views.CreateDatasource.as_view(), name="create-datasource"),
     path("datasource-access/<int:pk>/", views.UpdateAccessLevel.as_view(), name="update-access-level"),
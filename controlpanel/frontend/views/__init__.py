@@ -21,6 +21,7 @@ from controlpanel.frontend.views.app import (
 from controlpanel.frontend.views.datasource import (
     AdminBucketList,
     BucketDetail,
+    BulkGrantAccess,
     BucketList,
     CreateDatasource,
     DeleteDatasource,
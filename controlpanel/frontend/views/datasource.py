@@ -12,11 +12,13 @@ from django.views.generic.edit import (
     CreateView,
     DeleteView,
     FormMixin,
+    FormView,
     UpdateView,
 )
 from django.views.generic.list import ListView
 from rules.contrib.views import PermissionRequiredMixin
 
+from controlpanel.api import bulk_access
 from controlpanel.api.elasticsearch import bucket_hits_aggregation
 from controlpanel.api.models import (
     IAMManagedPolicy,
@@ -27,6 +29,7 @@ from controlpanel.api.models import (
 )
 from controlpanel.api.serializers import ESBucketHitsSerializer
 from controlpanel.frontend.forms import (
+    BulkGrantAccessForm,
     CreateDatasourceForm,
     GrantAccessForm,
 )
@@ -381,3 +384,64 @@ class GrantPolicyAccess(
             "paths": form.cleaned_data['paths'],
             "policy_id": form.cleaned_data['policy_id']
         }
+
+
+class BulkGrantAccess(
+    LoginRequiredMixin,
+    PermissionRequiredMixin,
+    FormView,
+):
+    form_class = BulkGrantAccessForm
+    permission_required = 'api.grant_s3bucket_access'
+    template_name = 'datasource-access-bulk-grant.html'
+
+    def get_permission_object(self):
+        return self.bucket
+
+    def dispatch(self, request, *args, **kwargs):
+        self.bucket = get_object_or_404(S3Bucket, pk=kwargs['pk'])
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['bucket'] = self.bucket
+        context['users_options'] = User.objects.exclude(auth0_id__isnull=True)
+        context['policies_options'] = IAMManagedPolicy.objects.all()
+        return context
+
+    def get_success_url(self):
+        return reverse_lazy("manage-datasource", kwargs={"pk": self.bucket.id})
+
+    def form_valid(self, form):
+        entities = [
+            ("user", user, user.username) for user in form.cleaned_data['users']
+        ] + [
+            ("policy", policy, policy.name) for policy in form.cleaned_data['policies']
+        ]
+        grants = [
+            {
+                entity_type: entity,
+                "s3bucket": self.bucket,
+                "access_level": form.cleaned_data['access_level'],
+                "paths": form.cleaned_data['paths'],
+                "is_admin": form.cleaned_data['is_admin'],
+            }
+            for entity_type, entity, _ in entities
+        ]
+        results = bulk_access.grant_access(self.request.user, grants)
+
+        granted = 0
+        for (_, _, name), result in zip(entities, results):
+            if result["status"] in (bulk_access.GRANTED, bulk_access.UPDATED):
+                granted += 1
+            elif result["status"] == bulk_access.FORBIDDEN:
+                messages.error(self.request, f"Not allowed to grant access to {name}")
+            elif result["status"] == bulk_access.FAILED:
+                messages.error(
+                    self.request,
+                    f"Failed granting access to {name}: {result['error']}",
+                )
+
+        if granted:
+            messages.success(self.request, f"Successfully granted access to {granted} users and groups")
+        return super().form_valid(form)
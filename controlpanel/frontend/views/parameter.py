@@ -1,7 +1,11 @@
+from itertools import chain
+import logging
+
+from botocore.exceptions import BotoCoreError, ClientError
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import JsonResponse
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.urls import reverse_lazy
 from django.views import View
 from django.views.generic import ListView, CreateView
@@ -15,6 +19,9 @@ from controlpanel.api.permissions import is_superuser
 from controlpanel.frontend.forms import CreateParameterForm
 
 
+log = logging.getLogger(__name__)
+
+
 class ParameterList(LoginRequiredMixin, PermissionRequiredMixin, ListView):
     context_object_name = 'parameters'
     model = Parameter
@@ -24,6 +31,24 @@ class ParameterList(LoginRequiredMixin, PermissionRequiredMixin, ListView):
     def get_queryset(self):
         return Parameter.objects.filter(created_by=self.request.user)
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # existence and last modified date of the parameters in SSM, read in
+        # batches rather than once per parameter
+        context["ssm_available"] = True
+        try:
+            metadata = cluster.describe_parameters(
+                [parameter.name for parameter in context["parameters"]]
+            )
+        except (BotoCoreError, ClientError) as error:
+            # the list is still useful without them
+            log.error(f"Failed describing parameters: {error}")
+            context["ssm_available"] = False
+            metadata = {}
+        for parameter in context["parameters"]:
+            parameter.ssm_metadata = metadata.get(parameter.name)
+        return context
+
 
 class AdminParameterList(ParameterList):
     permission_required = 'api.is_superuser'
@@ -86,12 +111,47 @@ class ParameterDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
 
 
 class ParameterFormRoleList(LoginRequiredMixin, View):
-
-    def get(self, *args, **kwargs):
-        roles = cluster.list_role_names()
-        data = [
-            r for r in roles
-            if r.startswith(f"airflow")
-            or r.startswith(f"{settings.ENV}_app")
-        ]
-        return JsonResponse(data, safe=False)
+    """
+    Typeahead of the airflow and webapp IAM role names
+
+    Query parameters:
+    - `q`: only roles containing this
+    - `type`: only `airflow` or `webapp` roles
+    - `offset` and `limit`: page of results
+    """
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+
+    @property
+    def role_prefixes(self):
+        return {
+            "airflow": ["airflow"],
+            "webapp": [f"{settings.ENV}_app"],
+        }
+
+    def get(self, request, *args, **kwargs):
+        try:
+            offset = max(int(request.GET.get("offset", 0)), 0)
+            limit = int(request.GET.get("limit", self.DEFAULT_LIMIT))
+            # at least one result, so that paging through them always ends
+            limit = min(max(limit, 1), self.MAX_LIMIT)
+        except ValueError:
+            return HttpResponseBadRequest("offset and limit must be integers")
+
+        role_type = request.GET.get("type")
+        if role_type in self.role_prefixes:
+            prefixes = self.role_prefixes[role_type]
+        else:
+            prefixes = list(chain.from_iterable(self.role_prefixes.values()))
+
+        count, names = cluster.role_catalogue.search(
+            query=request.GET.get("q", ""),
+            prefixes=prefixes,
+            offset=offset,
+            limit=limit,
+        )
+        return JsonResponse({
+            "count": count,
+            "next_offset": offset + limit if offset + limit < count else None,
+            "results": names,
+        })
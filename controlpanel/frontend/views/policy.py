@@ -1,7 +1,6 @@
-from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import JsonResponse, HttpResponseRedirect
+from django.http import HttpResponseRedirect
 from django.urls import reverse_lazy
 from django.views import View
 from django.views.generic import ListView, CreateView
@@ -9,10 +8,10 @@ from django.views.generic.detail import SingleObjectMixin
 from django.views.generic.edit import FormMixin, DeleteView, UpdateView
 from rules.contrib.views import PermissionRequiredMixin
 
-from controlpanel.api import cluster
 from controlpanel.api.models import IAMManagedPolicy, User
 from controlpanel.api.permissions import is_superuser
 from controlpanel.frontend.forms import CreateIAMManagedPolicyForm, AddUserToIAMManagedPolicyForm
+from controlpanel.frontend.views.parameter import ParameterFormRoleList
 
 
 class IAMManagedPolicyList(LoginRequiredMixin, PermissionRequiredMixin, ListView):
@@ -111,16 +110,8 @@ class IAMManagedPolicyDelete(LoginRequiredMixin, PermissionRequiredMixin, Delete
         return queryset.filter(created_by=self.request.user)
 
 
-class IAMManagedPolicyFormRoleList(LoginRequiredMixin, View):
-
-    def get(self, *args, **kwargs):
-        roles = cluster.list_role_names()
-        data = [
-            r for r in roles
-            if r.startswith(f"airflow")
-            or r.startswith(f"{settings.ENV}_app")
-        ]
-        return JsonResponse(data, safe=False)
+class IAMManagedPolicyFormRoleList(ParameterFormRoleList):
+    pass
 
 
 class IAMManagedPolicyRemoveUser(LoginRequiredMixin, PermissionRequiredMixin, SingleObjectMixin, View):
@@ -60,6 +60,7 @@ class ToolList(LoginRequiredMixin, PermissionRequiredMixin, ListView):
 
         context = super().get_context_data(*args, **kwargs)
         context["id_token"] = id_token
+        context["provisioning_status"] = cluster.User(user).provisioning_status
 
         # Get list of deployed tools
         deployments = cluster.ToolDeployment.get_deployments(user, id_token)
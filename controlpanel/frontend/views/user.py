@@ -2,6 +2,7 @@ import dateutil.parser
 from datetime import datetime, timedelta
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import HttpResponseRedirect
 from django.urls import reverse_lazy
 from django.views.generic.base import RedirectView
 from django.views.generic.detail import DetailView, SingleObjectMixin
@@ -11,6 +12,7 @@ from rules.contrib.views import PermissionRequiredMixin
 
 from controlpanel.api import auth0
 from controlpanel.api.models import User
+from controlpanel.frontend.consumers import start_background_task
 
 
 def ninety_days_ago():
@@ -45,10 +47,23 @@ class UserList(LoginRequiredMixin, PermissionRequiredMixin, ListView):
 class UserDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
     model = User
     permission_required = 'api.destroy_user'
-
-    def get_success_url(self):
-        messages.success(self.request, "Successfully deleted user")
-        return reverse_lazy("list-users")
+    success_url = reverse_lazy("list-users")
+
+    def delete(self, request, *args, **kwargs):
+        """
+        Deleting a user's IAM role and helm releases takes a while, so it's
+        done by a background task, which reports progress over SSE
+        """
+        user = self.object = self.get_object()
+        start_background_task(
+            "user.delete",
+            {
+                "user_id": user.auth0_id,
+                "requester_id": request.user.auth0_id,
+            },
+        )
+        messages.success(request, f"Deleting user {user.username}")
+        return HttpResponseRedirect(self.get_success_url())
 
 
 class UserDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
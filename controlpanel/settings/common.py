@@ -12,6 +12,13 @@ ENABLED = {
 
     # Enable redirecting legacy API URLs to new API app
     "redirect_legacy_api_urls": is_truthy(os.environ.get("ENABLE_LEGACY_API_REDIRECT", True)),
+
+    # Enable deferring AWS/helm calls to the background worker via the outbox
+    "deferred_cloud_tasks": is_truthy(os.environ.get("ENABLE_DEFERRED_CLOUD_TASKS", True)),
+
+    # Enable reading users' Deployments from an in-process cache kept up to
+    # date with a watch, rather than listing them on every status check
+    "deployment_informer": is_truthy(os.environ.get("ENABLE_DEPLOYMENT_INFORMER", True)),
 }
 
 # Name of the deployment environment (dev/alpha)
@@ -445,6 +452,30 @@ TOOLS = {
 # Helm repo where tool charts are hosted
 HELM_REPO = os.environ.get('HELM_REPO', 'mojanalytics')
 
+# Maximum number of helm processes running at once in each control panel
+# process, and in each namespace
+HELM_MAX_PROCESSES = int(os.environ.get('HELM_MAX_PROCESSES', 10))
+HELM_MAX_PROCESSES_PER_NAMESPACE = int(os.environ.get('HELM_MAX_PROCESSES_PER_NAMESPACE', 2))
+
+# Maximum number of helm commands waiting for a process, and seconds they wait
+# before being rejected
+HELM_MAX_QUEUED = int(os.environ.get('HELM_MAX_QUEUED', 100))
+HELM_QUEUE_TIMEOUT = int(os.environ.get('HELM_QUEUE_TIMEOUT', 300))
+
+# Seconds a helm command which isn't waited for may run before being killed,
+# freeing its process
+HELM_PROCESS_TIMEOUT = int(os.environ.get('HELM_PROCESS_TIMEOUT', 900))
+
+# Where Tiller stores helm releases, read to check releases without running
+# helm. TILLER_STORAGE is Tiller's `--storage` option, `configmap` or `secret`
+TILLER_NAMESPACE = os.environ.get('TILLER_NAMESPACE', 'kube-system')
+TILLER_STORAGE = os.environ.get('TILLER_STORAGE', 'configmap')
+
+# Maximum number of Kubernetes API clients (one per user token) kept open by
+# each control panel process, and seconds an unused client is kept
+KUBERNETES_API_CLIENTS = int(os.environ.get('KUBERNETES_API_CLIENTS', 100))
+KUBERNETES_API_CLIENT_IDLE_TIMEOUT = int(os.environ.get('KUBERNETES_API_CLIENT_IDLE_TIMEOUT', 300))
+
 # domain where tools are deployed
 TOOLS_DOMAIN = os.environ.get('TOOLS_DOMAIN')
 
@@ -551,6 +582,36 @@ SAML_PROVIDER = os.environ.get('SAML_PROVIDER')
 # Name of S3 bucket where logs are stored
 LOGS_BUCKET_NAME = os.environ.get('LOGS_BUCKET_NAME', 'moj-analytics-s3-logs')
 
+# Seconds a cached IAM role policy document is trusted before being re-read
+IAM_POLICY_CACHE_TTL = int(os.environ.get('IAM_POLICY_CACHE_TTL', 300))
+
+# Connection pool size, retries and timeouts shared by every AWS API client
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 50))
+AWS_RETRY_MODE = os.environ.get('AWS_RETRY_MODE', 'adaptive')
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', 5))
+AWS_CONNECT_TIMEOUT = int(os.environ.get('AWS_CONNECT_TIMEOUT', 5))
+AWS_READ_TIMEOUT = int(os.environ.get('AWS_READ_TIMEOUT', 30))
+
+# Seconds before the cached list of IAM role names is refreshed in the background
+IAM_ROLE_CATALOGUE_TTL = int(os.environ.get('IAM_ROLE_CATALOGUE_TTL', 600))
+
+# Maximum number of threads making IAM calls concurrently for bulk operations
+IAM_MAX_WORKERS = int(os.environ.get('IAM_MAX_WORKERS', 8))
+
+# Maximum number of threads making SSM calls concurrently for bulk operations
+SSM_MAX_WORKERS = int(os.environ.get('SSM_MAX_WORKERS', 4))
+
+# Seconds the metadata of SSM parameters (existence, last modified) is cached
+SSM_METADATA_CACHE_TTL = int(os.environ.get('SSM_METADATA_CACHE_TTL', 60))
+
+# Maximum number of resources (IAM role, helm releases) of a user deleted
+# concurrently
+DEPROVISIONING_MAX_WORKERS = int(os.environ.get('DEPROVISIONING_MAX_WORKERS', 4))
+
+# Maximum number of users provisioned (IAM role, helm releases) concurrently
+# when onboarding users in bulk
+ONBOARDING_MAX_WORKERS = int(os.environ.get('ONBOARDING_MAX_WORKERS', 5))
+
 
 # -- Airflow
 AIRFLOW_SECRET_KEY = os.environ.get('AIRFLOW_SECRET_KEY')
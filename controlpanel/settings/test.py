@@ -10,6 +10,18 @@ SAML_PROVIDER = "test-saml"
 
 LOGGING["loggers"]["django"]["level"] = "WARNING"
 
+# Deliver outbox messages immediately
+ENABLED["deferred_cloud_tasks"] = False
+
+# Don't watch the cluster from the tests
+ENABLED["deployment_informer"] = False
+
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer",
+    },
+}
+
 AUTHENTICATION_BACKENDS = [
     'rules.permissions.ObjectPermissionBackend',
     'django.contrib.auth.backends.ModelBackend',
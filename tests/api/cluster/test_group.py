@@ -27,3 +27,14 @@ def test_create(aws, iam_managed_policy):
         iam_managed_policy.path,
     )
 
+
+def test_add_member(aws, iam_managed_policy):
+    group = cluster.RoleGroup(iam_managed_policy)
+    group.add_member('test_user_alice')
+    aws.attach_group_member.assert_called_with(group.arn, 'test_user_alice')
+
+
+def test_remove_member(aws, iam_managed_policy):
+    group = cluster.RoleGroup(iam_managed_policy)
+    group.remove_member('test_user_alice')
+    aws.detach_group_member.assert_called_with(group.arn, 'test_user_alice')
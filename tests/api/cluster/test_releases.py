@@ -0,0 +1,130 @@
+import base64
+import gzip
+from unittest.mock import MagicMock
+
+import pytest
+
+from controlpanel.api import cluster
+from controlpanel.api.helm import Release, decode_release
+
+
+def protobuf(*fields):
+    """
+    Returns the protobuf encoding of `fields`, (number, value) pairs
+    """
+    def varint(value):
+        encoded = b""
+        while value > 0x7F:
+            encoded += bytes([value & 0x7F | 0x80])
+            value >>= 7
+        return encoded + bytes([value])
+
+    message = b""
+    for number, value in fields:
+        if isinstance(value, int):
+            message += varint(number << 3) + varint(value)
+        else:
+            if isinstance(value, str):
+                value = value.encode()
+            message += varint(number << 3 | 2) + varint(len(value)) + value
+    return message
+
+
+def encode_release(name, namespace, chart, version, revision, app_version=None):
+    metadata = [(1, chart), (4, version)]
+    if app_version:
+        metadata.append((13, app_version))
+    message = protobuf(
+        (1, name),
+        (3, protobuf((1, protobuf(*metadata)), (4, protobuf((1, "values: {}"))))),
+        (5, "apiVersion: v1\n" * 100),
+        (7, revision),
+        (8, namespace),
+    )
+    return base64.b64encode(gzip.compress(message)).decode()
+
+
+def stored_release(name, namespace, chart, version, revision, status="DEPLOYED"):
+    item = MagicMock()
+    item.metadata.labels = {
+        "NAME": name,
+        "OWNER": "TILLER",
+        "STATUS": status,
+        "VERSION": str(revision),
+    }
+    item.data = {"release": encode_release(name, namespace, chart, version, revision)}
+    return item
+
+
+def page(items, token=None):
+    result = MagicMock()
+    result.items = items
+    result.metadata._continue = token
+    return result
+
+
+def test_decode_release():
+    encoded = encode_release(
+        "rstudio-alice", "user-alice", "rstudio", "2.2.5", 300, app_version="RStudio: 1.2",
+    )
+    assert decode_release(encoded, status="DEPLOYED") == Release(
+        name="rstudio-alice",
+        namespace="user-alice",
+        chart="rstudio",
+        version="2.2.5",
+        app_version="RStudio: 1.2",
+        revision=300,
+        status="DEPLOYED",
+    )
+
+
+def test_get_releases(k8s_client):
+    list_config_map = k8s_client.CoreV1Api.list_namespaced_config_map
+    list_config_map.side_effect = [
+        page([
+            stored_release("rstudio-alice", "user-alice", "rstudio", "2.2.4", 1, "FAILED"),
+            stored_release("rstudio-alice", "user-alice", "rstudio", "2.2.5", 2),
+            stored_release("rstudio-bob", "user-bob", "rstudio", "2.2.5", 1),
+        ], token="next"),
+        page([
+            stored_release("jupyter-lab-alice", "user-alice", "jupyter-lab", "0.3.0", 1),
+        ]),
+    ]
+
+    releases = cluster.get_releases(namespace="user-alice")
+
+    assert sorted(releases) == ["jupyter-lab-alice", "rstudio-alice"]
+    assert releases["rstudio-alice"].version == "2.2.5"
+    assert releases["rstudio-alice"].status == "DEPLOYED"
+    selector = "OWNER=TILLER,STATUS!=SUPERSEDED,STATUS!=DELETED"
+    list_config_map.assert_any_call(
+        "kube-system", label_selector=selector, limit=cluster.RELEASES_PAGE_SIZE,
+    )
+    list_config_map.assert_called_with(
+        "kube-system", label_selector=selector, limit=cluster.RELEASES_PAGE_SIZE, _continue="next",
+    )
+
+
+def test_get_releases_stored_in_secrets(k8s_client, settings):
+    settings.TILLER_STORAGE = "secret"
+    secret = stored_release("rstudio-alice", "user-alice", "rstudio", "2.2.5", 1)
+    secret.data["release"] = base64.b64encode(secret.data["release"].encode()).decode()
+    k8s_client.CoreV1Api.list_namespaced_secret.return_value = page([secret])
+
+    releases = cluster.get_releases(names=["rstudio-alice"], include_deleted=True)
+
+    assert releases["rstudio-alice"].chart == "rstudio"
+    k8s_client.CoreV1Api.list_namespaced_secret.assert_called_with(
+        "kube-system",
+        label_selector="OWNER=TILLER,STATUS!=SUPERSEDED,NAME in (rstudio-alice)",
+        limit=cluster.RELEASES_PAGE_SIZE,
+    )
+
+
+@pytest.mark.parametrize("items, exists", [([], False), (None, True)], ids=["missing", "installed"])
+def test_release_exists(k8s_client, items, exists):
+    if items is None:
+        items = [stored_release("alice-rstudio", "user-alice", "rstudio", "1.0.0", 1)]
+    k8s_client.CoreV1Api.list_namespaced_config_map.return_value = page(items)
+
+    assert cluster.release_exists("alice-rstudio") == exists
@@ -0,0 +1,85 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+import pytest
+
+from controlpanel.api import cluster
+
+
+ROLES = [
+    "test_user_bob",
+    "airflow_daily",
+    "test_app_foo",
+    "test_app_bar",
+    "airflow_weekly",
+    "test_user_alice",
+]
+
+
+@pytest.yield_fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def catalogue(aws):
+    aws.list_role_names.return_value = ROLES
+    return cluster.RoleCatalogue()
+
+
+@pytest.yield_fixture
+def schedule_refresh(catalogue):
+    with patch.object(cluster.RoleCatalogue, "schedule_refresh") as schedule_refresh:
+        yield schedule_refresh
+
+
+def test_names_are_listed_once(aws, catalogue):
+    assert catalogue.names() == sorted(ROLES)
+    assert catalogue.names() == sorted(ROLES)
+
+    # shared with other processes
+    assert cluster.RoleCatalogue().names() == sorted(ROLES)
+
+    aws.list_role_names.assert_called_once()
+
+
+def test_search(catalogue):
+    assert catalogue.search(prefixes=["airflow", "test_app"]) == (4, [
+        "airflow_daily", "airflow_weekly", "test_app_bar", "test_app_foo",
+    ])
+    assert catalogue.search(query="a", prefixes=["test_"], offset=1, limit=2) == (
+        3, ["test_app_foo", "test_user_alice"],
+    )
+    assert catalogue.search(query="bob") == (1, ["test_user_bob"])
+
+
+def test_invalidate_schedules_refresh(aws, catalogue, schedule_refresh):
+    catalogue.names()
+    catalogue.invalidate()
+
+    assert catalogue.names() == sorted(ROLES)
+    schedule_refresh.assert_called_once()
+
+    aws.list_role_names.return_value = ROLES + ["test_user_carol"]
+    cluster.RoleCatalogue().refresh()
+
+    assert "test_user_carol" in catalogue.names()
+
+
+def test_expired_names_are_served_until_refreshed(settings, catalogue, schedule_refresh):
+    settings.IAM_ROLE_CATALOGUE_TTL = 0
+    catalogue.names()
+
+    assert catalogue.names() == sorted(ROLES)
+    schedule_refresh.assert_called()
+
+
+def test_creating_role_invalidates(aws, catalogue, schedule_refresh, users):
+    catalogue.names()
+
+    cluster.User(users["normal_user"]).create()
+
+    catalogue.names()
+    schedule_refresh.assert_called_once()
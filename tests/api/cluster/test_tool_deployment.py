@@ -1,6 +1,15 @@
 from unittest.mock import Mock, patch
 
-from controlpanel.api.cluster import ToolDeployment
+from kubernetes.client.rest import ApiException
+import pytest
+
+from controlpanel.api.cluster import (
+    TOOL_DEPLOYING,
+    TOOL_DEPLOY_FAILED,
+    TOOL_NOT_DEPLOYED,
+    TOOL_READY,
+    ToolDeployment,
+)
 from controlpanel.api.models import Tool, User
 
 
@@ -23,3 +32,105 @@ def test_get_installed_chart_version():
         get_deployment.return_value = deploy
         assert td.get_installed_chart_version(id_token) == installed_chart_version
         get_deployment.assert_called_with(id_token)
+
+
+def deployment(name, *conditions, resource_version="1"):
+    """
+    Returns a `Deployment` of the test tool with `conditions`, (type,
+    status) pairs
+    """
+    deployment = Mock()
+    deployment.metadata.name = name
+    deployment.metadata.labels = {"app": "test-chart", "chart": "test-chart-1.2.3"}
+    deployment.metadata.resource_version = resource_version
+    deployment.spec.replicas = 1
+    deployment.status.conditions = [
+        Mock(type=type, status=status) for type, status in conditions
+    ]
+    return deployment
+
+
+@pytest.fixture
+def watch():
+    with patch("controlpanel.api.cluster.watch") as watch:
+        yield watch.Watch.return_value
+
+
+def test_watch_status(k8s_client, watch):
+    td = ToolDeployment(User(username="test-user"), Tool(chart_name="test-chart"))
+    listed = deployment("test-chart-test-user", ("Progressing", "True"))
+    k8s_client.AppsV1Api.list_namespaced_deployment.return_value = Mock(
+        items=[listed],
+        metadata=Mock(resource_version="42"),
+    )
+    ready = deployment(
+        "test-chart-test-user",
+        ("Progressing", "True"),
+        ("Available", "True"),
+        resource_version="44",
+    )
+    watch.stream.return_value = iter([
+        {"type": "MODIFIED", "object": deployment(
+            "test-chart-test-user", ("Progressing", "True"), resource_version="43",
+        )},
+        {"type": "MODIFIED", "object": ready},
+    ])
+
+    statuses = list(td.watch_status("dummy"))
+
+    assert statuses == [(TOOL_DEPLOYING, listed), (TOOL_READY, ready)]
+    k8s_client.AppsV1Api.list_namespaced_deployment.assert_called_once()
+    _, kwargs = watch.stream.call_args
+    assert kwargs["field_selector"] == "metadata.name=test-chart-test-user"
+    assert kwargs["resource_version"] == "42"
+
+
+def test_watch_status_not_deployed(k8s_client, watch):
+    td = ToolDeployment(User(username="test-user"), Tool(chart_name="test-chart"))
+    k8s_client.AppsV1Api.list_namespaced_deployment.return_value = Mock(items=[])
+
+    assert list(td.watch_status("dummy")) == [(TOOL_NOT_DEPLOYED, None)]
+    watch.stream.assert_not_called()
+
+
+def test_watch_status_relists_expired_watch(k8s_client, watch):
+    td = ToolDeployment(User(username="test-user"), Tool(chart_name="test-chart"))
+    k8s_client.AppsV1Api.list_namespaced_deployment.side_effect = [
+        Mock(
+            items=[deployment("test-chart-test-user", ("Progressing", "True"))],
+            metadata=Mock(resource_version="42"),
+        ),
+        Mock(
+            items=[deployment("test-chart-test-user", ("Progressing", "False"))],
+            metadata=Mock(resource_version="50"),
+        ),
+    ]
+    watch.stream.side_effect = ApiException(status=410)
+
+    statuses = [status for status, _ in td.watch_status("dummy")]
+
+    assert statuses == [TOOL_DEPLOYING, TOOL_DEPLOY_FAILED]
+
+
+@pytest.mark.parametrize("code,delayed", [(410, False), (500, True)])
+def test_watch_status_error_event(k8s_client, watch, code, delayed):
+    td = ToolDeployment(User(username="test-user"), Tool(chart_name="test-chart"))
+    k8s_client.AppsV1Api.list_namespaced_deployment.side_effect = [
+        Mock(
+            items=[deployment("test-chart-test-user", ("Progressing", "True"))],
+            metadata=Mock(resource_version="42"),
+        ),
+        Mock(
+            items=[deployment("test-chart-test-user", ("Progressing", "False"))],
+            metadata=Mock(resource_version="50"),
+        ),
+    ]
+    watch.stream.return_value = iter([
+        {"type": "ERROR", "raw_object": {"code": code, "message": "Boom"}},
+    ])
+
+    with patch("controlpanel.api.cluster.time.sleep") as sleep:
+        statuses = [status for status, _ in td.watch_status("dummy")]
+
+    assert statuses == [TOOL_DEPLOYING, TOOL_DEPLOY_FAILED]
+    assert sleep.called == delayed
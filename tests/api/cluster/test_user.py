@@ -1,8 +1,10 @@
-from unittest.mock import call
+import json
+from unittest.mock import call, patch
 
 import pytest
 
 from controlpanel.api import cluster
+from controlpanel.utils import sanitize_dns_label
 
 
 def test_iam_role_name(users):
@@ -23,18 +25,75 @@ def test_create(aws, helm, settings, users):
             f"Email={user.email},"
             f"Fullname={user.get_full_name()},"
             f"Env={settings.ENV},"
-            f"OidcDomain={settings.OIDC_DOMAIN}"
+            f"OidcDomain={settings.OIDC_DOMAIN}",
+            timeout=cluster.USER_RELEASE_TIMEOUT,
         ),
         call(
             f'config-user-{user.slug}',
             'mojanalytics/config-user',
             f'--namespace=user-{user.slug}',
             f'--set=Username={user.slug}',
+            timeout=cluster.USER_RELEASE_TIMEOUT,
         ),
     ]
     helm.upgrade_release.has_calls(expected_calls)
 
 
+@pytest.yield_fixture
+def sent_events():
+    sent = []
+
+    async def group_send(group, event):
+        sent.append((group, event))
+
+    with patch('controlpanel.api.cluster.get_channel_layer') as get_channel_layer:
+        get_channel_layer.return_value.group_send = group_send
+        yield sent
+
+
+def sent_statuses(sent_events):
+    return [json.loads(event['data'])['status'] for _, event in sent_events]
+
+
+def test_provision(aws, helm, users, sent_events):
+    user = users['normal_user']
+    cluster_user = cluster.User(user)
+    # creating the user already provisioned it
+    aws.reset_mock()
+    helm.reset_mock()
+
+    cluster_user.provision()
+
+    aws.create_user_role.assert_called_with(user)
+    assert helm.upgrade_release.call_count == 2
+    assert cluster_user.provisioning_status == cluster.USER_PROVISIONED
+    assert sent_statuses(sent_events) == [
+        cluster.USER_PROVISIONING,
+        cluster.USER_PROVISIONING,
+        cluster.USER_PROVISIONING,
+        cluster.USER_PROVISIONED,
+    ]
+    group, event = sent_events[-1]
+    assert group == sanitize_dns_label(user.auth0_id)
+    assert event['event'] == 'userProvisioning'
+
+
+def test_provision_failed(aws, helm, users, sent_events):
+    user = users['normal_user']
+    cluster_user = cluster.User(user)
+    aws.reset_mock()
+    helm.upgrade_release.side_effect = cluster.HelmError("Boom")
+
+    with pytest.raises(cluster.ProvisioningError) as excinfo:
+        cluster_user.provision()
+
+    assert list(excinfo.value.errors) == [f'install releases for {user.slug}']
+    # the role was still created
+    aws.create_user_role.assert_called_with(user)
+    assert cluster_user.provisioning_status == cluster.USER_PROVISION_FAILED
+    assert sent_statuses(sent_events)[-1] == cluster.USER_PROVISION_FAILED
+
+
 def test_reset_home(helm, users):
     user = users['normal_user']
     cluster.User(user).reset_home()
@@ -52,12 +111,36 @@ def test_reset_home(helm, users):
 
 def test_delete(aws, helm, users):
     user = users['normal_user']
+    helm.list_releases.return_value = [f"rstudio-{user.slug}"]
     cluster.User(user).delete()
 
     aws.delete_role.assert_called_with(user.iam_role_name)
+    helm.list_releases.assert_called_with(f"--namespace=user-{user.slug}")
     expected_calls = [
-        call(helm.list_releases.return_value),
-        call(f"init-user-{user.slug}"),
+        call(True, f"rstudio-{user.slug}"),
+        call(True, f"init-user-{user.slug}"),
     ]
-    helm.delete.assert_has_calls(expected_calls)
+    helm.delete.assert_has_calls(expected_calls, any_order=True)
+
+
+def test_delete_reports_progress_and_failures(aws, helm, users):
+    user = users['normal_user']
+    helm.list_releases.return_value = [f"rstudio-{user.slug}"]
+    aws.delete_role.side_effect = Exception("Boom")
+    progress = []
+
+    with pytest.raises(cluster.DeprovisioningError) as excinfo:
+        cluster.User(user).delete(
+            progress=lambda step, completed, total, error: progress.append(
+                (step, completed, total, str(error) if error else None),
+            ),
+        )
+
+    assert list(excinfo.value.errors) == [f"delete role {user.iam_role_name}"]
+    # the other steps still ran
+    assert helm.delete.call_count == 2
+    assert sorted(progress, key=lambda p: p[1])[-1][1:3] == (3, 3)
+    assert (f"delete role {user.iam_role_name}", "Boom") in {
+        (step, error) for step, _, _, error in progress
+    }
 
@@ -3,7 +3,7 @@ from unittest.mock import patch
 from model_mommy import mommy
 import pytest
 
-from controlpanel.api.models import App
+from controlpanel.api.models import App, Parameter
 
 
 @pytest.yield_fixture
@@ -45,6 +45,23 @@ def test_delete_also_deletes_app_artifacts():
         cluster.App.return_value.delete.assert_called()
 
 
+@pytest.mark.django_db
+def test_delete_also_deletes_app_parameters(aws):
+    app = App.objects.create(repo_url="https://example.com/repo_name")
+    secrets = mommy.make(
+        "api.Parameter", 2, role_name=app.iam_role_name, app_type="webapp",
+    )
+    other = mommy.make("api.Parameter", role_name="other_role", app_type="webapp")
+
+    with patch("controlpanel.api.models.app.cluster.App.delete"):
+        app.delete()
+
+    aws.delete_parameters.assert_called_once()
+    names, = aws.delete_parameters.call_args[0]
+    assert sorted(names) == sorted(parameter.name for parameter in secrets)
+    assert list(Parameter.objects.all()) == [other]
+
+
 @pytest.mark.django_db
 def test_get_customers(auth0):
     app = App.objects.create(repo_url="https://example.com/repo_name")
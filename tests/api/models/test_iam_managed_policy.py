@@ -0,0 +1,71 @@
+import pytest
+
+from controlpanel.api.models import IAMManagedPolicy
+
+
+@pytest.fixture(autouse=True)
+def enable_db_for_all_tests(db):
+    pass
+
+
+@pytest.fixture
+def group(aws):
+    group = IAMManagedPolicy.objects.create(name="test-group")
+    aws.reset_mock()
+    return group
+
+
+def test_create(aws):
+    group = IAMManagedPolicy.objects.create(name="test-group")
+
+    aws.create_group.assert_called_with(group.name, group.path)
+    aws.update_group_members.assert_not_called()
+
+
+def test_add_user_attaches_only_their_role(aws, group, users):
+    user = users["normal_user"]
+
+    group.users.add(user)
+
+    aws.attach_group_member.assert_called_once_with(group.arn, user.iam_role_name)
+    aws.update_group_members.assert_not_called()
+
+
+def test_add_group_to_user(aws, group, users):
+    user = users["normal_user"]
+
+    user.iammanagedpolicy_set.add(group)
+
+    aws.attach_group_member.assert_called_once_with(group.arn, user.iam_role_name)
+
+
+def test_remove_user_detaches_only_their_role(aws, group, users):
+    group.users.add(users["normal_user"], users["other_user"])
+
+    group.users.remove(users["other_user"])
+
+    aws.detach_group_member.assert_called_once_with(
+        group.arn, users["other_user"].iam_role_name,
+    )
+    aws.update_group_members.assert_not_called()
+
+
+def test_clear_detaches_all_members(aws, group, users):
+    group.users.add(users["normal_user"], users["other_user"])
+
+    group.users.clear()
+
+    assert {c.args for c in aws.detach_group_member.call_args_list} == {
+        (group.arn, users["normal_user"].iam_role_name),
+        (group.arn, users["other_user"].iam_role_name),
+    }
+
+
+def test_reconcile_members(aws, group, users):
+    group.users.add(users["normal_user"])
+
+    group.reconcile_members()
+
+    aws.update_group_members.assert_called_once_with(
+        group.arn, {users["normal_user"].iam_role_name},
+    )
@@ -0,0 +1,47 @@
+import pytest
+
+from controlpanel.api.models import Parameter
+
+
+def parameter(key, value="secret"):
+    parameter = Parameter(key=key, role_name="airflow_daily", app_type="airflow")
+    parameter.value = value
+    return parameter
+
+
+@pytest.mark.django_db
+def test_create_many(aws):
+    parameters = [parameter("foo"), parameter("bar"), parameter("baz"), parameter("foo")]
+    aws.get_parameters.return_value = {parameters[1].name: {"Name": parameters[1].name}}
+    aws.create_parameters.return_value = {parameters[2].name: Exception("Throttled")}
+
+    results = Parameter.create_many(parameters)
+
+    assert [result["status"] for result in results] == [
+        Parameter.CREATED,
+        Parameter.EXISTS,
+        Parameter.FAILED,
+        Parameter.EXISTS,
+    ]
+    assert results[2]["error"] == "Throttled"
+    # values are never read back
+    aws.get_parameters.assert_called_once()
+    assert aws.get_parameters.call_args[1] == {"with_decryption": False}
+    created, = aws.create_parameters.call_args[0]
+    assert [entry["name"] for entry in created] == [parameters[0].name, parameters[2].name]
+    assert created[0]["value"] == "secret"
+    assert list(Parameter.objects.values_list("key", flat=True)) == ["foo"]
+
+
+@pytest.mark.django_db
+def test_delete_for_role(aws):
+    parameters = [parameter("foo"), parameter("bar")]
+    aws.get_parameters.return_value = {}
+    aws.create_parameters.return_value = {}
+    Parameter.create_many(parameters)
+
+    Parameter.delete_for_role("airflow_daily")
+    Parameter.delete_for_role("airflow_daily")
+
+    aws.delete_parameters.assert_called_once_with([p.name for p in parameters])
+    assert not Parameter.objects.exists()
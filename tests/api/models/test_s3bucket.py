@@ -46,7 +46,7 @@ def test_delete_marks_bucket_for_archival_when_tag_bucket_fails(bucket, aws):
 
 def test_bucket_create(aws):
     bucket = S3Bucket.objects.create(name="test-bucket-1")
-    aws.create_bucket.assert_called_with(bucket.name, False)
+    aws.create_bucket.assert_called_with(bucket.name, False, ())
 
 
 def test_create_users3bucket(aws, superuser):
@@ -58,3 +58,9 @@ def test_create_users3bucket(aws, superuser):
     aws.create_bucket.assert_called()
 
     assert UserS3Bucket.objects.get(user=superuser, s3bucket=bucket)
+
+
+def test_delete_batches_policy_updates(bucket, aws):
+    bucket.delete()
+
+    aws.batch_policy_updates.assert_called_once()
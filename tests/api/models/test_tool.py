@@ -26,12 +26,12 @@ def test_deploy_for_generic(helm, token_hex, tool, users):
 
     # simulate release with old naming scheme installed
     old_release_name = f"{user.username}-{tool.chart_name}"
-    helm.list_releases.return_value = [old_release_name]
-
-    tool_deployment = ToolDeployment(tool, user)
-    tool_deployment.save()
+    with patch("controlpanel.api.cluster.release_exists", return_value=True) as release_exists:
+        tool_deployment = ToolDeployment(tool, user)
+        tool_deployment.save()
 
     # uninstall tool with old naming scheme
+    release_exists.assert_called_with(old_release_name)
     helm.delete.assert_called_with(True, old_release_name)
 
     # install new release
@@ -84,6 +84,26 @@ def test_tool_deployment_get_installed_app_version(
     cluster_td.get_installed_chart_version.assert_called_with(id_token)
 
 
+def test_tool_deployment_watch_status(helm_repository_index, cluster):
+    tool = Tool(chart_name="rstudio")
+    user = User(username="test-user")
+    td = ToolDeployment(tool, user)
+
+    deployment = MagicMock()
+    deployment.metadata.labels = {"chart": "rstudio-2.2.5"}
+    cluster_td = cluster.ToolDeployment.return_value
+    cluster_td.watch_status.return_value = iter([
+        ("Deploying", deployment),
+        ("Not deployed", None),
+    ])
+
+    assert list(td.watch_status("dummy", timeout=10)) == [
+        ("Deploying", "RStudio: 1.2.1335+conda, R: 3.5.1, Python: 3.7.1, patch: 10"),
+        ("Not deployed", None),
+    ]
+    cluster_td.watch_status.assert_called_with("dummy", timeout=10)
+
+
 @pytest.mark.parametrize(
     "chart_version, expected_app_version",
     [
@@ -43,10 +43,9 @@ def test_helm_delete_user(helm):
 
     helm.list_releases.assert_called_with(f"--namespace=user-{user.slug}")
     expected_calls = [
-        call(helm.list_releases.return_value),
-        call(f"init-user-{user.slug}"),
+        call(True, f"init-user-{user.slug}"),
     ]
-    helm.delete.has_calls(expected_calls)
+    helm.delete.assert_has_calls(expected_calls)
 
 
 def test_aws_create_role_calls_service(aws):
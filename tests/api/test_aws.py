@@ -1,9 +1,11 @@
 import json
 import os
+import threading
 from unittest.mock import MagicMock, patch
 
 import boto3
 from django.conf import settings
+from django.core.cache import cache
 from model_mommy import mommy
 import moto
 import pytest
@@ -16,6 +18,13 @@ def enable_db_for_all_tests(db):
     pass
 
 
+@pytest.yield_fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
 @pytest.fixture(autouse=True)
 def aws_creds():
     os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key-id'
@@ -276,6 +285,30 @@ def test_create_bucket(logs_bucket, s3):
     # assert public_access_blocked(bucket)
 
 
+def test_create_bucket_resumes_failed_steps(s3):
+    bucket_name = f'bucket-{id(MagicMock())}'
+
+    # logs bucket doesn't exist
+    with pytest.raises(aws.BucketProvisioningError) as excinfo:
+        aws.create_bucket(bucket_name)
+
+    error = excinfo.value
+    assert list(error.errors) == ["logging"]
+    assert "logging" not in error.completed
+    assert s3.Bucket(bucket_name).Versioning().status == "Enabled"
+
+    steps = {name: MagicMock() for name in aws.BUCKET_CONFIGURATION_STEPS}
+    with patch.dict(aws.BUCKET_CONFIGURATION_STEPS, steps):
+        completed = aws.create_bucket(bucket_name, completed=error.completed)
+
+    assert completed == sorted(["create", *aws.BUCKET_CONFIGURATION_STEPS])
+    for name, step in steps.items():
+        if name == "logging":
+            step.assert_called_once_with(bucket_name, False)
+        else:
+            step.assert_not_called()
+
+
 def test_tag_bucket(s3):
     bucket_name = f"bucket-{id(MagicMock())}"
     bucket = s3.Bucket(bucket_name)
@@ -311,6 +344,45 @@ def test_delete_parameter(ssm):
         ssm.get_parameter(Name="test")
 
 
+def test_create_parameters(ssm):
+    errors = aws.create_parameters([
+        {"name": f"test-{i}", "value": f"test_val_{i}", "role_name": "role_name"}
+        for i in range(12)
+    ])
+
+    assert errors == {}
+    parameters = aws.get_parameters([f"test-{i}" for i in range(12)] + ["missing"])
+    assert sorted(parameters) == sorted(f"test-{i}" for i in range(12))
+    assert parameters["test-11"]["Value"] == "test_val_11"
+
+
+def test_delete_parameters(ssm):
+    for i in range(12):
+        aws.create_parameter(f"test-{i}", "test_val", "role_name")
+
+    aws.delete_parameters([f"test-{i}" for i in range(11)] + ["missing"])
+
+    assert list(aws.get_parameters([f"test-{i}" for i in range(12)])) == ["test-11"]
+
+
+def test_describe_parameters(ssm):
+    aws.create_parameter("test", "test_val", "role_name")
+
+    metadata = aws.describe_parameters(["test", "missing"])
+    assert metadata["missing"] is None
+    assert metadata["test"]["version"] == 1
+    assert metadata["test"]["last_modified"]
+
+    # cached, including parameters which don't exist
+    with patch.object(aws, 'ssm_client') as ssm_client:
+        assert aws.describe_parameters(["test", "missing"]) == metadata
+        ssm_client.assert_not_called()
+
+    # changes made through the control panel invalidate the cache
+    aws.delete_parameter("test")
+    assert aws.describe_parameters(["test"]) == {"test": None}
+
+
 def get_statements_by_sid(policy_document):
     statements = {}
     for statement in policy_document['Statement']:
@@ -323,8 +395,8 @@ def get_statements_by_sid(policy_document):
 @pytest.mark.parametrize(
     'resources',
     [
-        ([],),
-        (['/foo/bar', '/foo/baz'],),
+        [],
+        ['/foo/bar', '/foo/baz'],
     ],
     ids=[
         'no-paths',
@@ -364,7 +436,7 @@ def test_grant_bucket_access(iam, users, resources):
 @pytest.mark.parametrize(
     'resources',
     [
-        (['/foo/bar', '/foo/baz'],)
+        ['/foo/bar', '/foo/baz'],
     ],
     ids=[
         'paths'
@@ -432,8 +504,8 @@ def test_update_bucket_path_access(iam, users, resources_1, resources_2):
 @pytest.mark.parametrize(
     'resources',
     [
-        ([],),
-        (['/foo/bar', '/foo/baz'],),
+        [],
+        ['/foo/bar', '/foo/baz'],
     ],
     ids=[
         'no-paths',
@@ -523,6 +595,19 @@ def test_update_group_members(iam, group, users, user_roles, live, stored):
     assert_group_members(group, stored)
 
 
+def test_attach_and_detach_group_member(iam, group, user_roles):
+    aws.attach_group_member(group.arn, 'test_user_alice')
+    aws.attach_group_member(group.arn, 'test_user_bob')
+    assert_group_members(group, ['test_user_alice', 'test_user_bob'])
+
+    aws.detach_group_member(group.arn, 'test_user_alice')
+    assert_group_members(group, ['test_user_bob'])
+
+    # not attached
+    aws.detach_group_member(group.arn, 'test_user_alice')
+    assert_group_members(group, ['test_user_bob'])
+
+
 def test_delete_group(iam, group, user_roles):
     role = iam.Role('test_user_alice')
     aws.update_group_members(group.arn, set([role.name]))
@@ -546,8 +631,8 @@ def test_delete_group(iam, group, user_roles):
 @pytest.mark.parametrize(
     'resources',
     [
-        ([],),
-        (['/foo/bar', '/foo/baz'],),
+        [],
+        ['/foo/bar', '/foo/baz'],
     ],
     ids=[
         'no-paths',
@@ -585,7 +670,7 @@ def test_grant_group_bucket_access(iam, group, resources):
 @pytest.mark.parametrize(
     'resources',
     [
-        (['/foo/bar', '/foo/baz'],)
+        ['/foo/bar', '/foo/baz'],
     ],
     ids=[
         'paths'
@@ -642,8 +727,8 @@ def test_update_group_bucket_path_access(iam, group, resources_1, resources_2):
 @pytest.mark.parametrize(
     'resources',
     [
-        ([],),
-        (['/foo/bar', '/foo/baz'],),
+        [],
+        ['/foo/bar', '/foo/baz'],
     ],
     ids=[
         'no-paths',
@@ -663,3 +748,414 @@ def test_revoke_group_bucket_access(iam, group, resources):
     assert 'readonly' not in statements
     assert 'readwrite' not in statements
     assert 'list' not in statements
+
+
+def test_batch_policy_updates(iam, users):
+    user = users['normal_user']
+    aws.create_user_role(user)
+    bucket_arns = [f'arn:aws:s3:::test-bucket-{i}' for i in range(5)]
+
+    load = patch.object(
+        aws.S3AccessPolicy,
+        'load_policy_document',
+        autospec=True,
+        side_effect=aws.S3AccessPolicy.load_policy_document,
+    )
+    save = patch.object(
+        aws.S3AccessPolicy,
+        'save_policy_document',
+        autospec=True,
+        side_effect=aws.S3AccessPolicy.save_policy_document,
+    )
+    with load as load_policy_document, save as save_policy_document:
+        with aws.batch_policy_updates():
+            for bucket_arn in bucket_arns:
+                aws.grant_bucket_access(user.iam_role_name, bucket_arn, 'readwrite')
+            aws.revoke_bucket_access(user.iam_role_name, bucket_arns[0])
+
+            # nothing is applied until the batch exits
+            load_policy_document.assert_not_called()
+
+    load_policy_document.assert_called_once()
+    save_policy_document.assert_called_once()
+
+    policy = iam.RolePolicy(user.iam_role_name, 's3-access')
+    statements = get_statements_by_sid(policy.policy_document)
+    assert set(statements['list']['Resource']) == set(bucket_arns[1:])
+    assert set(statements['readwrite']['Resource']) == {
+        f'{arn}/*' for arn in bucket_arns[1:]
+    }
+
+
+def test_batch_policy_updates_discarded_on_error(iam, users):
+    user = users['normal_user']
+    aws.create_user_role(user)
+
+    with pytest.raises(RuntimeError):
+        with aws.batch_policy_updates():
+            aws.grant_bucket_access(user.iam_role_name, 'arn:aws:s3:::test-bucket', 'readonly')
+            raise RuntimeError()
+
+    with pytest.raises(iam.meta.client.exceptions.NoSuchEntityException):
+        iam.RolePolicy(user.iam_role_name, 's3-access').load()
+
+
+def test_compact_resources():
+    bucket_arn = 'arn:aws:s3:::test-bucket'
+
+    assert aws.compact_resources([
+        f'{bucket_arn}/foo/bar/*',
+        f'{bucket_arn}/foo/*',
+        f'{bucket_arn}/foo/*',
+        f'{bucket_arn}-2/foo/bar/*',
+        f'{bucket_arn}/foobar/*',
+    ]) == [
+        f'{bucket_arn}-2/foo/bar/*',
+        f'{bucket_arn}/foo/*',
+        f'{bucket_arn}/foobar/*',
+    ]
+
+    assert aws.compact_resources(
+        [f'{bucket_arn}/foo/*', f'{bucket_arn}/bar/*', f'{bucket_arn}-2/*'],
+        covering=[f'{bucket_arn}/foo/*', f'{bucket_arn}/bar/baz/*'],
+    ) == [f'{bucket_arn}-2/*', f'{bucket_arn}/bar/*']
+
+
+def test_grant_bucket_access_compacts_paths(iam, users):
+    bucket_arn = 'arn:aws:s3:::test-bucket'
+    user = users['normal_user']
+    aws.create_user_role(user)
+
+    aws.grant_bucket_access(
+        user.iam_role_name,
+        bucket_arn,
+        'readonly',
+        [f'{bucket_arn}/foo/bar', f'{bucket_arn}/foo', f'{bucket_arn}/foo/baz'],
+    )
+
+    policy = iam.RolePolicy(user.iam_role_name, 's3-access')
+    statements = get_statements_by_sid(policy.policy_document)
+    assert statements['readonly']['Resource'] == [f'{bucket_arn}/foo/*']
+
+
+def role_s3_access(iam, role_name):
+    statements = {}
+    documents = [iam.RolePolicy(role_name, 's3-access').policy_document]
+    for policy in iam.Role(role_name).attached_policies.filter(
+        PathPrefix=aws.s3_access_shard_path(),
+    ):
+        documents.append(policy.default_version.document)
+    for document in documents:
+        for sid, statement in get_statements_by_sid(document).items():
+            statements.setdefault(sid, []).extend(statement['Resource'])
+    return documents, statements
+
+
+def test_role_s3_access_sharded(iam, users, monkeypatch):
+    monkeypatch.setattr(aws.S3AccessPolicy, 'MAX_SIZE', 1024)
+    monkeypatch.setattr(aws.ManagedS3AccessPolicy, 'MAX_SIZE', 2048)
+    user = users['normal_user']
+    aws.create_user_role(user)
+    bucket_arns = [f'arn:aws:s3:::test-bucket-{i:02}' for i in range(60)]
+
+    with aws.batch_policy_updates():
+        for bucket_arn in bucket_arns:
+            aws.grant_bucket_access(user.iam_role_name, bucket_arn, 'readwrite')
+
+    documents, statements = role_s3_access(iam, user.iam_role_name)
+    assert len(documents) > 2
+    assert aws.policy_size(documents[0]) <= 1024
+    for document in documents[1:]:
+        assert aws.policy_size(document) <= 2048
+    assert sorted(statements['list']) == bucket_arns
+    assert sorted(statements['readwrite']) == [f'{arn}/*' for arn in bucket_arns]
+
+    # revoking only rewrites the shard holding the bucket
+    shard_bucket = get_statements_by_sid(documents[1])['list']['Resource'][0]
+    with patch.object(aws.S3AccessPolicy, 'save_policy_document') as save_inline, \
+            patch.object(aws.ManagedS3AccessPolicy, 'save_policy_document') as save_managed:
+        aws.revoke_bucket_access(user.iam_role_name, shard_bucket)
+
+    save_inline.assert_not_called()
+    save_managed.assert_called_once()
+
+    # shards are deleted with the role
+    shard_arns = [
+        policy.arn for policy in iam.Role(user.iam_role_name).attached_policies.filter(
+            PathPrefix=aws.s3_access_shard_path(),
+        )
+    ]
+    aws.delete_role(user.iam_role_name)
+    for arn in shard_arns:
+        with pytest.raises(iam.meta.client.exceptions.NoSuchEntityException):
+            iam.Policy(arn).load()
+
+
+def test_role_s3_access_overflow_keeps_similar_buckets(iam, users, monkeypatch):
+    user = users['normal_user']
+    aws.create_user_role(user)
+    aws.grant_bucket_access(user.iam_role_name, 'arn:aws:s3:::foo-bar', 'readwrite')
+    documents, _ = role_s3_access(iam, user.iam_role_name)
+    # the inline policy is full
+    monkeypatch.setattr(aws.S3AccessPolicy, 'MAX_SIZE', aws.policy_size(documents[0]))
+
+    aws.grant_bucket_access(user.iam_role_name, 'arn:aws:s3:::foo', 'readwrite')
+
+    documents, statements = role_s3_access(iam, user.iam_role_name)
+    assert len(documents) == 2
+    assert get_statements_by_sid(documents[0])['list']['Resource'] == ['arn:aws:s3:::foo-bar']
+    assert sorted(statements['list']) == ['arn:aws:s3:::foo', 'arn:aws:s3:::foo-bar']
+    assert sorted(statements['readwrite']) == [
+        'arn:aws:s3:::foo-bar/*',
+        'arn:aws:s3:::foo/*',
+    ]
+
+
+def test_role_s3_access_empty_shard_deleted(iam, users, monkeypatch):
+    user = users['normal_user']
+    aws.create_user_role(user)
+    aws.grant_bucket_access(user.iam_role_name, 'arn:aws:s3:::test-bucket-1', 'readwrite')
+    documents, _ = role_s3_access(iam, user.iam_role_name)
+    monkeypatch.setattr(aws.S3AccessPolicy, 'MAX_SIZE', aws.policy_size(documents[0]))
+    aws.grant_bucket_access(user.iam_role_name, 'arn:aws:s3:::test-bucket-2', 'readwrite')
+    shards = list(iam.Role(user.iam_role_name).attached_policies.filter(
+        PathPrefix=aws.s3_access_shard_path(),
+    ))
+    assert len(shards) == 1
+
+    aws.revoke_bucket_access(user.iam_role_name, 'arn:aws:s3:::test-bucket-2')
+
+    assert list(iam.Role(user.iam_role_name).attached_policies.filter(
+        PathPrefix=aws.s3_access_shard_path(),
+    )) == []
+    with pytest.raises(iam.meta.client.exceptions.NoSuchEntityException):
+        shards[0].load()
+
+    # a shard is created again when needed
+    aws.grant_bucket_access(user.iam_role_name, 'arn:aws:s3:::test-bucket-3', 'readwrite')
+    documents, statements = role_s3_access(iam, user.iam_role_name)
+    assert len(documents) == 2
+    assert sorted(statements['list']) == [
+        'arn:aws:s3:::test-bucket-1',
+        'arn:aws:s3:::test-bucket-3',
+    ]
+
+
+def test_role_s3_access_attached_policies_quota(iam, users, monkeypatch):
+    user = users['normal_user']
+    aws.create_user_role(user)
+    aws.grant_bucket_access(user.iam_role_name, 'arn:aws:s3:::test-bucket-1', 'readwrite')
+    documents, _ = role_s3_access(iam, user.iam_role_name)
+    monkeypatch.setattr(aws.S3AccessPolicy, 'MAX_SIZE', aws.policy_size(documents[0]))
+    attached = len(list(iam.Role(user.iam_role_name).attached_policies.all()))
+    monkeypatch.setattr(aws.RoleS3AccessPolicy, 'MAX_ATTACHED_POLICIES', attached)
+
+    with pytest.raises(aws.S3AccessQuotaError):
+        aws.grant_bucket_access(user.iam_role_name, 'arn:aws:s3:::test-bucket-2', 'readwrite')
+
+    assert len(list(iam.Role(user.iam_role_name).attached_policies.all())) == attached
+
+
+def test_read_s3_access(iam, users, monkeypatch):
+    monkeypatch.setattr(aws.S3AccessPolicy, 'MAX_SIZE', 512)
+    user = users['normal_user']
+    aws.create_user_role(user)
+    bucket_arns = [f'arn:aws:s3:::test-bucket-{i:02}' for i in range(10)]
+    with aws.batch_policy_updates():
+        for bucket_arn in bucket_arns:
+            aws.grant_bucket_access(user.iam_role_name, bucket_arn, 'readonly')
+
+    # changes made outside the control panel are read too
+    policy = iam.RolePolicy(user.iam_role_name, 's3-access')
+    policy_document = policy.policy_document
+    get_statements_by_sid(policy_document)['readonly']['Resource'].append(
+        'arn:aws:s3:::other-bucket/*',
+    )
+    policy.put(PolicyDocument=json.dumps(policy_document))
+
+    assert aws.read_s3_access('role', user.iam_role_name) == {
+        'list': bucket_arns,
+        'readonly': ['arn:aws:s3:::other-bucket/*'] + [f'{arn}/*' for arn in bucket_arns],
+    }
+
+
+def test_policy_document_cache_write_through(iam, users):
+    user = users['normal_user']
+    aws.create_user_role(user)
+    bucket_arn = 'arn:aws:s3:::test-bucket'
+    aws.grant_bucket_access(user.iam_role_name, bucket_arn, 'readonly')
+
+    with patch.object(
+        aws.S3AccessPolicy,
+        'fetch_policy_document',
+        autospec=True,
+        side_effect=aws.S3AccessPolicy.fetch_policy_document,
+    ) as fetch:
+        # unchanged access isn't read or written
+        aws.grant_bucket_access(user.iam_role_name, bucket_arn, 'readonly')
+        fetch.assert_not_called()
+
+        # the cached copy is only checked before being written
+        aws.grant_bucket_access(user.iam_role_name, f'{bucket_arn}-2', 'readonly')
+        fetch.assert_called_once()
+
+    policy = iam.RolePolicy(user.iam_role_name, 's3-access')
+    statements = get_statements_by_sid(policy.policy_document)
+    assert set(statements['list']['Resource']) == {bucket_arn, f'{bucket_arn}-2'}
+
+
+def test_policy_document_cache_expires(iam, users, settings):
+    settings.IAM_POLICY_CACHE_TTL = 0
+    user = users['normal_user']
+    aws.create_user_role(user)
+    bucket_arn = 'arn:aws:s3:::test-bucket'
+    aws.grant_bucket_access(user.iam_role_name, bucket_arn, 'readonly')
+
+    # changed outside the control panel
+    iam.RolePolicy(user.iam_role_name, 's3-access').put(
+        PolicyDocument=json.dumps(aws.BASE_S3_ACCESS_POLICY),
+    )
+
+    aws.grant_bucket_access(user.iam_role_name, f'{bucket_arn}-2', 'readonly')
+
+    policy = iam.RolePolicy(user.iam_role_name, 's3-access')
+    statements = get_statements_by_sid(policy.policy_document)
+    assert statements['list']['Resource'] == [f'{bucket_arn}-2']
+
+
+def test_policy_document_cache_keeps_changes_made_outside(iam, users):
+    user = users['normal_user']
+    aws.create_user_role(user)
+    bucket_arn = 'arn:aws:s3:::test-bucket'
+    aws.grant_bucket_access(user.iam_role_name, bucket_arn, 'readonly')
+    aws.grant_bucket_access(user.iam_role_name, f'{bucket_arn}-2', 'readonly')
+
+    # changed outside the control panel, while the cached copy is trusted
+    policy = iam.RolePolicy(user.iam_role_name, 's3-access')
+    policy_document = policy.policy_document
+    statements = get_statements_by_sid(policy_document)
+    statements['list']['Resource'].append('arn:aws:s3:::other-bucket')
+    statements['readonly']['Resource'].append('arn:aws:s3:::other-bucket/*')
+    policy.put(PolicyDocument=json.dumps(policy_document))
+
+    aws.grant_bucket_access(user.iam_role_name, f'{bucket_arn}-3', 'readwrite')
+    aws.revoke_bucket_access(user.iam_role_name, bucket_arn)
+
+    policy.reload()
+    statements = get_statements_by_sid(policy.policy_document)
+    assert sorted(statements['list']['Resource']) == [
+        'arn:aws:s3:::other-bucket',
+        f'{bucket_arn}-2',
+        f'{bucket_arn}-3',
+    ]
+    assert sorted(statements['readonly']['Resource']) == [
+        'arn:aws:s3:::other-bucket/*',
+        f'{bucket_arn}-2/*',
+    ]
+    assert statements['readwrite']['Resource'] == [f'{bucket_arn}-3/*']
+
+
+def test_managed_policy_document_cache_detects_new_version(iam, group):
+    bucket_arn = 'arn:aws:s3:::test-bucket'
+    aws.grant_group_bucket_access(group.arn, bucket_arn, 'readonly')
+
+    # changed outside the control panel
+    group.create_version(
+        PolicyDocument=json.dumps(aws.BASE_S3_ACCESS_POLICY),
+        SetAsDefault=True,
+    )
+
+    aws.grant_group_bucket_access(group.arn, f'{bucket_arn}-2', 'readonly')
+
+    group.reload()
+    statements = get_statements_by_sid(group.default_version.document)
+    assert statements['list']['Resource'] == [f'{bucket_arn}-2']
+
+
+def test_managed_policy_versions_ring(iam, group):
+    bucket_arn = 'arn:aws:s3:::test-bucket'
+    patched = patch.object(
+        aws.ManagedS3AccessPolicy,
+        'list_versions',
+        autospec=True,
+        side_effect=aws.ManagedS3AccessPolicy.list_versions,
+    )
+    with patched as list_versions:
+        for i in range(8):
+            aws.grant_group_bucket_access(group.arn, f'{bucket_arn}-{i}', 'readonly')
+
+        # versions are only listed by the first save
+        assert list_versions.call_count == 1
+
+    group.reload()
+    versions = sorted(version.version_id for version in group.versions.all())
+    assert versions == ['v5', 'v6', 'v7', 'v8', 'v9']
+    assert group.default_version_id == 'v9'
+
+
+def test_managed_policy_untracked_versions(iam, group):
+    bucket_arn = 'arn:aws:s3:::test-bucket'
+    aws.grant_group_bucket_access(group.arn, bucket_arn, 'readonly')
+
+    # versions created outside the control panel, without changing the default
+    for _ in range(3):
+        group.create_version(PolicyDocument=json.dumps(aws.BASE_S3_ACCESS_POLICY))
+
+    aws.grant_group_bucket_access(group.arn, f'{bucket_arn}-2', 'readonly')
+
+    group.reload()
+    assert len(list(group.versions.all())) == 5
+    statements = get_statements_by_sid(group.default_version.document)
+    assert statements['list']['Resource'] == [bucket_arn, f'{bucket_arn}-2']
+
+
+def test_managed_policy_default_not_latest(iam, group):
+    bucket_arn = 'arn:aws:s3:::test-bucket'
+    # versions created outside the control panel, the oldest is the default
+    for _ in range(aws.ManagedS3AccessPolicy.MAX_VERSIONS - 1):
+        group.create_version(PolicyDocument=json.dumps(aws.BASE_S3_ACCESS_POLICY))
+    group.reload()
+    default_version_id = group.default_version_id
+    versions = sorted(version.version_id for version in group.versions.all())
+    assert versions[0] == default_version_id
+
+    aws.grant_group_bucket_access(group.arn, bucket_arn, 'readonly')
+
+    group.reload()
+    remaining = sorted(version.version_id for version in group.versions.all())
+    # the oldest version which isn't the default was deleted to make room
+    assert default_version_id in remaining
+    assert versions[1] not in remaining
+    statements = get_statements_by_sid(group.default_version.document)
+    assert statements['list']['Resource'] == [bucket_arn]
+
+
+def test_registry_shares_clients_between_threads(settings):
+    settings.AWS_MAX_POOL_CONNECTIONS = 7
+    registry = aws.BotoRegistry()
+    clients = []
+
+    thread = threading.Thread(target=lambda: clients.append(registry.client('ssm', region_name='eu-west-1')))
+    thread.start()
+    thread.join()
+
+    client = registry.client('ssm', region_name='eu-west-1')
+    assert clients == [client]
+    assert client.meta.config.max_pool_connections == 7
+    assert client.meta.config.retries['mode'] == settings.AWS_RETRY_MODE
+
+
+def test_registry_keeps_resources_per_thread():
+    registry = aws.BotoRegistry()
+    resources = []
+
+    thread = threading.Thread(target=lambda: resources.append(registry.resource('iam')))
+    thread.start()
+    thread.join()
+
+    iam = registry.resource('iam')
+    assert iam is registry.resource('iam')
+    assert resources[0] is not iam
+
+    registry.reset()
+    assert registry.resource('iam') is not iam
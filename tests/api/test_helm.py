@@ -1,11 +1,27 @@
+import asyncio
 from datetime import datetime, timedelta
+import io
+import os
+import signal
+import subprocess
+import threading
+import time
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, call, patch
 
 from controlpanel.api.helm import (
     Chart,
+    command_namespace,
+    command_owner,
     helm,
+    Helm,
+    HelmBusyError,
+    HelmError,
+    HelmPool,
     HelmRepository,
+    parse_upgrade_output,
+    pool,
+    release_on_exit,
 )
 
 
@@ -40,30 +56,90 @@ def test_helm_repository_update_when_cache_old(helm_repository_index):
         helm.execute.assert_called_once()
 
 
+def test_helm_repository_update_when_updated_by_another_process(helm_repository_index):
+    an_hour_ago = datetime.utcnow() - timedelta(hours=1)
+    now = datetime.utcnow()
+
+    with patch("controlpanel.api.helm.Helm") as helm, patch.object(
+        HelmRepository, "_downloaded_at", side_effect=[an_hour_ago, now, now],
+    ):
+        HelmRepository.update()
+        helm.execute.assert_not_called()
+
+    assert "rstudio" in HelmRepository._charts
+
+
+def test_helm_repository_updated_in_background_when_outdated(
+    helm_repository_index, helm_repository_update,
+):
+    yesterday = (datetime.now() - timedelta(days=1)).timestamp()
+    os.utime(helm_repository_index, (yesterday, yesterday))
+
+    with patch("controlpanel.api.helm.Helm") as helm:
+        assert "2.2.5" in HelmRepository.get_chart_info("rstudio")
+        helm.execute.assert_not_called()
+
+    helm_repository_update.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "chart, version, updated",
+    [
+        ("mojanalytics/rstudio", "2.2.5", False),
+        ("mojanalytics/rstudio", None, False),
+        ("mojanalytics/rstudio", "9.9.9", True),
+        ("other-repo/rstudio", "9.9.9", False),
+    ],
+    ids=["known-version", "latest-version", "unknown-version", "other-repo"],
+)
+def test_helm_repository_ensure_chart(helm_repository_index, chart, version, updated):
+    with patch.object(HelmRepository, "update") as update:
+        HelmRepository.ensure_chart(chart, version)
+        assert update.called == updated
+
+
 def test_helm_repository_chart_info_when_chart_not_found(helm_repository_index):
-    with patch("controlpanel.api.helm.open", helm_repository_index):
-        info = HelmRepository.get_chart_info("notfound")
-        assert info == {}
+    info = HelmRepository.get_chart_info("notfound")
+    assert info == {}
 
 
 def test_helm_repository_chart_info_when_chart_found(helm_repository_index):
-    with patch("controlpanel.api.helm.open", helm_repository_index):
-        # See tests/api/fixtures/helm_mojanalytics_index.py
-        rstudio_info = HelmRepository.get_chart_info("rstudio")
+    # See tests/api/fixtures/helm_mojanalytics_index.py
+    rstudio_info = HelmRepository.get_chart_info("rstudio")
+
+    rstudio_2_2_5_app_version = (
+        "RStudio: 1.2.1335+conda, R: 3.5.1, Python: 3.7.1, patch: 10"
+    )
 
-        rstudio_2_2_5_app_version = (
-            "RStudio: 1.2.1335+conda, R: 3.5.1, Python: 3.7.1, patch: 10"
-        )
+    assert len(rstudio_info) == 2
+    assert "2.2.5" in rstudio_info
+    assert "1.0.0" in rstudio_info
 
-        assert len(rstudio_info) == 2
-        assert "2.2.5" in rstudio_info
-        assert "1.0.0" in rstudio_info
+    assert rstudio_info["2.2.5"].app_version == rstudio_2_2_5_app_version
+    # Helm added `appVersion` field in metadata only
+    # "recently" so for testing that for old chart
+    # version this returns `None`
+    assert rstudio_info["1.0.0"].app_version == None
 
-        assert rstudio_info["2.2.5"].app_version == rstudio_2_2_5_app_version
-        # Helm added `appVersion` field in metadata only
-        # "recently" so for testing that for old chart
-        # version this returns `None`
-        assert rstudio_info["1.0.0"].app_version == None
+
+def test_helm_repository_compact_index_shared(helm_repository_index):
+    HelmRepository.get_chart_info("rstudio")
+    assert os.path.exists(HelmRepository.INDEX_PATH)
+
+    # another process loads the compact index without parsing the YAML
+    HelmRepository._updated_at = None
+    HelmRepository._charts = {}
+    with patch("controlpanel.api.helm.yaml") as yaml:
+        assert "2.2.5" in HelmRepository.get_chart_info("rstudio")
+        yaml.load.assert_not_called()
+
+    # rebuilt once the index is updated
+    an_hour_ago = (datetime.now() - timedelta(hours=1)).timestamp()
+    os.utime(helm_repository_index, (an_hour_ago, an_hour_ago))
+    with patch("controlpanel.api.helm.yaml") as yaml:
+        yaml.load.return_value = {"entries": {}}
+        assert HelmRepository.get_chart_info("rstudio") == {}
+        yaml.load.assert_called_once()
 
 
 @pytest.mark.parametrize(
@@ -89,9 +165,8 @@ def test_helm_repository_get_chart_app_version(
     helm_repository_index, chart_name, version, expected_app_version
 ):
     # See tests/api/fixtures/helm_mojanalytics_index.py
-    with patch("controlpanel.api.helm.open", helm_repository_index):
-        app_version = HelmRepository.get_chart_app_version(chart_name, version)
-        assert app_version == expected_app_version
+    app_version = HelmRepository.get_chart_app_version(chart_name, version)
+    assert app_version == expected_app_version
 
 
 def test_helm_upgrade_release():
@@ -108,3 +183,295 @@ def test_helm_upgrade_release():
     helm.__class__.execute.assert_called_with(
         "upgrade", "--install", "--wait", "--force", *upgrade_args,
     )
+
+
+def helm_process(stdout="", stderr="", returncode=0):
+    proc = MagicMock()
+    proc.stdout = io.StringIO(stdout)
+    proc.stderr = io.StringIO(stderr)
+    proc.returncode = returncode
+    return proc
+
+
+def test_helm_list_releases_paginated():
+    pages = [
+        helm_process("a\nb\nc\n"),
+        helm_process("c\nd\ne\n"),
+        helm_process("e\n"),
+    ]
+    with patch.object(Helm, "execute", side_effect=pages) as execute:
+        releases = helm.list_releases("--namespace=user-alice", page_size=3)
+        assert next(releases) == "a"
+        execute.assert_called_once()
+
+        assert list(releases) == ["b", "c", "d", "e"]
+        assert execute.call_args_list == [
+            call("list", "-q", "--max=3", "--namespace=user-alice"),
+            call("list", "-q", "--max=3", "--offset=c", "--namespace=user-alice"),
+            call("list", "-q", "--max=3", "--offset=e", "--namespace=user-alice"),
+        ]
+
+
+def test_helm_list_releases_error():
+    with patch.object(Helm, "execute", return_value=helm_process(stderr="Error", returncode=1)):
+        with pytest.raises(HelmError):
+            list(helm.list_releases())
+
+
+UPGRADE_OUTPUT = """Release "rstudio-alice" has been upgraded. Happy Helming!
+LAST DEPLOYED: Mon Jun 01 10:00:00 2020
+NAMESPACE: user-alice
+STATUS: DEPLOYED
+
+RESOURCES:
+==> v1/Pod(related)
+NAME                 READY  STATUS   RESTARTS  AGE
+rstudio-alice-abcde  2/2    Running  0         10s
+
+==> v1/Service
+NAME           TYPE       CLUSTER-IP  EXTERNAL-IP  PORT(S)  AGE
+rstudio-alice  ClusterIP  10.0.0.1    <none>       80/TCP   1d
+
+NOTES:
+RStudio is ready
+"""
+
+
+def test_parse_upgrade_output():
+    output = parse_upgrade_output(UPGRADE_OUTPUT)
+
+    assert output["last_deployed"] == datetime(2020, 6, 1, 10, 0, 0)
+    assert output["namespace"] == "user-alice"
+    assert output["resources"]["v1/Pod(related)"] == [{
+        "name": "rstudio-alice-abcde",
+        "ready": "2/2",
+        "status": "Running",
+        "restarts": "0",
+        "age": "10s",
+    }]
+    assert output["resources"]["v1/Service"][0]["cluster-ip"] == "10.0.0.1"
+    assert output["notes"].startswith("RStudio is ready")
+
+
+@pytest.yield_fixture
+def helm_script():
+    """
+    Runs the given shell script instead of helm in `Helm.execute_async()`
+    """
+    create_subprocess_exec = asyncio.create_subprocess_exec
+    commands = []
+
+    def run(script):
+        def create(*args, **kwargs):
+            commands.append(args)
+            return create_subprocess_exec("sh", "-c", script, **kwargs)
+
+        return patch.object(asyncio, "create_subprocess_exec", new=create)
+
+    run.commands = commands
+    yield run
+
+
+def test_helm_execute_async_streams_output(helm_script):
+    lines = []
+
+    async def on_line(line):
+        lines.append((line, time.monotonic()))
+
+    with helm_script("echo one; sleep 0.5; echo two"):
+        output = asyncio.run(Helm.execute_async("list", on_line=on_line))
+
+    assert output == "one\ntwo\n"
+    assert [line for line, _ in lines] == ["one\n", "two\n"]
+    # the first line was read before helm finished
+    assert lines[1][1] - lines[0][1] > 0.3
+    assert pool.stats()["running"] == 0
+
+
+def test_helm_execute_async_large_output(helm_script):
+    script = "i=0; while [ $i -lt 2000 ]; do printf '%0100d\\n' $i; i=$((i+1)); done"
+    with helm_script(script):
+        output = asyncio.run(Helm.execute_async("list", timeout=10))
+
+    assert len(output.split()) == 2000
+
+
+def test_helm_execute_async_timeout(helm_script):
+    with helm_script("echo started; sleep 10"):
+        with pytest.raises(HelmError):
+            asyncio.run(Helm.execute_async("list", timeout=0.2))
+
+    assert pool.stats()["running"] == 0
+
+
+def test_helm_execute_async_cancelled_while_queued(helm_script):
+    small_pool = HelmPool(max_processes=1, max_per_namespace=1, max_queued=10, timeout=5)
+    ticket = small_pool.acquire()
+
+    async def cancel_while_queued():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(Helm.execute_async("list"), 0.2)
+        # the slot is acquired after the command was cancelled
+        small_pool.release(ticket)
+
+    with helm_script("echo listed"), patch("controlpanel.api.helm.pool", small_pool):
+        asyncio.run(cancel_while_queued())
+
+    assert helm_script.commands == []
+    wait_until(lambda: small_pool.stats()["running"] == 0)
+
+
+def test_helm_execute_async_error(helm_script):
+    with helm_script("echo 'Error: release not found' >&2; exit 1"):
+        with pytest.raises(HelmError, match="release not found"):
+            asyncio.run(Helm.execute_async("status", "rstudio-alice"))
+
+
+def test_helm_upgrade_release_async(helm_script):
+    sections = []
+
+    def on_section(section, output):
+        sections.append((section, output["namespace"]))
+
+    script = f"cat <<'EOF'\n{UPGRADE_OUTPUT}EOF"
+    with helm_script(script), patch.object(HelmRepository, "ensure_chart") as ensure_chart:
+        output = asyncio.run(helm.upgrade_release_async(
+            "rstudio-alice",
+            "mojanalytics/rstudio",
+            "--version",
+            "2.2.5",
+            "--namespace",
+            "user-alice",
+            on_section=on_section,
+        ))
+
+    ensure_chart.assert_called_with("mojanalytics/rstudio", "2.2.5")
+    assert helm_script.commands[-1][:6] == (
+        "helm", "upgrade", "--install", "--force", "rstudio-alice", "mojanalytics/rstudio",
+    )
+    assert sections == [
+        ("LAST DEPLOYED", ""),
+        ("NAMESPACE", "user-alice"),
+        ("RESOURCES", "user-alice"),
+        ("NOTES", "user-alice"),
+    ]
+    assert output["resources"] == parse_upgrade_output(UPGRADE_OUTPUT)["resources"]
+    assert output["notes"] == "RStudio is ready"
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def acquire_in_thread(pool, namespace, owner, admitted):
+    def run():
+        ticket = pool.acquire(namespace, owner)
+        admitted.append(owner)
+        pool.release(ticket)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_helm_pool_limits():
+    pool = HelmPool(max_processes=2, max_per_namespace=1, max_queued=10, timeout=5)
+    admitted = []
+
+    first = pool.acquire("user-alice", "user-alice")
+    # same namespace as a running command
+    queued = acquire_in_thread(pool, "user-alice", "user-alice", admitted)
+    wait_until(lambda: pool.stats()["queued"] == 1)
+
+    second = pool.acquire("user-bob", "user-bob")
+    assert pool.stats()["running"] == 2
+
+    pool.release(second)
+    # the global limit isn't reached, but the namespace limit still is
+    assert pool.stats()["queued"] == 1
+
+    pool.release(first)
+    queued.join(5)
+    assert admitted == ["user-alice"]
+
+    stats = pool.stats()
+    assert stats["running"] == 0
+    assert stats["queued"] == 0
+    assert stats["namespaces"] == {}
+    assert stats["owners"] == 0
+    assert stats["recent_max_wait_seconds"] > 0
+
+
+def test_helm_pool_fairness():
+    pool = HelmPool(max_processes=1, max_per_namespace=1, max_queued=10, timeout=5)
+    admitted = []
+
+    ticket = pool.acquire("user-alice", "user-alice")
+    threads = []
+    for owner in ["user-alice", "user-alice", "user-bob"]:
+        threads.append(acquire_in_thread(pool, owner, owner, admitted))
+        wait_until(lambda: pool.stats()["queued"] == len(threads))
+
+    pool.release(ticket)
+    for thread in threads:
+        thread.join(5)
+
+    assert admitted == ["user-bob", "user-alice", "user-alice"]
+
+
+def test_helm_pool_queue_full():
+    pool = HelmPool(max_processes=1, max_per_namespace=1, max_queued=1, timeout=5)
+    admitted = []
+
+    ticket = pool.acquire(None, "init-user-alice")
+    thread = acquire_in_thread(pool, None, "init-user-bob", admitted)
+    wait_until(lambda: pool.stats()["queued"] == 1)
+
+    with pytest.raises(HelmBusyError):
+        pool.acquire(None, "init-user-carol")
+
+    pool.release(ticket)
+    thread.join(5)
+    assert admitted == ["init-user-bob"]
+
+
+def test_helm_pool_queue_timeout():
+    pool = HelmPool(max_processes=1, max_per_namespace=1, max_queued=10, timeout=0.1)
+
+    ticket = pool.acquire(None, "init-user-alice")
+    with pytest.raises(HelmBusyError):
+        pool.acquire(None, "init-user-bob")
+
+    assert pool.stats()["queued"] == 0
+    assert pool.stats()["owners"] == 1
+    pool.release(ticket)
+    assert pool.stats()["owners"] == 0
+
+
+def test_helm_release_on_exit_kills_stuck_process(settings):
+    settings.HELM_PROCESS_TIMEOUT = 0.1
+    proc = subprocess.Popen(["sleep", "10"])
+
+    with patch("controlpanel.api.helm.pool") as helm_pool:
+        release_on_exit(proc, "ticket")
+        wait_until(lambda: helm_pool.release.called)
+
+    helm_pool.release.assert_called_once_with("ticket")
+    assert proc.returncode == -signal.SIGKILL
+
+
+@pytest.mark.parametrize(
+    "args, namespace, owner",
+    [
+        (("upgrade", "--install", "init-user-alice", "mojanalytics/init-user"), None, "init-user-alice"),
+        (("upgrade", "--install", "rstudio", "--namespace=user-alice"), "user-alice", "user-alice"),
+        (("upgrade", "rstudio", "--namespace", "user-alice"), "user-alice", "user-alice"),
+        (("repo", "update"), None, "update"),
+    ],
+)
+def test_helm_command_owner(args, namespace, owner):
+    assert command_namespace(args) == namespace
+    assert command_owner(args, namespace) == owner
@@ -0,0 +1,143 @@
+from io import StringIO
+from unittest.mock import call
+
+from django.core.management import call_command
+from model_mommy import mommy
+import pytest
+
+from controlpanel.api import iam_reconcile
+from controlpanel.api.models import UserS3Bucket
+
+
+@pytest.fixture
+def bucket(db):
+    return mommy.make("api.S3Bucket", name="test-bucket")
+
+
+@pytest.fixture
+def access(users, bucket):
+    return mommy.make(
+        "api.UserS3Bucket",
+        user=users["normal_user"],
+        s3bucket=bucket,
+        access_level=UserS3Bucket.READWRITE,
+        paths=["/foo", "/foo/bar"],
+    )
+
+
+@pytest.fixture
+def actual_access(aws, users, access):
+    """
+    IAM grants the access of `access`, and nothing to the other roles
+    """
+    aws.reset_mock()
+    role_name = users["normal_user"].iam_role_name
+
+    def read_s3_access(kind, name):
+        if name == role_name:
+            return {
+                "list": ["arn:aws:s3:::test-bucket"],
+                "readwrite": ["arn:aws:s3:::test-bucket/foo/*"],
+            }
+        return {}
+
+    aws.read_s3_access.side_effect = read_s3_access
+    return aws.read_s3_access
+
+
+def results_by_name(results):
+    return {result["principal"][1]: result for result in results}
+
+
+def test_in_sync(aws, users, access, actual_access):
+    results = results_by_name(iam_reconcile.reconcile())
+
+    assert set(results) == {user.iam_role_name for user in users.values()}
+    for result in results.values():
+        assert result["status"] == iam_reconcile.IN_SYNC
+        assert result["elapsed"] >= 0
+    aws.grant_bucket_access.assert_not_called()
+
+
+def test_drifted(aws, users, access, actual_access):
+    role_name = users["other_user"].iam_role_name
+    actual_access.side_effect = None
+    actual_access.return_value = {
+        "list": ["arn:aws:s3:::test-bucket", "arn:aws:s3:::other-bucket"],
+        "readonly": ["arn:aws:s3:::test-bucket/foo/*", "arn:aws:s3:::other-bucket/*"],
+    }
+
+    results = results_by_name(iam_reconcile.reconcile())
+
+    result = results[users["normal_user"].iam_role_name]
+    assert result["status"] == iam_reconcile.DRIFTED
+    assert result["missing"] == [("readwrite", "arn:aws:s3:::test-bucket/foo/*")]
+    assert result["unexpected"] == [
+        ("list", "arn:aws:s3:::other-bucket"),
+        ("readonly", "arn:aws:s3:::other-bucket/*"),
+        ("readonly", "arn:aws:s3:::test-bucket/foo/*"),
+    ]
+    assert results[role_name]["status"] == iam_reconcile.DRIFTED
+    aws.grant_bucket_access.assert_not_called()
+    aws.revoke_bucket_access.assert_not_called()
+
+
+def test_fix(aws, users, access, actual_access):
+    role_name = users["normal_user"].iam_role_name
+    actual_access.side_effect = None
+    actual_access.return_value = {
+        "list": ["arn:aws:s3:::other-bucket"],
+        "readonly": ["arn:aws:s3:::other-bucket/*"],
+    }
+
+    results = results_by_name(iam_reconcile.reconcile(fix=True))
+
+    assert results[role_name]["status"] == iam_reconcile.FIXED
+    aws.grant_bucket_access.assert_called_once_with(
+        role_name,
+        "arn:aws:s3:::test-bucket",
+        "readwrite",
+        ["arn:aws:s3:::test-bucket/foo", "arn:aws:s3:::test-bucket/foo/bar"],
+    )
+    aws.revoke_bucket_access.assert_has_calls(
+        [call(user.iam_role_name, "arn:aws:s3:::other-bucket") for user in users.values()],
+        any_order=True,
+    )
+
+
+@pytest.mark.parametrize("fix", [False, True])
+def test_group_members(aws, users, actual_access, fix):
+    group = mommy.make("api.IAMManagedPolicy", name="test-group")
+    group.users.add(users["normal_user"], users["other_user"])
+
+    results = results_by_name(iam_reconcile.reconcile(fix=fix))
+
+    assert results[group.arn]["status"] == iam_reconcile.IN_SYNC
+    if fix:
+        aws.update_group_members.assert_called_once_with(
+            group.arn,
+            {users["normal_user"].iam_role_name, users["other_user"].iam_role_name},
+        )
+    else:
+        aws.update_group_members.assert_not_called()
+
+
+def test_failed(aws, users, access, actual_access):
+    actual_access.side_effect = Exception("Boom")
+
+    results = results_by_name(iam_reconcile.reconcile(fix=True))
+
+    for result in results.values():
+        assert result["status"] == iam_reconcile.FAILED
+        assert result["error"] == "Boom"
+    aws.grant_bucket_access.assert_not_called()
+
+
+def test_reconcile_iam_command(users, access, actual_access):
+    stdout = StringIO()
+
+    call_command("reconcile_iam", stdout=stdout)
+
+    output = stdout.getvalue()
+    assert f"role {users['normal_user'].iam_role_name}: in sync" in output
+    assert "Reconciled 3 roles and groups" in output
@@ -0,0 +1,131 @@
+from unittest.mock import Mock, patch
+
+from kubernetes.client.rest import ApiException
+import pytest
+
+from controlpanel.api import cluster
+from controlpanel.api.informer import DeploymentInformer
+
+
+def deployment(namespace, name, app, resource_version="1"):
+    deployment = Mock()
+    deployment.metadata.namespace = namespace
+    deployment.metadata.name = name
+    deployment.metadata.labels = {"app": app, "chart": f"{app}-1.0.0"}
+    deployment.metadata.resource_version = resource_version
+    return deployment
+
+
+@pytest.fixture
+def k8s():
+    return Mock()
+
+
+@pytest.fixture
+def stream():
+    with patch("controlpanel.api.informer.watch") as watch:
+        yield watch.Watch.return_value.stream
+
+
+@pytest.fixture
+def informer(k8s):
+    informer = DeploymentInformer()
+    # synced by the tests, without the informer thread
+    informer.start = Mock()
+    informer._started_at = 0
+    return informer
+
+
+def test_list(informer, k8s):
+    rstudio = deployment("user-alice", "rstudio-alice", "rstudio")
+    jupyter = deployment("user-alice", "jupyter-lab-alice", "jupyter-lab")
+    k8s.AppsV1Api.list_deployment_for_all_namespaces.side_effect = [
+        Mock(items=[rstudio], metadata=Mock(_continue="page-2")),
+        Mock(
+            items=[jupyter, deployment("kube-system", "tiller", "helm")],
+            metadata=Mock(_continue=None, resource_version="42"),
+        ),
+    ]
+
+    assert informer._list(k8s) == "42"
+
+    assert informer.list("user-alice", app="rstudio") == [rstudio]
+    assert {d.metadata.name for d in informer.list("user-alice")} == {
+        "rstudio-alice",
+        "jupyter-lab-alice",
+    }
+    assert informer.list("user-bob") == []
+    assert informer.list("kube-system") == []
+    _, kwargs = k8s.AppsV1Api.list_deployment_for_all_namespaces.call_args
+    assert kwargs["_continue"] == "page-2"
+
+
+def test_list_out_of_sync(informer):
+    assert informer.list("user-alice") is None
+
+
+def test_watch(informer, k8s, stream):
+    rstudio = deployment("user-alice", "rstudio-alice", "rstudio")
+    k8s.AppsV1Api.list_deployment_for_all_namespaces.return_value = Mock(
+        items=[rstudio],
+        metadata=Mock(_continue=None, resource_version="42"),
+    )
+    informer._list(k8s)
+
+    updated = deployment("user-alice", "rstudio-alice", "rstudio", resource_version="43")
+    added = deployment("user-bob", "rstudio-bob", "rstudio", resource_version="44")
+    stream.side_effect = [
+        iter([
+            {"type": "MODIFIED", "object": updated},
+            {"type": "ADDED", "object": added},
+            {"type": "DELETED", "object": deployment("user-alice", "rstudio-alice", "rstudio")},
+        ]),
+        ApiException(status=410),
+    ]
+
+    informer._watch(k8s, "42")
+
+    assert informer.list("user-alice") == []
+    assert informer.list("user-bob", app="rstudio") == [added]
+    # the second watch resumed from the last event
+    assert stream.call_args_list[0][1]["resource_version"] == "42"
+    assert stream.call_args_list[1][1]["resource_version"] == "1"
+
+
+@pytest.mark.parametrize("code,delayed", [(410, False), (500, True)])
+def test_watch_error_event(informer, k8s, stream, code, delayed):
+    stream.return_value = iter([
+        {"type": "ERROR", "raw_object": {"code": code, "message": "Boom"}},
+    ])
+
+    with patch("controlpanel.api.informer.time.sleep") as sleep:
+        informer._watch(k8s, "42")
+
+    assert sleep.called == delayed
+
+
+def test_get_deployments_from_informer(settings, k8s_client, users):
+    settings.ENABLED = {**settings.ENABLED, "deployment_informer": True}
+    user = users["normal_user"]
+    rstudio = deployment(user.k8s_namespace, "rstudio-bob", "rstudio")
+
+    with patch("controlpanel.api.informer.deployments.list") as list_deployments:
+        list_deployments.return_value = [rstudio]
+        deployments = cluster.ToolDeployment.get_deployments(user, "id-token")
+
+    assert deployments == [rstudio]
+    list_deployments.assert_called_with(user.k8s_namespace)
+    k8s_client.AppsV1Api.list_namespaced_deployment.assert_not_called()
+
+
+def test_get_deployments_out_of_sync(settings, k8s_client, users):
+    settings.ENABLED = {**settings.ENABLED, "deployment_informer": True}
+    user = users["normal_user"]
+    rstudio = deployment(user.k8s_namespace, "rstudio-bob", "rstudio")
+    k8s_client.AppsV1Api.list_namespaced_deployment.return_value = Mock(items=[rstudio])
+
+    with patch("controlpanel.api.informer.deployments.list", return_value=None):
+        deployments = cluster.ToolDeployment.get_deployments(user, "id-token")
+
+    assert deployments == [rstudio]
+    k8s_client.AppsV1Api.list_namespaced_deployment.assert_called_with(user.k8s_namespace)
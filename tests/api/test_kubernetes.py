@@ -1,9 +1,10 @@
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import kubernetes
 import pytest
 
-from controlpanel.api.kubernetes import KubernetesClient
+from controlpanel.api import kubernetes as k8s
+from controlpanel.api.kubernetes import ApiClientCache, KubernetesClient
 
 
 
@@ -11,6 +12,13 @@ SERVICE_ACCOUNT_TEST_TOKEN = "test-service-account-token"
 
 
 
+@pytest.yield_fixture(autouse=True)
+def api_clients():
+    k8s.api_clients.clear()
+    yield k8s.api_clients
+    k8s.api_clients.clear()
+
+
 @pytest.yield_fixture()
 def k8s_config():
     config = kubernetes.client.Configuration()
@@ -65,3 +73,56 @@ def test_kubernetes_client__getattr__(k8s_config):
     assert k8s_api_1.api_client == api_client
     assert type(k8s_api_2) == kubernetes.client.api.AppsV1Api
     assert k8s_api_2.api_client == api_client
+
+
+def test_kubernetes_client_reuses_api_client(k8s_config):
+    client = KubernetesClient(id_token="test-user-id-token")
+
+    assert KubernetesClient(id_token="test-user-id-token").api_client is client.api_client
+    assert KubernetesClient(id_token="other-id-token").api_client is not client.api_client
+
+
+def test_config_loaded_once(k8s_config):
+    with patch("controlpanel.api.kubernetes.kubernetes.config") as config, patch(
+        "controlpanel.api.kubernetes._config_version", None,
+    ), patch("controlpanel.api.kubernetes.config_version") as config_version:
+        config_version.return_value = (("kubeconfig", 1),)
+        k8s.get_config()
+        k8s.get_config()
+        assert config.load_kube_config.call_count == 1
+
+        # e.g. the token was rotated
+        config_version.return_value = (("kubeconfig", 2),)
+        k8s.get_config()
+        assert config.load_kube_config.call_count == 2
+
+
+def test_api_client_cache_evicts_least_recently_used():
+    cache = ApiClientCache(max_size=2, idle_timeout=60)
+    first, second, third = Mock(), Mock(), Mock()
+
+    cache.get("first", lambda: first)
+    cache.get("second", lambda: second)
+    assert cache.get("first", Mock()) is first
+    cache.get("third", lambda: third)
+
+    second.close.assert_called_once()
+    first.close.assert_not_called()
+    assert cache.get("second", lambda: "new") == "new"
+
+
+def test_api_client_cache_evicts_idle():
+    cache = ApiClientCache(max_size=10, idle_timeout=60)
+    idle, active = Mock(), Mock()
+
+    with patch("controlpanel.api.kubernetes.time.monotonic") as monotonic:
+        monotonic.return_value = 0
+        cache.get("idle", lambda: idle)
+        monotonic.return_value = 30
+        cache.get("active", lambda: active)
+        monotonic.return_value = 61
+        cache.get("other", Mock)
+
+    idle.close.assert_called_once()
+    idle.rest_client.pool_manager.clear.assert_called_once()
+    active.close.assert_not_called()
@@ -0,0 +1,169 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+import pytest
+
+from controlpanel.api import cluster, onboarding
+from controlpanel.api.helm import Release
+from controlpanel.api.models import User
+
+
+ENTRIES = [
+    {"auth0_id": "github|user_4", "username": "dave", "email": "dave@example.com"},
+    {"auth0_id": "github|user_5", "username": "erin", "name": "Erin"},
+]
+
+
+@pytest.fixture
+def releases():
+    """
+    Helm releases in Tiller's storage, by name
+    """
+    releases = {}
+
+    def get_releases(names=None, **kwargs):
+        return {name: releases[name] for name in names if name in releases}
+
+    with patch("controlpanel.api.cluster.get_releases", side_effect=get_releases):
+        yield releases
+
+
+def deploy(releases, aws, user, status="DEPLOYED"):
+    aws.list_role_names.return_value = [
+        *aws.list_role_names.return_value,
+        cluster.User(user).iam_role_name,
+    ]
+    for name in cluster.User(user).release_names:
+        releases[name] = Release(name, "", "", "", "", 1, status)
+
+
+def test_create_users(users):
+    results = onboarding.create_users([
+        *ENTRIES,
+        {"auth0_id": users["normal_user"].auth0_id, "username": "bob"},
+        {"auth0_id": "github|user_6", "username": "bob"},
+        ENTRIES[0],
+    ])
+
+    assert [result["status"] for result in results] == [
+        onboarding.CREATED,
+        onboarding.CREATED,
+        onboarding.EXISTS,
+        onboarding.CONFLICT,
+        onboarding.EXISTS,
+    ]
+    assert results[2]["user"] == users["normal_user"]
+    assert results[3]["user"] is None
+
+    dave = User.objects.get(pk="github|user_4")
+    assert dave.username == "dave"
+    assert dave.email == "dave@example.com"
+    assert User.objects.get(pk="github|user_5").name == "Erin"
+
+
+def test_create_users_created_concurrently(users):
+    bob = users["normal_user"]
+
+    # bob logged in after the users were looked up
+    with patch.object(User.objects, "in_bulk", return_value={}):
+        results = onboarding.create_users([
+            *ENTRIES,
+            {"auth0_id": bob.auth0_id, "username": "bob"},
+        ])
+
+    assert [result["status"] for result in results] == [
+        onboarding.CREATED,
+        onboarding.CREATED,
+        onboarding.EXISTS,
+    ]
+    assert results[2]["user"] == bob
+    assert User.objects.filter(pk__in=["github|user_4", "github|user_5"]).count() == 2
+
+
+def test_create_users_skips_provisioning(aws, helm, db):
+    onboarding.create_users(ENTRIES)
+
+    aws.create_user_role.assert_not_called()
+    helm.upgrade_release.assert_not_called()
+
+
+def test_provision(aws, helm, releases, users):
+    aws.list_role_names.return_value = []
+    deploy(releases, aws, users["superuser"])
+    # the role exists, but a release failed
+    deploy(releases, aws, users["other_user"], status="FAILED")
+    aws.reset_mock()
+    helm.reset_mock()
+
+    results = {
+        result["user"].username: result
+        for result in onboarding.provision(list(users.values()), max_workers=2)
+    }
+
+    assert results["alice"]["status"] == onboarding.SKIPPED
+    assert results["bob"]["status"] == onboarding.PROVISIONED
+    assert results["carol"]["status"] == onboarding.PROVISIONED
+    assert results["bob"]["elapsed"] >= 0
+    assert aws.create_user_role.call_count == 2
+    assert helm.upgrade_release.call_count == 4
+
+
+def test_provision_failed(aws, helm, releases, users):
+    aws.list_role_names.return_value = []
+    helm.upgrade_release.side_effect = cluster.HelmError("Boom")
+
+    results = list(onboarding.provision([users["normal_user"]]))
+
+    assert len(results) == 1
+    assert results[0]["status"] == onboarding.FAILED
+    assert "Boom" in results[0]["error"]
+
+
+def test_onboard_users_command(aws, helm, releases, users, tmp_path):
+    aws.list_role_names.return_value = []
+    path = tmp_path / "users.csv"
+    path.write_text(
+        "auth0_id,username,email,name\n"
+        "github|user_4,dave,dave@example.com,Dave\n"
+        "github|user_6,bob,,\n"
+    )
+    stdout = StringIO()
+    stderr = StringIO()
+
+    call_command("onboard_users", str(path), stdout=stdout, stderr=stderr)
+
+    assert User.objects.get(pk="github|user_4").name == "Dave"
+    assert "dave: provisioned" in stdout.getvalue()
+    assert "Onboarded 1 users" in stdout.getvalue()
+    assert "Provisioning took" in stdout.getvalue()
+    assert "bob: username belongs to another user" in stderr.getvalue()
+
+
+def test_onboard_users_command_resumes(aws, helm, releases, users, tmp_path):
+    aws.list_role_names.return_value = []
+    path = tmp_path / "users.csv"
+    path.write_text("auth0_id,username\ngithub|user_4,dave\n")
+    helm.upgrade_release.side_effect = cluster.HelmError("Boom")
+
+    with pytest.raises(CommandError):
+        call_command("onboard_users", str(path), stdout=StringIO(), stderr=StringIO())
+
+    helm.upgrade_release.side_effect = None
+    stdout = StringIO()
+    call_command("onboard_users", str(path), stdout=stdout)
+
+    assert "dave: provisioned" in stdout.getvalue()
+    deploy(releases, aws, User.objects.get(pk="github|user_4"))
+    stdout = StringIO()
+    call_command("onboard_users", str(path), stdout=stdout)
+
+    assert f"dave: {onboarding.SKIPPED}" in stdout.getvalue()
+
+
+def test_onboard_users_command_missing_columns(tmp_path):
+    path = tmp_path / "users.csv"
+    path.write_text("username\ndave\n")
+
+    with pytest.raises(CommandError, match="auth0_id"):
+        call_command("onboard_users", str(path))
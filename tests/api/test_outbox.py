@@ -0,0 +1,180 @@
+from unittest.mock import patch
+
+from django.utils import timezone
+from model_mommy import mommy
+import pytest
+
+from controlpanel.api import outbox
+from controlpanel.api.aws import BucketProvisioningError
+from controlpanel.api.models import App, OutboxMessage, Parameter, S3Bucket, UserS3Bucket
+
+
+@pytest.fixture(autouse=True)
+def deferred(db, settings):
+    settings.ENABLED = {**settings.ENABLED, "deferred_cloud_tasks": True}
+
+
+@pytest.fixture
+def bucket():
+    return mommy.make("api.S3Bucket", name="test-bucket-1")
+
+
+def test_save_enqueues_instead_of_calling_aws(aws, bucket, users):
+    user = users["normal_user"]
+    aws.reset_mock()
+
+    access = UserS3Bucket.objects.create(
+        user=user, s3bucket=bucket, access_level=UserS3Bucket.READONLY,
+    )
+
+    aws.grant_bucket_access.assert_not_called()
+    message = OutboxMessage.objects.get(action="grant_bucket_access")
+    assert message.resource == f"role:{user.iam_role_name}"
+    assert message.payload == {"model": "api.UserS3Bucket", "pk": access.pk}
+
+    outbox.deliver()
+
+    aws.grant_bucket_access.assert_called_with(
+        user.iam_role_name, bucket.arn, UserS3Bucket.READONLY, access.resources,
+    )
+    assert not OutboxMessage.objects.filter(status=OutboxMessage.PENDING).exists()
+
+
+def test_revoke_supersedes_pending_grant(aws, bucket, users):
+    user = users["normal_user"]
+    outbox.deliver()
+    aws.reset_mock()
+
+    access = UserS3Bucket.objects.create(
+        user=user, s3bucket=bucket, access_level=UserS3Bucket.READONLY,
+    )
+    access.delete()
+
+    message = OutboxMessage.objects.get(resource=f"role:{user.iam_role_name}")
+    assert message.action == "revoke_bucket_access"
+
+    outbox.deliver()
+
+    aws.grant_bucket_access.assert_not_called()
+    aws.revoke_bucket_access.assert_called_once_with(user.iam_role_name, bucket.arn)
+
+
+def test_failed_delivery_blocks_resource_and_is_retried(aws):
+    outbox.deliver()
+    aws.reset_mock()
+    aws.delete_parameter.side_effect = [Exception("Throttled"), None, None]
+
+    outbox.enqueue("parameter:/test/foo", "delete_parameter", name="/test/foo")
+    outbox.enqueue("parameter:/test/foo", "delete_parameter", name="/test/foo")
+
+    assert outbox.deliver() == 1
+    assert aws.delete_parameter.call_count == 1
+
+    failed = OutboxMessage.objects.get(attempts=1)
+    assert failed.attempts == 1
+    assert failed.last_error == "Throttled"
+    assert failed.available_at > timezone.now()
+
+    OutboxMessage.objects.filter(pk=failed.pk).update(available_at=timezone.now())
+    assert outbox.deliver() == 2
+    assert aws.delete_parameter.call_count == 3
+    assert not OutboxMessage.objects.exists()
+
+
+def test_schedule_retry(aws, monkeypatch):
+    monkeypatch.setattr(outbox, "_retry_timer", None)
+    outbox.deliver()
+    aws.delete_parameter.side_effect = Exception("Throttled")
+    outbox.enqueue("parameter:/test/foo", "delete_parameter", name="/test/foo")
+    outbox.deliver()
+    failed = OutboxMessage.objects.get(action="delete_parameter")
+
+    with patch("controlpanel.api.outbox.threading.Timer") as timer:
+        outbox.schedule_retry()
+        # a retry is already scheduled for then
+        outbox.schedule_retry()
+
+    timer.assert_called_once()
+    delay, callback = timer.call_args[0]
+    assert 0 < delay <= (failed.available_at - timezone.now()).total_seconds() + 1
+    assert callback is outbox.notify_worker
+    timer.return_value.start.assert_called_once()
+
+
+def test_schedule_retry_nothing_pending(monkeypatch):
+    monkeypatch.setattr(outbox, "_retry_timer", None)
+    OutboxMessage.objects.all().delete()
+
+    with patch("controlpanel.api.outbox.threading.Timer") as timer:
+        outbox.schedule_retry()
+
+    timer.assert_not_called()
+
+
+def test_failed_bucket_provisioning_resumes(aws):
+    outbox.deliver()
+    aws.create_bucket.side_effect = [
+        BucketProvisioningError(
+            "test-bucket-1", ["create", "versioning"], {"logging": Exception("SlowDown")},
+        ),
+        ["create", "logging", "versioning"],
+    ]
+    bucket = mommy.make("api.S3Bucket", name="test-bucket-1")
+
+    outbox.deliver()
+
+    message = OutboxMessage.objects.get(action="create_bucket")
+    assert message.payload == {"pk": bucket.pk, "completed": ["create", "versioning"]}
+
+    OutboxMessage.objects.filter(pk=message.pk).update(available_at=timezone.now())
+    outbox.deliver()
+
+    aws.create_bucket.assert_called_with(bucket.name, False, ["create", "versioning"])
+    assert not OutboxMessage.objects.exists()
+
+
+def test_delivery_gives_up_after_max_attempts(aws):
+    outbox.deliver()
+    aws.delete_parameter.side_effect = Exception("AccessDenied")
+    message = outbox.enqueue("parameter:/test/foo", "delete_parameter", name="/test/foo")
+    OutboxMessage.objects.filter(pk=message.pk).update(attempts=outbox.MAX_ATTEMPTS - 1)
+
+    outbox.deliver()
+
+    message.refresh_from_db()
+    assert message.status == OutboxMessage.FAILED
+    assert outbox.next_message() is None
+
+
+def test_enqueue_unknown_action():
+    with pytest.raises(ValueError):
+        outbox.enqueue("role:foo", "launch_rockets")
+
+
+def test_saves_in_autocommit_mode(transactional_db, aws, users):
+    """
+    Models enqueue messages outside of a request's transaction too, e.g. in
+    management commands
+    """
+    user = users["normal_user"]
+    OutboxMessage.objects.all().delete()
+
+    bucket = S3Bucket.objects.create(name="test-bucket-2")
+    UserS3Bucket.objects.create(
+        user=user, s3bucket=bucket, access_level=UserS3Bucket.READONLY,
+    )
+    App.objects.create(name="test-app", repo_url="https://github.com/moj-analytical-services/test-app")
+    parameter = Parameter.objects.create(
+        key="test_param", value="secret", role_name="test_app", app_type="webapp",
+    )
+    parameter.delete()
+
+    assert set(OutboxMessage.objects.values_list("action", flat=True)) == {
+        "create_bucket",
+        "grant_bucket_access",
+        "create_app_role",
+        "delete_parameter",
+    }
+    aws.create_parameter.assert_called_once()
+    # secrets are never kept in messages
+    assert not OutboxMessage.objects.filter(payload__contains={"value": "secret"}).exists()
@@ -0,0 +1,108 @@
+from unittest.mock import call
+
+from model_mommy import mommy
+import pytest
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from controlpanel.api.models import PolicyS3Bucket, UserS3Bucket
+
+
+@pytest.fixture
+def buckets():
+    return {
+        1: mommy.make("api.S3Bucket", name="test-bucket-1"),
+        2: mommy.make("api.S3Bucket", name="test-bucket-2"),
+    }
+
+
+@pytest.fixture
+def policy():
+    return mommy.make("api.IAMManagedPolicy", name="test-group")
+
+
+def post(client, grants):
+    return client.post(
+        reverse("access-grants"),
+        {"grants": grants},
+        content_type="application/json",
+    )
+
+
+def test_grant(client, aws, users, buckets, policy):
+    user = users["normal_user"]
+    existing = mommy.make(
+        "api.UserS3Bucket",
+        user=users["other_user"],
+        s3bucket=buckets[1],
+        access_level=UserS3Bucket.READONLY,
+    )
+    aws.reset_mock()
+
+    response = post(client, [
+        {"user": user.auth0_id, "s3bucket": buckets[1].id, "access_level": "readonly"},
+        {"user": user.auth0_id, "s3bucket": buckets[2].id, "access_level": "readwrite", "paths": ["/foo"]},
+        {"user": users["other_user"].auth0_id, "s3bucket": buckets[1].id, "access_level": "readwrite"},
+        {"policy": policy.id, "s3bucket": buckets[1].id, "access_level": "readonly"},
+    ])
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [result["status"] for result in response.data["results"]] == [
+        "granted", "granted", "updated", "granted",
+    ]
+
+    assert aws.batch_policy_updates.call_count == 3
+    aws.grant_bucket_access.assert_has_calls([
+        call(user.iam_role_name, buckets[1].arn, "readonly", [buckets[1].arn]),
+        call(user.iam_role_name, buckets[2].arn, "readwrite", [f"{buckets[2].arn}/foo"]),
+    ], any_order=True)
+    aws.grant_group_bucket_access.assert_called_once_with(
+        policy.arn, buckets[1].arn, "readonly", [buckets[1].arn],
+    )
+
+    assert UserS3Bucket.objects.get(user=user, s3bucket=buckets[2]).paths == ["/foo"]
+    existing.refresh_from_db()
+    assert existing.access_level == UserS3Bucket.READWRITE
+    assert PolicyS3Bucket.objects.filter(policy=policy, s3bucket=buckets[1]).exists()
+
+
+def test_grant_reports_each_item(client, aws, users, buckets):
+    user = users["normal_user"]
+    aws.grant_bucket_access.side_effect = Exception("AccessDenied")
+
+    response = post(client, [
+        {"user": user.auth0_id, "s3bucket": buckets[1].id, "access_level": "readonly"},
+        {"user": user.auth0_id, "s3bucket": buckets[1].id, "access_level": "readwrite"},
+        {"s3bucket": buckets[1].id, "access_level": "readonly"},
+    ])
+
+    assert response.status_code == status.HTTP_200_OK
+    failed, duplicate, invalid = response.data["results"]
+    assert failed == {"status": "failed", "error": "AccessDenied"}
+    assert duplicate == {"status": "duplicate"}
+    assert invalid["status"] == "invalid"
+    assert not UserS3Bucket.objects.filter(user=user).exists()
+
+
+def test_grant_checks_permissions_per_bucket(client, aws, users, buckets):
+    bucket_admin = users["other_user"]
+    mommy.make(
+        "api.UserS3Bucket",
+        user=bucket_admin,
+        s3bucket=buckets[1],
+        access_level=UserS3Bucket.READWRITE,
+        is_admin=True,
+    )
+    client.force_login(bucket_admin)
+    user = users["normal_user"]
+
+    response = post(client, [
+        {"user": user.auth0_id, "s3bucket": buckets[1].id, "access_level": "readonly"},
+        {"user": user.auth0_id, "s3bucket": buckets[2].id, "access_level": "readonly"},
+        {"user": user.auth0_id, "s3bucket": buckets[1].id, "access_level": "readwrite", "is_admin": True},
+    ])
+
+    assert [result["status"] for result in response.data["results"]] == [
+        "granted", "forbidden", "forbidden",
+    ]
+    assert list(UserS3Bucket.objects.filter(user=user).values_list("s3bucket", flat=True)) == [buckets[1].id]
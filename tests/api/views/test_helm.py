@@ -0,0 +1,15 @@
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+
+def test_helm_pool(client):
+    response = client.get(reverse("helm-pool"))
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["running"] == 0
+    assert response.data["queued"] == 0
+
+
+def test_helm_pool_forbidden(client, users):
+    client.force_login(users["normal_user"])
+    response = client.get(reverse("helm-pool"))
+    assert response.status_code == status.HTTP_403_FORBIDDEN
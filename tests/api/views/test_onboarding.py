@@ -0,0 +1,46 @@
+from unittest.mock import patch
+
+import pytest
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from controlpanel.api import onboarding
+from controlpanel.api.models import User
+
+
+@pytest.fixture(autouse=True)
+def provision_in_background():
+    with patch("controlpanel.api.onboarding.provision_in_background") as provision:
+        yield provision
+
+
+def test_onboard(client, users, provision_in_background):
+    data = {
+        "users": [
+            {"auth0_id": "github|user_4", "username": "dave", "email": "dave@example.com"},
+            {"auth0_id": "github|user_6", "username": "bob"},
+        ],
+    }
+    response = client.post(reverse("user-onboarding"), data, content_type="application/json")
+    assert response.status_code == status.HTTP_202_ACCEPTED
+
+    assert [result["status"] for result in response.data["results"]] == [
+        onboarding.CREATED,
+        onboarding.CONFLICT,
+    ]
+    dave = User.objects.get(pk="github|user_4")
+    provision_in_background.assert_called_once_with([dave])
+
+
+def test_onboard_invalid(client, provision_in_background):
+    data = {"users": [{"auth0_id": "github|user_4", "username": "not valid"}]}
+    response = client.post(reverse("user-onboarding"), data, content_type="application/json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    provision_in_background.assert_not_called()
+
+
+def test_onboard_forbidden(client, users):
+    client.force_login(users["normal_user"])
+    data = {"users": [{"auth0_id": "github|user_4", "username": "dave"}]}
+    response = client.post(reverse("user-onboarding"), data, content_type="application/json")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,34 @@
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from controlpanel.api.models import Parameter
+
+
+def test_bulk_create(client, aws, superuser):
+    aws.get_parameters.return_value = {}
+    aws.create_parameters.return_value = {}
+    data = {
+        "parameters": [
+            {"key": "foo", "role_name": "airflow_daily", "app_type": "airflow", "value": "1"},
+            {"key": "bar", "role_name": "airflow_daily", "app_type": "airflow", "value": "2"},
+        ],
+    }
+
+    response = client.post(reverse("parameter-bulk-create"), data, content_type="application/json")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [result["status"] for result in response.data["results"]] == [
+        Parameter.CREATED,
+        Parameter.CREATED,
+    ]
+    assert set(Parameter.objects.values_list("key", flat=True)) == {"foo", "bar"}
+    assert set(Parameter.objects.values_list("created_by", flat=True)) == {superuser.pk}
+
+
+def test_bulk_create_invalid(client, aws):
+    data = {"parameters": [{"key": "foo", "role_name": "airflow_daily", "app_type": "nope"}]}
+
+    response = client.post(reverse("parameter-bulk-create"), data, content_type="application/json")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    aws.create_parameters.assert_not_called()
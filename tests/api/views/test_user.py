@@ -8,6 +8,7 @@ import pytest
 from rest_framework import status
 from rest_framework.reverse import reverse
 
+from controlpanel.api import cluster
 from controlpanel.api.models import User
 
 
@@ -142,13 +143,10 @@ def test_aws_error_and_transaction(client, aws, helm):
     aws.create_user_role.side_effect = ClientError({"foo": "bar"}, "bar")
     data = {'auth0_id': 'github|3', 'username': 'foo'}
 
-    helm.reset_mock()
-
-    with pytest.raises(ClientError):
+    with pytest.raises(cluster.ProvisioningError):
         client.post(reverse('user-list'), data)
 
     aws.create_user_role.assert_called()
-    helm.upgrade_release.assert_not_called()
 
     with pytest.raises(User.DoesNotExist):
         User.objects.get(pk=data['auth0_id'])
@@ -158,7 +156,7 @@ def test_helm_error_and_transaction(client, aws, helm):
     helm.upgrade_release.side_effect = CalledProcessError(1, 'Helm error')
     data = {'auth0_id': 'github|3', 'username': 'foo'}
 
-    with pytest.raises(CalledProcessError):
+    with pytest.raises(cluster.ProvisioningError):
         client.post(reverse('user-list'), data)
 
     aws.create_user_role.assert_called()
@@ -0,0 +1,127 @@
+from collections import Counter
+import json
+import os
+from pathlib import Path
+
+import boto3
+from django.conf import settings
+from django.core.cache import cache
+import moto
+import pytest
+
+from controlpanel.api import aws
+
+
+BASELINES_FILE = Path(__file__).parent / "baselines.json"
+
+ROUNDS = 3
+
+
+@pytest.yield_fixture(autouse=True)
+def enable_db_for_all_tests(db):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def aws_creds():
+    os.environ['AWS_ACCESS_KEY_ID'] = 'test-access-key-id'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'test-secret-access-key'
+    os.environ['AWS_SECURITY_TOKEN'] = 'test-security-token'
+    os.environ['AWS_SESSION_TOKEN'] = 'test-session-token'
+
+
+@pytest.yield_fixture(autouse=True)
+def iam(aws_creds):
+    with moto.mock_iam():
+        yield boto3.resource('iam')
+
+
+@pytest.yield_fixture(autouse=True)
+def s3(aws_creds):
+    with moto.mock_s3():
+        yield boto3.resource('s3')
+
+
+@pytest.fixture
+def logs_bucket(s3):
+    bucket = s3.Bucket(settings.LOGS_BUCKET_NAME)
+    bucket.create(CreateBucketConfiguration={
+        "LocationConstraint": settings.BUCKET_REGION,
+    })
+    log_delivery = {
+        "Type": "Group",
+        "URI": 'http://acs.amazonaws.com/groups/s3/LogDelivery',
+    }
+    bucket.Acl().put(AccessControlPolicy={
+        'Grants': [
+            {"Grantee": log_delivery, "Permission": "WRITE"},
+            {"Grantee": log_delivery, "Permission": "READ_ACP"},
+        ],
+        "Owner": bucket.Acl().owner,
+    })
+    return bucket
+
+
+@pytest.yield_fixture
+def api_calls():
+    """
+    Records the name of every AWS API call made through `aws.registry`
+    """
+    calls = []
+
+    def record(model, **kwargs):
+        calls.append(model.name)
+
+    # clients copy the session's event handlers when they're created
+    aws.registry.reset()
+    aws.registry.session.events.register('before-call', record)
+    yield calls
+    aws.registry.reset()
+
+
+@pytest.fixture
+def measure(request, benchmark, api_calls):
+    """
+    Benchmark `func` over `ROUNDS` rounds, each prepared by `setup` (which
+    returns the arguments of `func`), and check its AWS API calls against
+    the baseline `name` in `baselines.json`
+
+    Wall time depends on the machine, so it's only checked against the
+    baseline with `--enforce-benchmark-time`, and recorded otherwise.
+
+    Policy documents are not cached between rounds, so the API calls counted
+    are those of a cold start.
+    """
+    baselines = json.loads(BASELINES_FILE.read_text())
+    rounds = []
+
+    def measure(name, setup, func):
+        def prepare():
+            args = setup()
+            cache.clear()
+            del api_calls[:]
+            return args, {}
+
+        def run(*args):
+            func(*args)
+            rounds.append(list(api_calls))
+
+        benchmark.pedantic(run, setup=prepare, rounds=ROUNDS)
+
+        calls = max(rounds, key=len)
+        benchmark.extra_info["api_calls"] = len(calls)
+
+        baseline = baselines[name]
+        assert len(calls) <= baseline["api_calls"], (
+            f"{name} made {len(calls)} AWS API calls, the baseline is "
+            f"{baseline['api_calls']}: {dict(Counter(calls))}"
+        )
+        if benchmark.stats:
+            seconds = benchmark.stats.stats.max
+            benchmark.extra_info["max_seconds"] = seconds
+            if request.config.getoption("enforce_benchmark_time"):
+                assert seconds <= baseline["max_seconds"], (
+                    f"{name} took {seconds:.3f}s, the baseline is {baseline['max_seconds']}s"
+                )
+
+    return measure
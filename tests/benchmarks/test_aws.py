@@ -0,0 +1,121 @@
+"""
+Benchmarks of the AWS layer against moto
+
+Each benchmark counts the AWS API calls of an operation at a realistic size
+and fails when it makes more calls than its baseline in `baselines.json`.
+When an operation legitimately changes, update its baseline in the same
+commit.
+
+Wall time is recorded in the benchmark's `extra_info`, and only checked
+against the baseline's `max_seconds` with `--enforce-benchmark-time`, as a
+GC pause or a busy CI runner would otherwise fail unrelated changes. Each
+`max_seconds` is 4 times the slowest round measured (over 3 runs of
+`pytest tests/benchmarks --benchmark-only`), rounded up to 0.05s.
+"""
+from itertools import count
+import json
+
+from controlpanel.api import aws
+
+
+BUCKETS_PER_ROLE = 150
+BUCKETS_PER_GROUP = 40
+GROUP_MEMBERS = 200
+
+_ids = count()
+
+
+def bucket_arn(i):
+    return f'arn:aws:s3:::test-bucket-{i:03}'
+
+
+def create_role(iam):
+    name = f'test_user_{next(_ids)}'
+    iam.create_role(RoleName=name, AssumeRolePolicyDocument=json.dumps(aws.BASE_ASSUME_ROLE_POLICY))
+    return name
+
+
+def create_role_with_access(iam):
+    """
+    Returns the name of a new role with read/write access to two paths of
+    each of `BUCKETS_PER_ROLE` buckets
+    """
+    role_name = create_role(iam)
+    with aws.batch_policy_updates():
+        for i in range(BUCKETS_PER_ROLE):
+            arn = bucket_arn(i)
+            aws.grant_bucket_access(role_name, arn, 'readwrite', [f'{arn}/foo', f'{arn}/bar'])
+    return role_name
+
+
+def create_group(iam, members=()):
+    name = f'test-group-{next(_ids)}'
+    aws.create_group(name, '/group/test/')
+    policy = iam.Policy(aws.iam_arn(f'policy/group/test/{name}'))
+    for role_name in members:
+        policy.attach_role(RoleName=role_name)
+    return policy.arn
+
+
+def test_grant_bucket_access(iam, measure):
+    measure(
+        'grant_bucket_access',
+        lambda: (create_role_with_access(iam),),
+        lambda role_name: aws.grant_bucket_access(
+            role_name,
+            bucket_arn(999),
+            'readonly',
+            [f'{bucket_arn(999)}/foo', f'{bucket_arn(999)}/bar/baz'],
+        ),
+    )
+
+
+def test_revoke_bucket_access(iam, measure):
+    measure(
+        'revoke_bucket_access',
+        lambda: (create_role_with_access(iam),),
+        lambda role_name: aws.revoke_bucket_access(role_name, bucket_arn(BUCKETS_PER_ROLE - 1)),
+    )
+
+
+def test_grant_group_bucket_access(iam, measure):
+    def setup():
+        group_arn = create_group(iam)
+        with aws.batch_policy_updates():
+            for i in range(BUCKETS_PER_GROUP):
+                aws.grant_group_bucket_access(group_arn, bucket_arn(i), 'readonly')
+        return (group_arn,)
+
+    measure(
+        'grant_group_bucket_access',
+        setup,
+        lambda group_arn: aws.grant_group_bucket_access(group_arn, bucket_arn(999), 'readwrite'),
+    )
+
+
+def test_create_bucket(logs_bucket, measure):
+    measure(
+        'create_bucket',
+        lambda: (f'test-bucket-{next(_ids)}',),
+        lambda name: aws.create_bucket(name, is_data_warehouse=True),
+    )
+
+
+def test_update_group_members(iam, measure):
+    role_names = [create_role(iam) for _ in range(GROUP_MEMBERS)]
+
+    def setup():
+        # 10 members joined and 10 left
+        return create_group(iam, role_names[10:]), set(role_names[:-10])
+
+    measure('update_group_members', setup, aws.update_group_members)
+
+
+def test_delete_role(iam, measure):
+    def setup():
+        role_name = create_role_with_access(iam)
+        for _ in range(3):
+            iam.Role(role_name).attach_policy(PolicyArn=create_group(iam))
+        return (role_name,)
+
+    measure('delete_role', setup, aws.delete_role)
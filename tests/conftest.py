@@ -1,4 +1,4 @@
-from unittest.mock import mock_open, patch
+from unittest.mock import patch
 
 from model_mommy import mommy
 import yaml
@@ -7,6 +7,15 @@ import pytest
 from tests.api.fixtures.helm_mojanalytics_index import HELM_MOJANALYTICS_INDEX
 
 
+def pytest_addoption(parser):
+    parser.addoption(
+        "--enforce-benchmark-time",
+        action="store_true",
+        help="Fail benchmarks which take longer than the max_seconds of "
+        "their baseline (wall time is only recorded otherwise)",
+    )
+
+
 @pytest.yield_fixture(autouse=True)
 def aws():
     """
@@ -52,13 +61,31 @@ def helm():
         yield helm
 
 
-@pytest.fixture
-def helm_repository_index(autouse=True):
+@pytest.yield_fixture(autouse=True)
+def helm_repository_update():
+    """
+    Don't update the helm repository index in background threads
+    """
+    with patch('controlpanel.api.helm.HelmRepository.update_in_background') as update:
+        yield update
+
+
+@pytest.yield_fixture
+def helm_repository_index(tmp_path):
     """
     Mock the helm repository with some data
     """
-    content = yaml.dump(HELM_MOJANALYTICS_INDEX)
-    return mock_open(read_data=content)
+    repo_path = tmp_path / "mojanalytics-index.yaml"
+    repo_path.write_text(yaml.dump(HELM_MOJANALYTICS_INDEX))
+    with patch.multiple(
+        'controlpanel.api.helm.HelmRepository',
+        REPO_PATH=str(repo_path),
+        LOCK_PATH=f"{repo_path}.lock",
+        INDEX_PATH=f"{repo_path}.pickle",
+        _updated_at=None,
+        _charts={},
+    ):
+        yield repo_path
 
 
 @pytest.yield_fixture(autouse=True)
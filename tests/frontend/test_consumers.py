@@ -3,12 +3,17 @@ import json
 import pytest
 from unittest.mock import patch, Mock
 
+from controlpanel.api import cluster
 from controlpanel.api.models import Tool, ToolDeployment, User
 from controlpanel.api.cluster import (
     TOOL_DEPLOYING,
     TOOL_READY,
     TOOL_RESTARTING,
+    TOOL_STATUS_UNKNOWN,
     HOME_RESETTING,
+    USER_DELETED,
+    USER_DELETE_FAILED,
+    USER_DELETING,
 )
 from controlpanel.frontend import consumers
 
@@ -60,10 +65,24 @@ def test_tool_deploy(users, tools, update_tool_status, wait_for_deployment):
     tool = Tool.objects.first()
     id_token = "secret user id_token"
 
-    with patch("controlpanel.frontend.consumers.ToolDeployment") as ToolDeployment:
+    deployed = []
+
+    async def deploy(on_progress=None):
+        await on_progress("RESOURCES", {})
+        deployed.append(True)
+
+    with patch("controlpanel.frontend.consumers.ToolDeployment") as ToolDeployment, patch(
+        "controlpanel.frontend.consumers.send_sse_async",
+    ) as send_sse_async:
         tool_deployment = Mock()
+        tool_deployment.deploy = deploy
         ToolDeployment.return_value = tool_deployment
 
+        async def send(user_id, event):
+            pass
+
+        send_sse_async.side_effect = send
+
         consumer = consumers.BackgroundTaskConsumer("test")
         consumer.tool_deploy(
             message={
@@ -79,8 +98,11 @@ def test_tool_deploy(users, tools, update_tool_status, wait_for_deployment):
         update_tool_status.assert_called_with(
             tool_deployment, id_token, TOOL_DEPLOYING,
         )
-        # 3. Call save() on ToolDeployment (trigger deployment)
-        tool_deployment.save.assert_called()
+        # 3. Deploy the tool, sending progress as helm reports it
+        assert deployed
+        send_sse_async.assert_called_once_with(
+            user.auth0_id, consumers.tool_progress_event(tool, "RESOURCES"),
+        )
         # 4. Wait for deployment to complete
         wait_for_deployment.assert_called_with(tool_deployment, id_token)
 
@@ -189,3 +211,120 @@ def test_update_tool_status():
         )
         tool_deployment.get_installed_app_version.assert_called_with(id_token)
         send_sse.assert_called_with(user.auth0_id, expected_sse_event)
+
+
+def test_user_delete(users):
+    requester, user = User.objects.all()[:2]
+
+    with patch.object(User, "delete") as delete, patch(
+        "controlpanel.frontend.consumers.send_sse"
+    ) as send_sse:
+        delete.side_effect = lambda progress: progress("delete role", 1, 1, None)
+
+        consumer = consumers.BackgroundTaskConsumer("test")
+        consumer.user_delete(
+            message={
+                "user_id": user.auth0_id,
+                "requester_id": requester.auth0_id,
+            }
+        )
+
+    statuses = [
+        json.loads(args[1]["data"]) for args, _ in send_sse.call_args_list
+    ]
+    assert all(args[0] == requester.auth0_id for args, _ in send_sse.call_args_list)
+    assert statuses == [
+        {"userId": user.auth0_id, "status": USER_DELETING},
+        {
+            "userId": user.auth0_id,
+            "status": USER_DELETING,
+            "step": "delete role",
+            "completed": 1,
+            "total": 1,
+            "error": None,
+        },
+        {"userId": user.auth0_id, "status": USER_DELETED},
+    ]
+
+
+def test_user_delete_unexpected_error(users):
+    requester, user = User.objects.all()[:2]
+
+    with patch.object(User, "delete") as delete, patch(
+        "controlpanel.frontend.consumers.send_sse"
+    ) as send_sse:
+        delete.side_effect = cluster.HelmError("Tiller unavailable")
+
+        consumer = consumers.BackgroundTaskConsumer("test")
+        consumer.user_delete(
+            message={
+                "user_id": user.auth0_id,
+                "requester_id": requester.auth0_id,
+            }
+        )
+
+    statuses = [
+        json.loads(args[1]["data"])["status"] for args, _ in send_sse.call_args_list
+    ]
+    assert statuses == [USER_DELETING, USER_DELETE_FAILED]
+
+
+def test_user_delete_already_deleted(users):
+    requester = User.objects.first()
+
+    with patch("controlpanel.frontend.consumers.send_sse") as send_sse:
+        consumer = consumers.BackgroundTaskConsumer("test")
+        consumer.user_delete(
+            message={
+                "user_id": "github|deleted",
+                "requester_id": requester.auth0_id,
+            }
+        )
+
+    send_sse.assert_called_once()
+    args, _ = send_sse.call_args
+    assert args[0] == requester.auth0_id
+    assert json.loads(args[1]["data"]) == {
+        "userId": "github|deleted",
+        "status": USER_DELETED,
+        "alreadyDeleted": True,
+    }
+
+
+def test_onboard_users(users):
+    with patch("controlpanel.frontend.consumers.onboarding.provision") as provision:
+        provision.return_value = []
+
+        consumer = consumers.BackgroundTaskConsumer("test")
+        consumer.onboard_users(message={"user_ids": ["github|1", "github|2"]})
+
+    provisioned, = provision.call_args[0]
+    assert {user.auth0_id for user in provisioned} == {"github|1", "github|2"}
+
+
+def test_wait_for_deployment():
+    tool_deployment = Mock()
+    tool_deployment.watch_status.return_value = iter([
+        (TOOL_DEPLOYING, "R: 42"),
+        (TOOL_READY, "R: 42"),
+    ])
+
+    with patch("controlpanel.frontend.consumers.send_tool_status") as send_tool_status:
+        assert consumers.wait_for_deployment(tool_deployment, "id_token") == TOOL_READY
+
+    tool_deployment.watch_status.assert_called_with("id_token")
+    assert [args[1:] for args, _ in send_tool_status.call_args_list] == [
+        (TOOL_DEPLOYING, "R: 42"),
+        (TOOL_READY, "R: 42"),
+    ]
+
+
+def test_wait_for_deployment_timed_out():
+    tool_deployment = Mock()
+    tool_deployment.watch_status.return_value = iter([(TOOL_DEPLOYING, None)])
+
+    with patch("controlpanel.frontend.consumers.send_tool_status") as send_tool_status:
+        status = consumers.wait_for_deployment(tool_deployment, "id_token")
+
+    assert status == TOOL_STATUS_UNKNOWN
+    send_tool_status.assert_called_with(tool_deployment, TOOL_STATUS_UNKNOWN, None)
@@ -185,6 +185,20 @@ def grant_access(client, users3buckets, users, *args):
     )
 
 
+def bulk_grant_access(client, users3buckets, users, *args):
+    data = {
+        'access_level': UserS3Bucket.READWRITE,
+        'users': [users['other_user'].auth0_id, users['normal_user'].auth0_id],
+    }
+    return client.post(
+        reverse(
+            'bulk-grant-datasource-access',
+            kwargs={'pk': users3buckets['warehouse_readonly'].s3bucket.id},
+        ),
+        data,
+    )
+
+
 @pytest.mark.parametrize(
     'view,user,expected_status',
     [
@@ -199,6 +213,10 @@ def grant_access(client, users3buckets, users, *args):
         (grant_access, 'superuser', status.HTTP_302_FOUND),
         (grant_access, 'bucket_admin', status.HTTP_302_FOUND),
         (grant_access, 'normal_user', status.HTTP_403_FORBIDDEN),
+
+        (bulk_grant_access, 'superuser', status.HTTP_302_FOUND),
+        (bulk_grant_access, 'bucket_admin', status.HTTP_302_FOUND),
+        (bulk_grant_access, 'normal_user', status.HTTP_403_FORBIDDEN),
     ],
 )
 def test_access_permissions(client, users3buckets, users, view, user, expected_status):
@@ -238,3 +256,17 @@ def test_bucket_creator_has_readwrite_and_admin_access(client, users):
     assert ub.access_level == UserS3Bucket.READWRITE
     assert ub.is_admin
 
+
+def test_bulk_grant_access(client, users3buckets, users):
+    client.force_login(users['superuser'])
+    bucket = users3buckets['warehouse_readonly'].s3bucket
+
+    response = bulk_grant_access(client, users3buckets, users)
+
+    assert response.status_code == status.HTTP_302_FOUND
+    assert set(bucket.users3buckets.values_list('user', 'access_level')) == {
+        (users['bucket_admin'].pk, UserS3Bucket.READWRITE),
+        (users['bucket_viewer'].pk, UserS3Bucket.READONLY),
+        (users['other_user'].pk, UserS3Bucket.READWRITE),
+        (users['normal_user'].pk, UserS3Bucket.READWRITE),
+    }
@@ -1,3 +1,6 @@
+from datetime import datetime, timezone
+
+from botocore.exceptions import EndpointConnectionError
 from django.urls import reverse
 from model_mommy import mommy
 import pytest
@@ -19,6 +22,12 @@ def param(users):
     return param
 
 
+@pytest.fixture(autouse=True)
+def ssm_metadata(aws):
+    aws.describe_parameters.side_effect = lambda names: dict.fromkeys(names)
+    return aws.describe_parameters
+
+
 def list(client, *args):
     return client.get(reverse('list-parameters'))
 
@@ -83,3 +92,59 @@ def test_list(client, param, users, view, user, expected_count):
     response = view(client, param, users)
     assert len(response.context_data['object_list']) == expected_count
 
+
+def test_list_ssm_metadata(client, param, users, ssm_metadata):
+    last_modified = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    ssm_metadata.side_effect = lambda names: {
+        name: {"type": "SecureString", "version": 1, "last_modified": last_modified}
+        for name in names
+    }
+    client.force_login(users['other_user'])
+    response = list(client)
+
+    # all the parameters are described at once
+    ssm_metadata.assert_called_once()
+    parameters = response.context_data['object_list']
+    assert sorted(ssm_metadata.call_args[0][0]) == sorted(p.name for p in parameters)
+    for parameter in response.context_data['parameters']:
+        assert parameter.ssm_metadata["last_modified"] == last_modified
+    assert b"2020/01/01 00:00:00" in response.content
+
+
+def test_list_ssm_unavailable(client, param, users, ssm_metadata):
+    ssm_metadata.side_effect = EndpointConnectionError(endpoint_url="https://ssm")
+    client.force_login(users['other_user'])
+    response = list(client)
+
+    assert response.status_code == status.HTTP_200_OK
+    for parameter in response.context_data['parameters']:
+        assert parameter.ssm_metadata is None
+    assert b"Unknown" in response.content
+    assert b"Not in SSM" not in response.content
+
+
+def test_role_list(client, users, aws, settings):
+    aws.list_role_names.return_value = [
+        "airflow_daily",
+        f"{settings.ENV}_app_bar",
+        f"{settings.ENV}_app_foo",
+        f"{settings.ENV}_user_alice",
+    ]
+    client.force_login(users['normal_user'])
+
+    response = client.get(reverse('parameters-list-roles'), {'limit': 2})
+    assert response.json() == {
+        "count": 3,
+        "next_offset": 2,
+        "results": ["airflow_daily", f"{settings.ENV}_app_bar"],
+    }
+
+    response = client.get(reverse('parameters-list-roles'), {'type': 'webapp', 'q': 'foo'})
+    assert response.json()["results"] == [f"{settings.ENV}_app_foo"]
+
+    response = client.get(reverse('parameters-list-roles'), {'limit': 0, 'offset': -5})
+    assert response.json() == {
+        "count": 3,
+        "next_offset": 1,
+        "results": ["airflow_daily"],
+    }
@@ -12,6 +12,12 @@ def auth0():
         yield auth0
 
 
+@pytest.yield_fixture(autouse=True)
+def start_background_task():
+    with patch('controlpanel.frontend.views.user.start_background_task') as start_background_task:
+        yield start_background_task
+
+
 def list(client, *args):
     return client.get(reverse('list-users'))
 
@@ -98,3 +104,17 @@ def test_grant_superuser_access(client, users, slack):
         user.username,
         by_username=request_user.username,
     )
+
+
+def test_delete_in_background(client, users, start_background_task):
+    client.force_login(users['superuser'])
+    response = delete(client, users)
+
+    assert response.status_code == status.HTTP_302_FOUND
+    start_background_task.assert_called_once_with(
+        'user.delete',
+        {
+            'user_id': users['other_user'].auth0_id,
+            'requester_id': users['superuser'].auth0_id,
+        },
+    )